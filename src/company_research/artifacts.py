@@ -0,0 +1,394 @@
+"""Content-addressed store for generated artifacts.
+
+Charts, chart reports and research reports are stored once per distinct
+content under ``data/artifacts/blobs/`` (named by SHA-256), gzip-compressed
+when that helps (PNG and other already-compressed formats are kept as is).
+A SQLite manifest maps (company, kind, time) to blobs, and a ``latest``
+table answers "the newest chart for MSFT" with a single primary-key lookup
+instead of a glob and sort over a growing directory.
+
+Human-facing files (``stock_reports/MSFT_1D.png``) are stable "views" that
+are overwritten with the latest version; the history lives in the store and
+is pruned by a ``RetentionPolicy``: keep the newest N per company and kind,
+drop entries older than a maximum age, and evict the oldest beyond a size
+cap. The latest entry of every (company, kind) is never evicted. Blobs no
+longer referenced by any entry are deleted.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from company_research.utils import atomic_write_bytes, topic_slug
+
+logger = logging.getLogger(__name__)
+
+# Formats that are already compressed; gzip would only cost CPU.
+_COMPRESSED_TYPES = ("image/png", "image/jpeg", "image/webp", "application/gzip", "application/zip")
+_MEDIA_TYPES = {
+    ".md": "text/markdown",
+    ".html": "text/html",
+    ".svg": "image/svg+xml",
+    ".json": "application/json",
+    ".png": "image/png",
+    ".js": "text/javascript",
+}
+# Automatic garbage collection runs at most this often per process.
+GC_INTERVAL = 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    encoding TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    company TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    digest TEXT NOT NULL REFERENCES blobs(digest),
+    meta TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS artifacts_by_key ON artifacts (company, kind, created_at);
+CREATE TABLE IF NOT EXISTS latest (
+    company TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    artifact_id INTEGER NOT NULL,
+    PRIMARY KEY (company, kind)
+);
+"""
+
+
+def media_type_for(name: str) -> str:
+    return _MEDIA_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream")
+
+
+@dataclass
+class RetentionPolicy:
+    keep_last: int = 20
+    max_age_days: Optional[float] = 90.0
+    max_bytes: Optional[int] = 500 * 1024 * 1024
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        policy = cls()
+        if os.getenv("COMPANY_RESEARCH_ARTIFACT_KEEP"):
+            policy.keep_last = int(os.environ["COMPANY_RESEARCH_ARTIFACT_KEEP"])
+        if os.getenv("COMPANY_RESEARCH_ARTIFACT_MAX_AGE_DAYS"):
+            policy.max_age_days = float(os.environ["COMPANY_RESEARCH_ARTIFACT_MAX_AGE_DAYS"]) or None
+        if os.getenv("COMPANY_RESEARCH_ARTIFACT_MAX_MB"):
+            mb = float(os.environ["COMPANY_RESEARCH_ARTIFACT_MAX_MB"])
+            policy.max_bytes = int(mb * 1024 * 1024) or None
+        return policy
+
+
+@dataclass
+class Artifact:
+    id: int
+    company: str
+    kind: str
+    name: str
+    media_type: str
+    created_at: float
+    digest: str
+    size: int
+    stored_size: int
+    meta: Dict[str, Any]
+
+
+@dataclass
+class GcStats:
+    entries_removed: int
+    blobs_removed: int
+    bytes_freed: int
+
+    def format(self) -> str:
+        return (
+            f"Removed {self.entries_removed} entries and {self.blobs_removed} blobs "
+            f"({self.bytes_freed / 1024:.0f} KB freed)."
+        )
+
+
+class ArtifactStore:
+    """Blobs on disk plus the SQLite manifest that indexes them."""
+
+    _gc_lock = threading.Lock()
+    _last_gc: Dict[str, float] = {}
+
+    def __init__(self, root: Optional[str] = None, policy: Optional[RetentionPolicy] = None) -> None:
+        self.root = root or os.getenv("COMPANY_RESEARCH_ARTIFACTS_DIR", "data/artifacts")
+        self.policy = policy or RetentionPolicy.from_env()
+        self.db_path = os.path.join(self.root, "manifest.db")
+        os.makedirs(self.root, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _blob_path(self, digest: str, encoding: str) -> str:
+        suffix = ".gz" if encoding == "gzip" else ""
+        return os.path.join(self.root, "blobs", digest[:2], digest + suffix)
+
+    def _write_blob(self, db: sqlite3.Connection, data: bytes, media_type: str) -> tuple[str, int, int]:
+        digest = hashlib.sha256(data).hexdigest()
+        row = db.execute("SELECT size, stored_size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is not None:
+            return digest, row["size"], row["stored_size"]
+        encoding, stored = "identity", data
+        if media_type not in _COMPRESSED_TYPES:
+            packed = gzip.compress(data, compresslevel=6, mtime=0)
+            if len(packed) < len(data) * 0.9:
+                encoding, stored = "gzip", packed
+        atomic_write_bytes(self._blob_path(digest, encoding), stored)
+        # Another process may have stored the same blob since the SELECT;
+        # the encoding choice is deterministic, so its file is this one.
+        db.execute(
+            "INSERT OR IGNORE INTO blobs (digest, size, stored_size, encoding) VALUES (?, ?, ?, ?)",
+            (digest, len(data), len(stored), encoding),
+        )
+        return digest, len(data), len(stored)
+
+    def put(
+        self,
+        company: str,
+        kind: str,
+        data: Union[bytes, str],
+        name: str,
+        media_type: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Artifact:
+        """
+        Record a new version of (``company``, ``kind``).
+
+        Identical content is stored once; the manifest still records the new
+        version, so history and the latest pointer stay accurate.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        media_type = media_type or media_type_for(name)
+        key = topic_slug(company)
+        now = time.time()
+        with self._connect() as db:
+            digest, size, stored_size = self._write_blob(db, data, media_type)
+            cursor = db.execute(
+                "INSERT INTO artifacts (company, kind, name, media_type, created_at, digest, meta) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, name, media_type, now, digest, json.dumps(meta or {})),
+            )
+            artifact_id = cursor.lastrowid
+            db.execute(
+                "INSERT OR REPLACE INTO latest (company, kind, artifact_id) VALUES (?, ?, ?)",
+                (key, kind, artifact_id),
+            )
+        self._maybe_gc()
+        return Artifact(artifact_id, key, kind, name, media_type, now, digest, size, stored_size, meta or {})
+
+    @staticmethod
+    def _artifact(row: sqlite3.Row) -> Artifact:
+        return Artifact(
+            id=row["id"],
+            company=row["company"],
+            kind=row["kind"],
+            name=row["name"],
+            media_type=row["media_type"],
+            created_at=row["created_at"],
+            digest=row["digest"],
+            size=row["size"],
+            stored_size=row["stored_size"],
+            meta=json.loads(row["meta"] or "{}"),
+        )
+
+    _SELECT = (
+        "SELECT a.*, b.size, b.stored_size FROM artifacts a JOIN blobs b ON b.digest = a.digest"
+    )
+
+    def latest(self, company: str, kind: str) -> Optional[Artifact]:
+        """The newest version of (``company``, ``kind``): one primary-key lookup."""
+        with self._connect() as db:
+            row = db.execute(
+                f"{self._SELECT} JOIN latest l ON l.artifact_id = a.id "
+                "WHERE l.company = ? AND l.kind = ?",
+                (topic_slug(company), kind),
+            ).fetchone()
+        return self._artifact(row) if row else None
+
+    def history(self, company: str, kind: Optional[str] = None, limit: int = 20) -> List[Artifact]:
+        query = f"{self._SELECT} WHERE a.company = ?"
+        params: List[Any] = [topic_slug(company)]
+        if kind:
+            query += " AND a.kind = ?"
+            params.append(kind)
+        query += " ORDER BY a.created_at DESC, a.id DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as db:
+            return [self._artifact(row) for row in db.execute(query, params)]
+
+    def read(self, artifact: Artifact) -> bytes:
+        """The original bytes of ``artifact``."""
+        for encoding in ("gzip", "identity"):
+            path = self._blob_path(artifact.digest, encoding)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                return gzip.decompress(data) if encoding == "gzip" else data
+        raise FileNotFoundError(f"Blob {artifact.digest} is missing from {self.root}.")
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as db:
+            entries = db.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+            blobs, size, stored = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs"
+            ).fetchone()
+        return {"entries": entries, "blobs": blobs, "bytes": size, "stored_bytes": stored}
+
+    def gc(self, policy: Optional[RetentionPolicy] = None) -> GcStats:
+        """Apply the retention policy, then delete blobs nothing refers to."""
+        policy = policy or self.policy
+        removed = 0
+        with self._connect() as db:
+            protected = "id NOT IN (SELECT artifact_id FROM latest)"
+            removed += db.execute(
+                f"DELETE FROM artifacts WHERE {protected} AND id IN ("
+                "  SELECT id FROM ("
+                "    SELECT id, ROW_NUMBER() OVER ("
+                "      PARTITION BY company, kind ORDER BY created_at DESC, id DESC"
+                "    ) AS rank FROM artifacts"
+                "  ) WHERE rank > ?"
+                ")",
+                (max(policy.keep_last, 1),),
+            ).rowcount
+            if policy.max_age_days:
+                cutoff = time.time() - policy.max_age_days * 86400
+                removed += db.execute(
+                    f"DELETE FROM artifacts WHERE {protected} AND created_at < ?", (cutoff,)
+                ).rowcount
+            if policy.max_bytes:
+                total = db.execute(
+                    "SELECT COALESCE(SUM(stored_size), 0) FROM blobs "
+                    "WHERE digest IN (SELECT digest FROM artifacts)"
+                ).fetchone()[0]
+                candidates = db.execute(
+                    f"SELECT a.id, a.digest, b.stored_size FROM artifacts a "
+                    f"JOIN blobs b ON b.digest = a.digest WHERE a.{protected} "
+                    "ORDER BY a.created_at"
+                ).fetchall()
+                for row in candidates:
+                    if total <= policy.max_bytes:
+                        break
+                    db.execute("DELETE FROM artifacts WHERE id = ?", (row["id"],))
+                    removed += 1
+                    still_used = db.execute(
+                        "SELECT 1 FROM artifacts WHERE digest = ? LIMIT 1", (row["digest"],)
+                    ).fetchone()
+                    if still_used is None:
+                        total -= row["stored_size"]
+            orphans = db.execute(
+                "SELECT digest, stored_size, encoding FROM blobs "
+                "WHERE digest NOT IN (SELECT digest FROM artifacts)"
+            ).fetchall()
+            for row in orphans:
+                try:
+                    os.unlink(self._blob_path(row["digest"], row["encoding"]))
+                except FileNotFoundError:
+                    pass
+                db.execute("DELETE FROM blobs WHERE digest = ?", (row["digest"],))
+        stats = GcStats(removed, len(orphans), sum(row["stored_size"] for row in orphans))
+        if removed or orphans:
+            logger.info("Artifact GC: %s", stats.format())
+        return stats
+
+    def _maybe_gc(self) -> None:
+        with self._gc_lock:
+            now = time.monotonic()
+            last = self._last_gc.get(self.root)
+            if last is not None and now - last < GC_INTERVAL:
+                return
+            self._last_gc[self.root] = now
+        try:
+            self.gc()
+        except sqlite3.Error as exc:
+            logger.warning("Artifact GC failed: %s", exc)
+
+
+def publish(
+    store: ArtifactStore,
+    company: str,
+    kind: str,
+    data: Union[bytes, str],
+    view_path: str,
+    meta: Optional[Dict[str, Any]] = None,
+) -> Artifact:
+    """
+    Store a new version and refresh its human-facing view file.
+
+    The view (e.g. ``stock_reports/MSFT_1D.png``) is rewritten only when its
+    content changed, and atomically, so readers never see a partial file.
+    """
+    artifact = store.put(company, kind, data, os.path.basename(view_path), meta=meta)
+    raw = data.encode("utf-8") if isinstance(data, str) else data
+    try:
+        with open(view_path, "rb") as f:
+            unchanged = hashlib.sha256(f.read()).hexdigest() == artifact.digest
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        atomic_write_bytes(view_path, raw)
+    return artifact
+
+
+_default_store: Optional[ArtifactStore] = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> ArtifactStore:
+    """Process-wide store rooted at ``COMPANY_RESEARCH_ARTIFACTS_DIR``."""
+    global _default_store
+    with _default_lock:
+        root = os.getenv("COMPANY_RESEARCH_ARTIFACTS_DIR", "data/artifacts")
+        if _default_store is None or _default_store.root != root:
+            _default_store = ArtifactStore(root)
+        return _default_store
+
+
+def record_report(topic: str, content: str) -> None:
+    """Keep a version of ``topic``'s research report in the store."""
+    try:
+        default_store().put(topic, "report", content, f"{topic_slug(topic)}_report.md")
+    except (OSError, sqlite3.Error) as exc:
+        # History is a convenience; never fail a report over it.
+        logger.warning("Could not record report history for %s: %s", topic, exc)
+
+
+__all__ = [
+    "Artifact",
+    "ArtifactStore",
+    "GcStats",
+    "RetentionPolicy",
+    "default_store",
+    "media_type_for",
+    "publish",
+    "record_report",
+]
@@ -0,0 +1,112 @@
+"""Per-task checkpoints so a failed run can resume where it stopped.
+
+Each task of a run gets one JSON file under
+``data/checkpoints/<topic>/<task>.json`` holding its status, output and a
+hash of the inputs it ran with. Files are written atomically, so a crash mid
+write never leaves a checkpoint that looks complete.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from company_research.utils import atomic_write_text, topic_slug
+
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def inputs_hash(task_name: str, inputs: Dict[str, Any], template: str = "") -> str:
+    """Hash identifying a task run: its name, template and template inputs."""
+    payload = json.dumps(
+        {"task": task_name, "template": template, "inputs": inputs},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Checkpoint:
+    task: str
+    status: str
+    inputs_hash: str
+    output: str = ""
+    error: Optional[str] = None
+    updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+
+class CheckpointStore:
+    """Checkpoint files for one research topic."""
+
+    def __init__(self, topic: str, root: Optional[str] = None) -> None:
+        root = root or os.getenv("COMPANY_RESEARCH_CHECKPOINT_DIR", "data/checkpoints")
+        self.topic = topic
+        self.directory = os.path.join(root, topic_slug(topic))
+
+    def path(self, task_name: str) -> str:
+        return os.path.join(self.directory, f"{task_name}.json")
+
+    def load(self, task_name: str) -> Optional[Checkpoint]:
+        try:
+            with open(self.path(task_name), "r", encoding="utf-8") as f:
+                return Checkpoint(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        atomic_write_text(
+            self.path(checkpoint.task), json.dumps(asdict(checkpoint), indent=2)
+        )
+
+    def completed(self, task_name: str, expected_hash: str) -> Optional[Checkpoint]:
+        """The task's checkpoint if it completed with the same inputs."""
+        checkpoint = self.load(task_name)
+        if (
+            checkpoint
+            and checkpoint.status == COMPLETED
+            and checkpoint.inputs_hash == expected_hash
+        ):
+            return checkpoint
+        return None
+
+    def first_incomplete(
+        self, task_names: Sequence[str], hashes: Dict[str, str]
+    ) -> int:
+        """Index of the first task that must run again (len if all are done)."""
+        for index, name in enumerate(task_names):
+            if self.completed(name, hashes[name]) is None:
+                return index
+        return len(task_names)
+
+    def mark_completed(self, task_name: str, expected_hash: str, output: str) -> None:
+        self.save(Checkpoint(task_name, COMPLETED, expected_hash, output=output))
+
+    def mark_failed(self, task_name: str, expected_hash: str, error: str) -> None:
+        self.save(Checkpoint(task_name, FAILED, expected_hash, error=error))
+
+    def recorder(self, task_name: str, expected_hash: str) -> Callable[[Any], None]:
+        """Task callback that checkpoints the task's output as soon as it finishes."""
+
+        def _record(output: Any) -> None:
+            self.mark_completed(task_name, expected_hash, str(getattr(output, "raw", output)))
+
+        return _record
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+__all__ = [
+    "COMPLETED",
+    "FAILED",
+    "Checkpoint",
+    "CheckpointStore",
+    "inputs_hash",
+]
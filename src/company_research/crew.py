@@ -1,15 +1,11 @@
 from crewai import Agent, Crew, Process, Task
-from crewai.project import CrewBase, agent, crew, task, tool
+from crewai.project import CrewBase, agent, before_kickoff, crew, task, tool
 from crewai.agents.agent_builder.base_agent import BaseAgent
-from typing import List
-from company_research.tools.custom_tool import (
-    SerpApiTool,
-    WikipediaTool,
-    YahooFinanceTool,
-    GoogleTrendsTool,
-    NewsApiTool,
-    StockChartTool,
-)
+from typing import Any, Dict, Iterable, List, Optional
+from company_research.llm_routing import default_router
+from company_research.prefetch import PREFETCH_TASKS, prefetch_enabled, prefetched_inputs
+from company_research.token_budget import TaskBudgets
+from company_research.tools.registry import create_tool
 # If you want to run a snippet of code before or after the crew starts,
 # you can use the @before_kickoff and @after_kickoff decorators
 # https://docs.crewai.com/concepts/crews#example-crew-class-with-decorators
@@ -27,34 +23,62 @@ class CompanyResearch():
     
     # If you would like to add tools to your agents, you can learn more about it here:
     # https://docs.crewai.com/concepts/agents#agent-tools
+    def _routed_llm(self, task_name: str):
+        # Routes from config/models.yaml; None keeps the llm from agents.yaml.
+        return default_router().routed_llm(task_name)
+
+    @before_kickoff
+    def prefetch_data(
+        self, inputs: Optional[Dict[str, Any]], tasks: Iterable[str] = PREFETCH_TASKS
+    ) -> Optional[Dict[str, Any]]:
+        # Run the predictable tool calls concurrently before any agent starts
+        # and hand each task its results as {prefetched_<task>}.
+        if not inputs or "topic" not in inputs or not prefetch_enabled():
+            return inputs
+        budgets = TaskBudgets(self.tasks_config)
+        return {**inputs, **prefetched_inputs(inputs["topic"], tasks, budgets)}
+
     @tool
     def serp_api_tool(self):
-        return SerpApiTool()
+        return create_tool("serp_api_tool")
 
     @tool
     def wikipedia_tool(self):
-        return WikipediaTool()
+        return create_tool("wikipedia_tool")
 
     @tool
     def yahoo_finance_tool(self):
-        return YahooFinanceTool()
+        return create_tool("yahoo_finance_tool")
 
     @tool
     def google_trends_tool(self):
-        return GoogleTrendsTool()
+        return create_tool("google_trends_tool")
 
     @tool
     def news_api_tool(self):
-        return NewsApiTool()
+        return create_tool("news_api_tool")
 
     @tool
     def stock_chart_tool(self):
-        return StockChartTool()
+        return create_tool("stock_chart_tool")
+
+    @tool
+    def research_archive_tool(self):
+        return create_tool("research_archive_tool")
+
+    @tool
+    def live_stock_tool(self):
+        return create_tool("live_stock_tool")
+
+    @tool
+    def watchlist_tool(self):
+        return create_tool("watchlist_tool")
 
     @agent
     def company_info_agent(self) -> Agent:
         return Agent(
             config=self.agents_config['company_info_agent'], # type: ignore[index]
+            llm=self._routed_llm('gather_company_info'),
             verbose=True
         )
 
@@ -62,6 +86,7 @@ class CompanyResearch():
     def financial_analyst_agent(self) -> Agent:
         return Agent(
             config=self.agents_config['financial_analyst_agent'], # type: ignore[index]
+            llm=self._routed_llm('analyze_financials'),
             verbose=True
         )
 
@@ -69,18 +94,21 @@ class CompanyResearch():
     def market_analyst_agent(self) -> Agent:
         return Agent(
             config=self.agents_config['market_analyst_agent'], # type: ignore[index]
+            llm=self._routed_llm('analyze_market_position'),
             verbose=True
         )
     @agent
     def sentiment_agent(self) -> Agent:
         return Agent(
             config=self.agents_config['sentiment_agent'], # type: ignore[index]
+            llm=self._routed_llm('analyze_sentiment'),
             verbose=True
         )
     @agent
     def report_writer_agent(self) -> Agent:
         return Agent(
             config=self.agents_config['report_writer_agent'], # type: ignore[index]
+            llm=self._routed_llm('generate_report'),
             verbose=True
         )
 
@@ -97,7 +125,6 @@ class CompanyResearch():
     def analyze_financials(self) -> Task:
         return Task(
             config=self.tasks_config['analyze_financials'], # type: ignore[index]
-            output_file='report.md'
         )
 
     @task
@@ -124,6 +151,12 @@ class CompanyResearch():
             config=self.tasks_config['revise_report'], # type: ignore[index]
         )
 
+    @task
+    def rewrite_section(self) -> Task:
+        return Task(
+            config=self.tasks_config['rewrite_section'], # type: ignore[index]
+        )
+
     @crew
     def crew(self) -> Crew:
         """Creates the CompanyResearch crew"""
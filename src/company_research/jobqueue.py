@@ -0,0 +1,716 @@
+"""Durable job queue for research, revision and refresh jobs.
+
+The in-process ``ResearchService`` pool is bounded by one machine's LLM
+concurrency and memory. The queue lets any number of workers, on any number
+of hosts, pull jobs instead:
+
+- ``SQLiteQueue`` keeps jobs in a SQLite file (``data/queue.db``). It serves
+  one node, or several that share the file on a local disk.
+- ``HttpQueue`` is the client of a queue server (``serve_queue``), which
+  fronts a ``SQLiteQueue`` on one host. Workers on other hosts use it
+  through the same interface; run locally, it is also the stand-in for
+  testing multi-node setups. The server listens on 127.0.0.1 unless told
+  otherwise, and serving other hosts requires a shared token
+  (``COMPANY_RESEARCH_QUEUE_TOKEN``) that every request must carry.
+
+A worker leases a job for ``lease_seconds`` and renews the lease with
+heartbeats while it runs. A job whose lease lapses (the worker died) goes
+back to the queue, and a worker that finds its lease gone (another worker
+may already hold the job) cancels the run instead of writing more results.
+Failed attempts are retried with exponential backoff
+until ``max_attempts``, then the job is dead-lettered (status ``dead``) for
+inspection and ``retry``. Jobs are served by priority class (interactive,
+normal, batch) and then age; jobs on a topic that is already being worked on
+(compared by ``topic_slug``) wait, since they share report, checkpoint and
+task data files. Jobs on different topics write to separate files
+(``data/<topic_slug>/`` for task outputs) and run side by side.
+
+Workers write reports and charts where the pipeline always does. To share
+them between hosts, point ``reports/``, ``data/<topic_slug>/``,
+``COMPANY_RESEARCH_ARTIFACTS_DIR`` and ``COMPANY_RESEARCH_CHECKPOINT_DIR`` at
+shared storage; each finished job records the digest of its report in the
+artifact store.
+"""
+
+from __future__ import annotations
+
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from company_research.utils import topic_slug
+
+if TYPE_CHECKING:
+    from company_research.pipeline import ResearchPipeline
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("research", "revision", "refresh")
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+STATUSES = ("queued", "leased", "succeeded", "dead")
+TOKEN_ENV = "COMPANY_RESEARCH_QUEUE_TOKEN"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    feedback TEXT,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    error TEXT,
+    artifacts TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, created_at);
+"""
+
+
+@dataclass
+class QueuedJob:
+    id: str
+    kind: str
+    topic: str
+    feedback: Optional[str] = None
+    priority: int = PRIORITIES["normal"]
+    status: str = "queued"
+    attempts: int = 0
+    max_attempts: int = 3
+    not_before: float = 0.0
+    lease_owner: Optional[str] = None
+    lease_expires: Optional[float] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    error: Optional[str] = None
+    artifacts: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QueuedJob":
+        return cls(**data)
+
+
+def _priority(value: Any) -> int:
+    if isinstance(value, str):
+        if value not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{value}'. Choose from {', '.join(PRIORITIES)}.")
+        return PRIORITIES[value]
+    return int(value)
+
+
+def validate(kind: str, topic: str, feedback: Optional[str]) -> None:
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind '{kind}'. Choose from {', '.join(JOB_KINDS)}.")
+    if not topic:
+        raise ValueError("A topic is required.")
+    if kind == "revision" and not feedback:
+        raise ValueError("Revision jobs require feedback.")
+
+
+class JobQueue(ABC):
+    """Operations every queue backend provides."""
+
+    @abstractmethod
+    def enqueue(
+        self,
+        kind: str,
+        topic: str,
+        feedback: Optional[str] = None,
+        priority: Any = "normal",
+        max_attempts: int = 3,
+    ) -> QueuedJob:
+        ...
+
+    @abstractmethod
+    def lease(
+        self, worker: str, lease_seconds: float, kinds: Optional[Sequence[str]] = None
+    ) -> Optional[QueuedJob]:
+        """Claim the next ready job for ``worker``, or None if there is none."""
+
+    @abstractmethod
+    def heartbeat(
+        self, job_id: str, worker: str, lease_seconds: float, artifacts: Optional[Dict[str, str]] = None
+    ) -> bool:
+        """Extend ``worker``'s lease; False if the lease was lost."""
+
+    @abstractmethod
+    def complete(self, job_id: str, worker: str, artifacts: Optional[Dict[str, str]] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: str, worker: str, error: str) -> Optional[str]:
+        """Record a failed attempt; returns the new status ("queued" or "dead")."""
+
+    @abstractmethod
+    def retry(self, job_id: str) -> bool:
+        """Put a dead job back in the queue with fresh attempts."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[QueuedJob]:
+        ...
+
+    @abstractmethod
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[QueuedJob]:
+        ...
+
+
+class SQLiteQueue(JobQueue):
+    """Jobs in a SQLite file; every state change is one immediate transaction."""
+
+    def __init__(self, path: Optional[str] = None, retry_delay: Optional[float] = None) -> None:
+        self.path = path or os.getenv("COMPANY_RESEARCH_QUEUE_DB", "data/queue.db")
+        self.retry_delay = (
+            retry_delay if retry_delay is not None else float(os.getenv("COMPANY_RESEARCH_QUEUE_RETRY_DELAY", "30"))
+        )
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.executescript(_SCHEMA)
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.create_function("topic_slug", 1, topic_slug, deterministic=True)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            # IMMEDIATE takes the write lock up front, so two workers can
+            # never read the same ready job and both claim it.
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> QueuedJob:
+        data = dict(row)
+        data["artifacts"] = json.loads(data["artifacts"] or "{}")
+        return QueuedJob.from_dict(data)
+
+    def enqueue(
+        self,
+        kind: str,
+        topic: str,
+        feedback: Optional[str] = None,
+        priority: Any = "normal",
+        max_attempts: int = 3,
+    ) -> QueuedJob:
+        validate(kind, topic, feedback)
+        job = QueuedJob(
+            id=uuid.uuid4().hex[:12],
+            kind=kind,
+            topic=topic,
+            feedback=feedback,
+            priority=_priority(priority),
+            max_attempts=max(int(max_attempts), 1),
+        )
+        job.not_before = job.created_at
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, topic, feedback, priority, status, attempts, max_attempts, "
+                "not_before, created_at, updated_at, artifacts) VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?, '{}')",
+                (
+                    job.id, job.kind, job.topic, job.feedback, job.priority, job.status,
+                    job.max_attempts, job.not_before, job.created_at, job.updated_at,
+                ),
+            )
+        return job
+
+    def _reclaim_expired(self, db: sqlite3.Connection, now: float) -> None:
+        """Return jobs whose worker stopped heartbeating to the queue, or dead-letter them."""
+        for row in db.execute(
+            "SELECT id, attempts, max_attempts, lease_owner FROM jobs WHERE status = 'leased' AND lease_expires < ?",
+            (now,),
+        ).fetchall():
+            error = f"Lease held by {row['lease_owner']} expired."
+            status = "dead" if row["attempts"] >= row["max_attempts"] else "queued"
+            logger.warning("Job %s: %s Now %s.", row["id"], error, status)
+            db.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, error = ?, "
+                "not_before = ?, updated_at = ? WHERE id = ?",
+                (status, error, now, now, row["id"]),
+            )
+
+    def lease(
+        self, worker: str, lease_seconds: float, kinds: Optional[Sequence[str]] = None
+    ) -> Optional[QueuedJob]:
+        now = time.time()
+        kinds = list(kinds or JOB_KINDS)
+        with self._transaction() as db:
+            self._reclaim_expired(db, now)
+            row = db.execute(
+                f"SELECT * FROM jobs WHERE status = 'queued' AND not_before <= ? "
+                f"AND kind IN ({', '.join('?' for _ in kinds)}) "
+                "AND topic_slug(topic) NOT IN (SELECT topic_slug(topic) FROM jobs WHERE status = 'leased') "
+                "ORDER BY priority, created_at LIMIT 1",
+                (now, *kinds),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, updated_at = ? WHERE id = ?",
+                (worker, now + lease_seconds, now, row["id"]),
+            )
+            return self._job(db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def _owned(self, db: sqlite3.Connection, job_id: str, worker: str) -> Optional[sqlite3.Row]:
+        return db.execute(
+            "SELECT * FROM jobs WHERE id = ? AND status = 'leased' AND lease_owner = ?", (job_id, worker)
+        ).fetchone()
+
+    def heartbeat(
+        self, job_id: str, worker: str, lease_seconds: float, artifacts: Optional[Dict[str, str]] = None
+    ) -> bool:
+        now = time.time()
+        with self._transaction() as db:
+            row = self._owned(db, job_id, worker)
+            if row is None:
+                return False
+            merged = {**json.loads(row["artifacts"] or "{}"), **(artifacts or {})}
+            db.execute(
+                "UPDATE jobs SET lease_expires = ?, artifacts = ?, updated_at = ? WHERE id = ?",
+                (now + lease_seconds, json.dumps(merged), now, job_id),
+            )
+            return True
+
+    def complete(self, job_id: str, worker: str, artifacts: Optional[Dict[str, str]] = None) -> bool:
+        now = time.time()
+        with self._transaction() as db:
+            row = self._owned(db, job_id, worker)
+            if row is None:
+                return False
+            merged = {**json.loads(row["artifacts"] or "{}"), **(artifacts or {})}
+            db.execute(
+                "UPDATE jobs SET status = 'succeeded', lease_owner = NULL, lease_expires = NULL, "
+                "error = NULL, artifacts = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(merged), now, job_id),
+            )
+            return True
+
+    def fail(self, job_id: str, worker: str, error: str) -> Optional[str]:
+        now = time.time()
+        with self._transaction() as db:
+            row = self._owned(db, job_id, worker)
+            if row is None:
+                return None
+            if row["attempts"] >= row["max_attempts"]:
+                status, not_before = "dead", now
+            else:
+                status, not_before = "queued", now + self.retry_delay * 2 ** (row["attempts"] - 1)
+            db.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, error = ?, "
+                "not_before = ?, updated_at = ? WHERE id = ?",
+                (status, error, not_before, now, job_id),
+            )
+            return status
+
+    def retry(self, job_id: str) -> bool:
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, not_before = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'dead'",
+                (now, now, job_id),
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[QueuedJob]:
+        with self._transaction() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[QueuedJob]:
+        query, params = "SELECT * FROM jobs", []
+        if status:
+            query, params = query + " WHERE status = ?", [status]
+        with self._transaction() as db:
+            rows = db.execute(query + " ORDER BY created_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._transaction() as db:
+            rows = db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in STATUSES} | {row["status"]: row["n"] for row in rows}
+
+
+class HttpQueue(JobQueue):
+    """Client of a queue server (``serve_queue``) on another host."""
+
+    def __init__(
+        self, base_url: Optional[str] = None, timeout: float = 30.0, token: Optional[str] = None
+    ) -> None:
+        self.base_url = (base_url or os.getenv("COMPANY_RESEARCH_QUEUE_URL", "http://127.0.0.1:8766")).rstrip("/")
+        self.timeout = timeout
+        self.token = token or os.getenv(TOKEN_ENV)
+
+    def _call(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        import requests
+
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else None
+        response = requests.request(
+            method, f"{self.base_url}{path}", json=body, headers=headers, timeout=self.timeout
+        )
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        if response.status_code == 401:
+            raise RuntimeError(f"The queue server rejected the request; check {TOKEN_ENV}.")
+        if response.status_code == 400:
+            raise ValueError((payload or {}).get("error", response.text))
+        if response.status_code >= 500:
+            raise RuntimeError(f"Queue server error {response.status_code}: {response.text[:200]}")
+        return response.status_code, payload
+
+    def enqueue(
+        self,
+        kind: str,
+        topic: str,
+        feedback: Optional[str] = None,
+        priority: Any = "normal",
+        max_attempts: int = 3,
+    ) -> QueuedJob:
+        _, payload = self._call(
+            "POST",
+            "/queue/jobs",
+            {"kind": kind, "topic": topic, "feedback": feedback, "priority": priority, "max_attempts": max_attempts},
+        )
+        return QueuedJob.from_dict(payload)
+
+    def lease(
+        self, worker: str, lease_seconds: float, kinds: Optional[Sequence[str]] = None
+    ) -> Optional[QueuedJob]:
+        status, payload = self._call(
+            "POST", "/queue/lease", {"worker": worker, "lease_seconds": lease_seconds, "kinds": list(kinds or [])}
+        )
+        return QueuedJob.from_dict(payload) if status == 200 and payload else None
+
+    def heartbeat(
+        self, job_id: str, worker: str, lease_seconds: float, artifacts: Optional[Dict[str, str]] = None
+    ) -> bool:
+        status, _ = self._call(
+            "POST",
+            f"/queue/jobs/{job_id}/heartbeat",
+            {"worker": worker, "lease_seconds": lease_seconds, "artifacts": artifacts or {}},
+        )
+        return status == 200
+
+    def complete(self, job_id: str, worker: str, artifacts: Optional[Dict[str, str]] = None) -> bool:
+        status, _ = self._call(
+            "POST", f"/queue/jobs/{job_id}/complete", {"worker": worker, "artifacts": artifacts or {}}
+        )
+        return status == 200
+
+    def fail(self, job_id: str, worker: str, error: str) -> Optional[str]:
+        status, payload = self._call("POST", f"/queue/jobs/{job_id}/fail", {"worker": worker, "error": error})
+        return payload.get("status") if status == 200 and payload else None
+
+    def retry(self, job_id: str) -> bool:
+        status, _ = self._call("POST", f"/queue/jobs/{job_id}/retry")
+        return status == 200
+
+    def get(self, job_id: str) -> Optional[QueuedJob]:
+        status, payload = self._call("GET", f"/queue/jobs/{job_id}")
+        return QueuedJob.from_dict(payload) if status == 200 else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[QueuedJob]:
+        query = f"?limit={limit}" + (f"&status={status}" if status else "")
+        _, payload = self._call("GET", f"/queue/jobs{query}")
+        return [QueuedJob.from_dict(item) for item in payload or []]
+
+
+def default_queue() -> JobQueue:
+    """``HttpQueue`` when ``COMPANY_RESEARCH_QUEUE_URL`` is set, else the local ``SQLiteQueue``."""
+    if os.getenv("COMPANY_RESEARCH_QUEUE_URL"):
+        return HttpQueue()
+    return SQLiteQueue()
+
+
+class _QueueRequestHandler(BaseHTTPRequestHandler):
+    server_version = "CompanyResearchQueue/1.0"
+    queue: SQLiteQueue
+    token: Optional[str] = None
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: Any) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self) -> Tuple[Tuple[str, ...], Dict[str, str]]:
+        path, _, query = self.path.partition("?")
+        params = dict(part.split("=", 1) for part in query.split("&") if "=" in part)
+        return tuple(part for part in path.split("/") if part), params
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") or {}
+
+    def _authorized(self) -> bool:
+        """True if no token is required or the request carries it; answers 401 otherwise."""
+        if not self.token:
+            return True
+        scheme, _, supplied = (self.headers.get("Authorization") or "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(supplied.strip(), self.token):
+            return True
+        self._send(401, {"error": "Missing or wrong queue token."})
+        return False
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return
+        parts, params = self._route()
+        if parts == ("queue", "jobs"):
+            jobs = self.queue.list(params.get("status"), int(params.get("limit", 100)))
+            self._send(200, [job.to_dict() for job in jobs])
+        elif len(parts) == 3 and parts[:2] == ("queue", "jobs"):
+            job = self.queue.get(parts[2])
+            if job is None:
+                self._send(404, {"error": f"Unknown job '{parts[2]}'."})
+            else:
+                self._send(200, job.to_dict())
+        elif parts == ("queue", "health"):
+            self._send(200, {"status": "ok", "jobs": self.queue.counts()})
+        else:
+            self._send(404, {"error": "Not found."})
+
+    def do_POST(self) -> None:
+        if not self._authorized():
+            return
+        parts, _ = self._route()
+        try:
+            body = self._body()
+            if parts == ("queue", "jobs"):
+                job = self.queue.enqueue(
+                    body.get("kind", "research"),
+                    (body.get("topic") or "").strip(),
+                    body.get("feedback"),
+                    body.get("priority", "normal"),
+                    int(body.get("max_attempts", 3)),
+                )
+                self._send(201, job.to_dict())
+            elif parts == ("queue", "lease"):
+                job = self.queue.lease(body["worker"], float(body["lease_seconds"]), body.get("kinds") or None)
+                # An empty object means "nothing ready".
+                self._send(200, job.to_dict() if job else {})
+            elif len(parts) == 4 and parts[:2] == ("queue", "jobs"):
+                self._job_action(parts[2], parts[3], body)
+            else:
+                self._send(404, {"error": "Not found."})
+        except (ValueError, KeyError, TypeError) as exc:
+            self._send(400, {"error": str(exc)})
+
+    def _job_action(self, job_id: str, action: str, body: Dict[str, Any]) -> None:
+        if action == "heartbeat":
+            ok = self.queue.heartbeat(job_id, body["worker"], float(body["lease_seconds"]), body.get("artifacts"))
+        elif action == "complete":
+            ok = self.queue.complete(job_id, body["worker"], body.get("artifacts"))
+        elif action == "fail":
+            status = self.queue.fail(job_id, body["worker"], str(body.get("error", "")))
+            if status is None:
+                self._send(409, {"error": "Lease not held."})
+            else:
+                self._send(200, {"status": status})
+            return
+        elif action == "retry":
+            ok = self.queue.retry(job_id)
+        else:
+            self._send(404, {"error": "Not found."})
+            return
+        if ok:
+            self._send(200, {"ok": True})
+        else:
+            self._send(409, {"error": "Lease not held or job not retryable."})
+
+
+def _loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def make_queue_server(
+    queue: SQLiteQueue, host: str = "127.0.0.1", port: int = 8766, token: Optional[str] = None
+) -> ThreadingHTTPServer:
+    """
+    A queue server; with ``token`` every request must send ``Authorization: Bearer <token>``.
+
+    Listening beyond the loopback interface without a token is refused, as
+    anyone who can reach the port could otherwise enqueue, lease and fail jobs.
+    """
+    if not token and not _loopback(host):
+        raise ValueError(f"Set {TOKEN_ENV} to serve the queue on {host}; only 127.0.0.1 runs without a token.")
+    handler = type("QueueRequestHandler", (_QueueRequestHandler,), {"queue": queue, "token": token})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve_queue(
+    host: str = "127.0.0.1", port: int = 8766, path: Optional[str] = None, token: Optional[str] = None
+) -> None:
+    """Serve a ``SQLiteQueue`` to workers on other hosts until interrupted."""
+    server = make_queue_server(SQLiteQueue(path), host, port, token or os.getenv(TOKEN_ENV))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class Worker:
+    """Pulls jobs from a queue and runs them on warm pipelines, one per thread."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        concurrency: int = 1,
+        pipeline_factory: Optional[Callable[[], "ResearchPipeline"]] = None,
+        kinds: Optional[Sequence[str]] = None,
+        lease_seconds: float = 120.0,
+        poll_interval: float = 2.0,
+        name: Optional[str] = None,
+    ) -> None:
+        self.queue = queue
+        self.concurrency = max(concurrency, 1)
+        self.pipeline_factory = pipeline_factory
+        self.kinds = list(kinds) if kinds else None
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.stop = threading.Event()
+
+    def _new_pipeline(self) -> "ResearchPipeline":
+        if self.pipeline_factory is not None:
+            return self.pipeline_factory()
+        from company_research.pipeline import ResearchPipeline
+
+        return ResearchPipeline()
+
+    def run_one(self, slot: str, pipeline: "ResearchPipeline") -> Optional[QueuedJob]:
+        """Lease and run a single job; returns it, or None if the queue was empty."""
+        from company_research.limits import Cancelled, cancel_with
+        from company_research.service import perform
+
+        job = self.queue.lease(slot, self.lease_seconds, self.kinds)
+        if job is None:
+            return None
+        done = threading.Event()
+        lost = threading.Event()
+
+        def _beat() -> None:
+            # Renew at a third of the lease so one missed beat is harmless.
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    if not self.queue.heartbeat(job.id, slot, self.lease_seconds, dict(job.artifacts)):
+                        logger.warning("Lost the lease on job %s; cancelling it.", job.id)
+                        lost.set()
+                        return
+                except Exception as exc:
+                    logger.warning("Heartbeat for job %s failed: %s", job.id, exc)
+
+        beat = threading.Thread(target=_beat, name=f"heartbeat-{job.id}", daemon=True)
+        beat.start()
+        logger.info("%s running %s job %s on '%s' (attempt %d)", slot, job.kind, job.id, job.topic, job.attempts)
+        # Once the lease is gone another worker may own the job and its
+        # files, so the run stops at its next step instead of writing on.
+        cancel_with(lost)
+        try:
+            perform(pipeline, job.kind, job.topic, job.feedback, job.artifacts)
+            job.artifacts.update(_report_digest(job.topic))
+        except Cancelled:
+            job.status, job.error = "lost", "Lease lost while running."
+            return job
+        except Exception as exc:
+            logger.exception("Job %s failed", job.id)
+            job.status = self.queue.fail(job.id, slot, str(exc)) or "lost"
+            job.error = str(exc)
+            return job
+        finally:
+            cancel_with(None)
+            done.set()
+        job.status = "succeeded" if self.queue.complete(job.id, slot, job.artifacts) else "lost"
+        return job
+
+    def _loop(self, index: int) -> None:
+        slot = f"{self.name}/{index}"
+        pipeline = self._new_pipeline()
+        while not self.stop.is_set():
+            try:
+                job = self.run_one(slot, pipeline)
+            except Exception as exc:  # queue unreachable; keep polling
+                logger.warning("%s could not reach the queue: %s", slot, exc)
+                job = None
+            if job is None:
+                self.stop.wait(self.poll_interval)
+
+    def run_forever(self) -> None:
+        """Run ``concurrency`` worker threads until ``stop`` is set."""
+        threads = [
+            threading.Thread(target=self._loop, args=(i,), name=f"queue-worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+def _report_digest(topic: str) -> Dict[str, str]:
+    """Where the finished report lives in the (shared) artifact store."""
+    from company_research.artifacts import default_store
+
+    try:
+        artifact = default_store().latest(topic, "report")
+    except (OSError, sqlite3.Error):
+        return {}
+    return {"report_digest": artifact.digest} if artifact else {}
+
+
+__all__ = [
+    "JOB_KINDS",
+    "PRIORITIES",
+    "TOKEN_ENV",
+    "HttpQueue",
+    "JobQueue",
+    "QueuedJob",
+    "SQLiteQueue",
+    "Worker",
+    "default_queue",
+    "make_queue_server",
+    "serve_queue",
+    "validate",
+]
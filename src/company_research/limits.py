@@ -0,0 +1,248 @@
+"""Hard per-task limits on agent iterations, tool calls, wall time and tokens.
+
+Limits are declared under ``limits`` for an agent in ``agents.yaml`` and for
+a task in ``tasks.yaml``; task values override the agent's::
+
+    limits:
+      max_iterations: 8     # reasoning steps (LLM calls) per task
+      max_wall_time: 180    # seconds
+      max_tokens: 30000     # estimated prompt + completion tokens per task
+      tool_calls:           # calls per tool; "default" covers unlisted tools
+        default: 3
+        stock_chart_tool: 1
+
+The pipeline arms a ``TaskRun`` just before each task starts. Tool calls are
+charged through ``charge_tool`` (called by every ``ResearchTool``) and agent
+steps through ``on_step`` (the agents' step callback). Once any limit runs
+out, further tool calls are refused and the agent executor is pushed to
+CrewAI's "give your final answer now" path, so the task still finishes with
+what it has. The output is then marked partial with ``mark_partial``.
+
+Wall time and tokens are checked between steps, so one slow model or tool
+call can overrun them; model and provider timeouts bound that call.
+
+A run can also be cancelled from outside (a queue worker that lost its
+lease): ``cancel_with`` hands the thread an event, and once it is set the
+next step, tool call or task callback raises ``Cancelled``.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from company_research.token_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_PARTIAL = re.compile(r"\n*\[Partial result: ([^\]\n]*)\]\s*$")
+
+
+@dataclass
+class Limits:
+    max_iterations: Optional[int] = None
+    max_wall_time: Optional[float] = None
+    max_tokens: Optional[int] = None
+    tool_calls: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_config(cls, *configs: Optional[Dict[str, Any]]) -> "Limits":
+        """Merge ``limits`` blocks; later configs override earlier ones."""
+        limits = cls()
+        for config in configs:
+            block = (config or {}).get("limits") or {}
+            for key in ("max_iterations", "max_tokens"):
+                if block.get(key) is not None:
+                    setattr(limits, key, int(block[key]))
+            if block.get("max_wall_time") is not None:
+                limits.max_wall_time = float(block["max_wall_time"])
+            limits.tool_calls.update({k: int(v) for k, v in (block.get("tool_calls") or {}).items()})
+        return limits
+
+    def tool_limit(self, tool_name: str) -> Optional[int]:
+        return self.tool_calls.get(tool_name, self.tool_calls.get("default"))
+
+
+class TaskLimits:
+    """Limits per task from the ``limits`` keys in agents.yaml and tasks.yaml."""
+
+    def __init__(
+        self,
+        agents_config: Dict[str, Dict[str, Any]],
+        tasks_config: Dict[str, Dict[str, Any]],
+    ) -> None:
+        self._agents = agents_config
+        self._tasks = tasks_config
+
+    def get(self, task: str, agent: Optional[str]) -> Limits:
+        return Limits.from_config(self._agents.get(agent or ""), self._tasks.get(task))
+
+
+class TaskRun:
+    """Usage of one task execution against its limits."""
+
+    def __init__(self, task: str, limits: Limits, agent: Any = None) -> None:
+        self.task = task
+        self.limits = limits
+        self.agent = agent
+        self.started = time.monotonic()
+        self.steps = 0
+        self.tokens = 0
+        self.tool_counts: Dict[str, int] = {}
+        self.exhausted: Optional[str] = None
+        # The shared agent's own max_iter, put back by ``restore``.
+        self.original_max_iter = getattr(agent, "max_iter", None)
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def _exhaust(self, reason: str) -> None:
+        if self.exhausted is None:
+            self.exhausted = reason
+            logger.warning("%s: %s; forcing a final answer.", self.task, reason)
+        # The executor asks for a final answer once iterations reach max_iter.
+        executor = getattr(self.agent, "agent_executor", None)
+        if executor is not None:
+            executor.max_iter = 0
+
+    def _check_shared(self) -> None:
+        limits = self.limits
+        if limits.max_wall_time is not None and self.elapsed() >= limits.max_wall_time:
+            self._exhaust(f"wall time budget of {limits.max_wall_time:.0f}s used up")
+        elif limits.max_tokens is not None and self.tokens >= limits.max_tokens:
+            self._exhaust(f"token budget of {limits.max_tokens} used up")
+        elif limits.max_iterations is not None and self.steps >= limits.max_iterations:
+            self._exhaust(f"iteration budget of {limits.max_iterations} steps used up")
+
+    def charge_tool(self, tool_name: str) -> Optional[str]:
+        """Count a call to ``tool_name``; returns a refusal if it is over budget."""
+        with self._lock:
+            self._check_shared()
+            if self.exhausted is not None:
+                return (
+                    f"No more tool calls are allowed: the {self.exhausted}. "
+                    "Give your final answer now from the information gathered."
+                )
+            limit = self.limits.tool_limit(tool_name)
+            used = self.tool_counts.get(tool_name, 0)
+            if limit is not None and used >= limit:
+                return (
+                    f"{tool_name} has already been used {used} time(s), its limit for this task. "
+                    "Use another tool or give your final answer from what you have."
+                )
+            self.tool_counts[tool_name] = used + 1
+            return None
+
+    def on_step(self, step: Any) -> None:
+        """Count one agent step and the tokens it used."""
+        executor = getattr(self.agent, "agent_executor", None)
+        prompt = sum(
+            estimate_tokens(str(m.get("content", "")))
+            for m in getattr(executor, "messages", None) or []
+            if isinstance(m, dict)
+        )
+        with self._lock:
+            self.steps += 1
+            self.tokens += prompt + estimate_tokens(str(getattr(step, "text", "") or ""))
+            self._check_shared()
+
+    def restore(self) -> None:
+        """Give the agent back the ``max_iter`` it had before this run."""
+        if self.agent is not None and self.original_max_iter is not None:
+            self.agent.max_iter = self.original_max_iter
+
+    def summary(self) -> str:
+        calls = ", ".join(f"{name}×{count}" for name, count in self.tool_counts.items()) or "no tools"
+        return f"{self.steps} steps, ~{self.tokens} tokens, {calls}, {self.elapsed():.1f}s"
+
+
+# Tasks run sequentially on the kickoff thread, which also runs their tools
+# and step callbacks.
+_active = threading.local()
+
+
+def arm(task: str, limits: Limits, agent: Any = None) -> TaskRun:
+    """Start tracking ``task`` on this thread, ending the run tracked before it."""
+    disarm()
+    run = TaskRun(task, limits, agent)
+    if agent is not None and limits.max_iterations is not None:
+        agent.max_iter = limits.max_iterations
+    _active.run = run
+    return run
+
+
+def active_run() -> Optional[TaskRun]:
+    return getattr(_active, "run", None)
+
+
+def disarm() -> Optional[TaskRun]:
+    """Stop tracking the current run and undo its changes to the agent."""
+    run = active_run()
+    _active.run = None
+    if run is not None:
+        run.restore()
+    return run
+
+
+class Cancelled(RuntimeError):
+    """Raised on a thread whose run was cancelled through ``cancel_with``."""
+
+
+def cancel_with(event: Optional[threading.Event]) -> None:
+    """Cancel this thread's runs once ``event`` is set; None stops watching."""
+    _active.cancel = event
+
+
+def check_cancelled() -> None:
+    event = getattr(_active, "cancel", None)
+    if event is not None and event.is_set():
+        raise Cancelled("The run was cancelled.")
+
+
+def charge_tool(tool_name: str) -> Optional[str]:
+    check_cancelled()
+    run = active_run()
+    return run.charge_tool(tool_name) if run is not None else None
+
+
+def on_step(step: Any) -> None:
+    check_cancelled()
+    run = active_run()
+    if run is not None:
+        run.on_step(step)
+
+
+def mark_partial(text: str, reason: str) -> str:
+    """Append the partial-result marker that ``split_partial`` reads back."""
+    text, _ = split_partial(text)
+    return f"{text.rstrip()}\n\n[Partial result: {reason}]"
+
+
+def split_partial(text: str) -> Tuple[str, Optional[str]]:
+    """(text without the marker, reason) for a possibly partial task output."""
+    match = _PARTIAL.search(text)
+    if match is None:
+        return text, None
+    return text[: match.start()], match.group(1)
+
+
+__all__ = [
+    "Cancelled",
+    "Limits",
+    "TaskLimits",
+    "TaskRun",
+    "active_run",
+    "arm",
+    "cancel_with",
+    "charge_tool",
+    "check_cancelled",
+    "disarm",
+    "mark_partial",
+    "on_step",
+    "split_partial",
+]
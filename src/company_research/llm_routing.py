@@ -0,0 +1,376 @@
+"""Per-task model routing with fallback chains and hedged requests.
+
+``config/models.yaml`` maps each task to an ordered chain of models. A
+``RoutedLLM`` tries them in order, moving on when a model errors, is rate
+limited, times out or returns an empty response. With hedging enabled, a
+second model is fired when the first hasn't answered within its observed p95
+latency, and whichever answers first wins.
+
+Models can point at any OpenAI-compatible endpoint through ``base_url``, which
+is how the chain is exercised against the local stub server in ``llm_stub``.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+import yaml
+from crewai.llms.base_llm import BaseLLM
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config", "models.yaml")
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per model."""
+
+    def __init__(self, window: int = 200) -> None:
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self._window)).append(seconds)
+
+    def percentile(self, model: str, pct: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+# Shared by every router in the process so latency history survives across
+# crews, agents and (in the service) jobs.
+LATENCIES = LatencyTracker()
+
+
+@dataclass
+class RoutePolicy:
+    chain: List[str]
+    timeout: float = 60.0
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    hedge_min_samples: int = 20
+    # Used until enough latency samples exist to compute the percentile.
+    hedge_after: Optional[float] = None
+
+
+@dataclass
+class ModelSpec:
+    model: str
+    base_url: Optional[str] = None
+    api_key_env: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def build(self, timeout: float) -> BaseLLM:
+        from crewai import LLM
+
+        kwargs: Dict[str, Any] = dict(self.extra)
+        if self.base_url:
+            kwargs["base_url"] = self.base_url
+        if self.api_key_env:
+            kwargs["api_key"] = os.getenv(self.api_key_env)
+        elif self.base_url:
+            # OpenAI-compatible stubs still expect some key to be present.
+            kwargs.setdefault("api_key", "stub")
+        return LLM(model=self.model, timeout=timeout, **kwargs)
+
+
+def _classify(exc: Optional[BaseException]) -> str:
+    if exc is None:
+        return "empty response"
+    text = f"{type(exc).__name__} {exc}".lower()
+    if "ratelimit" in text or "rate limit" in text or "429" in text:
+        return "rate limited"
+    if "timeout" in text or "timed out" in text:
+        return "timed out"
+    return "error"
+
+
+class RoutedLLM(BaseLLM):
+    """An LLM that routes each call to the chain configured for its task."""
+
+    def __init__(self, router: "ModelRouter", default_task: str) -> None:
+        policy = router.policy(default_task)
+        super().__init__(model=policy.chain[0])
+        self.router = router
+        self.default_task = default_task
+
+    def _policy_for(self, from_task: Any) -> RoutePolicy:
+        name = getattr(from_task, "name", None) if from_task is not None else None
+        if name and self.router.has_route(name):
+            return self.router.policy(name)
+        return self.router.policy(self.default_task)
+
+    def call(
+        self,
+        messages: Any,
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        from_task: Any = None,
+        from_agent: Any = None,
+    ) -> Any:
+        policy = self._policy_for(from_task)
+        kwargs = dict(
+            tools=tools,
+            callbacks=callbacks,
+            available_functions=available_functions,
+            from_task=from_task,
+            from_agent=from_agent,
+        )
+        chain = policy.chain
+        last_error: Optional[BaseException] = None
+        index = 0
+        while index < len(chain):
+            primary = chain[index]
+            backup = chain[index + 1] if policy.hedge and index + 1 < len(chain) else None
+            result, error = self._attempt(policy, primary, backup, messages, kwargs)
+            if result:
+                return result
+            last_error = error or last_error
+            index += 2 if backup else 1
+        if last_error is not None:
+            raise last_error
+        return None
+
+    def _submit(
+        self,
+        policy: RoutePolicy,
+        model: str,
+        messages: Any,
+        kwargs: Dict[str, Any],
+        abandoned: threading.Event,
+    ) -> Future:
+        return self.router.executor.submit(
+            self._call_model, policy, model, messages, kwargs, abandoned
+        )
+
+    def _attempt(
+        self,
+        policy: RoutePolicy,
+        primary: str,
+        backup: Optional[str],
+        messages: Any,
+        kwargs: Dict[str, Any],
+    ) -> tuple[Any, Optional[BaseException]]:
+        """
+        Call ``primary``, hedging with ``backup`` if it is slow or fails.
+
+        Returns (result, last error); a falsy result means every attempted
+        model failed and the caller should move further down the chain.
+        Calls still running when the attempt ends (timed out, or the losing
+        side of a hedge) are abandoned: queued ones are cancelled, and the
+        late answers of running ones are dropped.
+        """
+        abandoned = threading.Event()
+        try:
+            return self._race(policy, primary, backup, messages, kwargs, abandoned)
+        finally:
+            abandoned.set()
+
+    def _race(
+        self,
+        policy: RoutePolicy,
+        primary: str,
+        backup: Optional[str],
+        messages: Any,
+        kwargs: Dict[str, Any],
+        abandoned: threading.Event,
+    ) -> tuple[Any, Optional[BaseException]]:
+        futures: Dict[Future, str] = {
+            self._submit(policy, primary, messages, kwargs, abandoned): primary
+        }
+        deadline = time.monotonic() + policy.timeout
+        hedge_after = self.router.hedge_delay(policy, primary) if backup else None
+        error: Optional[BaseException] = None
+        while futures:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                error = TimeoutError(
+                    f"{', '.join(futures.values())} did not answer within {policy.timeout}s"
+                )
+                logger.warning("Model call timed out: %s", error)
+                for future in futures:
+                    future.cancel()
+                return None, error
+            hedge_pending = backup is not None and backup not in futures.values()
+            timeout = remaining
+            if hedge_pending and hedge_after is not None:
+                timeout = min(timeout, hedge_after)
+            done, _ = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if hedge_pending and hedge_after is not None:
+                    logger.info("Hedging %s with %s after %.2fs", primary, backup, hedge_after)
+                    futures[self._submit(policy, backup, messages, kwargs, abandoned)] = backup
+                    hedge_after = None
+                continue
+            for future in done:
+                model = futures.pop(future)
+                exc = future.exception()
+                result = None if exc else future.result()
+                if result:
+                    for other in futures:
+                        other.cancel()
+                    return result, None
+                error = exc or error
+                logger.warning("Model %s failed (%s); falling back.", model, _classify(exc))
+                if model == primary and backup is not None and backup not in futures.values():
+                    futures[self._submit(policy, backup, messages, kwargs, abandoned)] = backup
+                    backup = None
+        return None, error
+
+    def _call_model(
+        self,
+        policy: RoutePolicy,
+        model: str,
+        messages: Any,
+        kwargs: Dict[str, Any],
+        abandoned: threading.Event,
+    ) -> Any:
+        if abandoned.is_set():
+            return None
+        llm = self.router.llm(model, policy.timeout)
+        llm.stop = self.stop
+        started = time.monotonic()
+        result = llm.call(messages, **kwargs)
+        if abandoned.is_set():
+            # Nobody is waiting for this answer any more.
+            logger.debug("Dropping the late answer of abandoned call to %s", model)
+            return None
+        if result:
+            LATENCIES.record(model, time.monotonic() - started)
+        return result
+
+    def supports_function_calling(self) -> bool:
+        policy = self.router.policy(self.default_task)
+        return self.router.llm(self.model, policy.timeout).supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        policy = self.router.policy(self.default_task)
+        return min(self.router.llm(m, policy.timeout).get_context_window_size() for m in policy.chain)
+
+
+class ModelRouter:
+    """Routing policies from ``models.yaml`` plus the LLM clients they use."""
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        self.defaults: Dict[str, Any] = dict(config.get("defaults") or {})
+        self.models: Dict[str, ModelSpec] = {}
+        for alias, spec in (config.get("models") or {}).items():
+            spec = dict(spec)
+            self.models[alias] = ModelSpec(
+                model=spec.pop("model", alias),
+                base_url=spec.pop("base_url", None),
+                api_key_env=spec.pop("api_key_env", None),
+                extra=spec,
+            )
+        self.routes: Dict[str, Dict[str, Any]] = dict(config.get("tasks") or {})
+        # Abandoned calls keep their thread until the client's own timeout, so
+        # a call that runs down a whole chain can hold one thread per model.
+        longest = max((len(route.get("chain") or ()) for route in self.routes.values()), default=1)
+        max_workers = int(self.defaults.get("max_workers") or 2 * max(longest, 1))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._clients: Dict[tuple[str, float], BaseLLM] = {}
+        self._lock = threading.Lock()
+
+    def close(self, wait: bool = True) -> None:
+        """Cancel queued model calls and stop the pool, waiting for running ones if ``wait``."""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    @classmethod
+    def from_config(cls, path: Optional[str] = None) -> "ModelRouter":
+        path = path or os.getenv("COMPANY_RESEARCH_MODELS_CONFIG", DEFAULT_CONFIG_PATH)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            config = {}
+        return cls(config)
+
+    def has_route(self, task: str) -> bool:
+        return bool((self.routes.get(task) or {}).get("chain"))
+
+    def policy(self, task: str) -> RoutePolicy:
+        settings = {**self.defaults, **(self.routes.get(task) or {})}
+        chain = list(settings.get("chain") or [])
+        if not chain:
+            raise KeyError(f"No model chain configured for task '{task}'.")
+        return RoutePolicy(
+            chain=chain,
+            timeout=float(settings.get("timeout", 60)),
+            hedge=bool(settings.get("hedge", False)),
+            hedge_percentile=float(settings.get("hedge_percentile", 95)),
+            hedge_min_samples=int(settings.get("hedge_min_samples", 20)),
+            hedge_after=settings.get("hedge_after"),
+        )
+
+    def hedge_delay(self, policy: RoutePolicy, model: str) -> Optional[float]:
+        observed = LATENCIES.percentile(model, policy.hedge_percentile, policy.hedge_min_samples)
+        if observed is not None:
+            return observed
+        return float(policy.hedge_after) if policy.hedge_after is not None else None
+
+    def llm(self, model: str, timeout: float) -> BaseLLM:
+        """Cached client for a model alias (from ``models:``) or a litellm model id."""
+        key = (model, timeout)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                spec = self.models.get(model) or ModelSpec(model=model)
+                client = spec.build(timeout)
+                self._clients[key] = client
+            return client
+
+    def routed_llm(self, default_task: str) -> Optional[RoutedLLM]:
+        """
+        A routed LLM for the agent whose main task is ``default_task``.
+
+        Each call is routed by the task being executed, so one agent serving
+        several tasks (the report writer) uses each task's own chain. Returns
+        None when ``default_task`` has no route, leaving the agent's own
+        ``llm`` from agents.yaml in place.
+        """
+        if not self.has_route(default_task):
+            return None
+        return RoutedLLM(self, default_task)
+
+
+_default_router: Optional[ModelRouter] = None
+_default_router_lock = threading.Lock()
+
+
+def default_router() -> ModelRouter:
+    """Process-wide router, so model clients and latency history are shared."""
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter.from_config()
+            atexit.register(_default_router.close, wait=False)
+        return _default_router
+
+
+__all__ = [
+    "LATENCIES",
+    "LatencyTracker",
+    "ModelRouter",
+    "ModelSpec",
+    "RoutePolicy",
+    "RoutedLLM",
+    "default_router",
+]
@@ -0,0 +1,117 @@
+"""A local OpenAI-compatible stub server for exercising model routing.
+
+Point model aliases in ``models.yaml`` at it with ``base_url`` and the
+fallback chains and hedging in ``llm_routing`` run against scripted failures
+instead of real providers. The model name picks the behaviour:
+
+- ``stub-429``          answers 429 (rate limited)
+- ``stub-error``        answers 500
+- ``stub-empty``        answers with empty content
+- ``stub-slow-<secs>``  waits ``secs`` seconds, then answers
+- anything else         answers ``"stub answer from <model>"``
+
+Requests per model are counted in ``server.calls``, so tests can check which
+models a routed call reached.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+_SLOW = re.compile(r"stub-slow-(\d+(?:\.\d+)?)$")
+
+
+def stub_reply(model: str) -> str:
+    return f"stub answer from {model}"
+
+
+def _completion(model: str, content: str) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    server_version = "CompanyResearchStubLLM/1.0"
+    calls: Counter
+    calls_lock: threading.Lock
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: Any) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self) -> None:
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "Not found.", "type": "invalid_request_error"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        model = str(body.get("model", "")).split("/")[-1]
+        with self.calls_lock:
+            self.calls[model] += 1
+
+        if model == "stub-429":
+            self._send(
+                429,
+                {"error": {"message": "Rate limit exceeded.", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+            )
+        elif model == "stub-error":
+            self._send(500, {"error": {"message": "Stub server error.", "type": "server_error"}})
+        elif model == "stub-empty":
+            self._send(200, _completion(model, ""))
+        else:
+            slow = _SLOW.match(model)
+            if slow:
+                time.sleep(float(slow.group(1)))
+            try:
+                self._send(200, _completion(model, stub_reply(model)))
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client gave up waiting.
+
+
+def make_stub_server(host: str = "127.0.0.1", port: int = 8999) -> ThreadingHTTPServer:
+    """A stub server (``port`` 0 picks a free one); requests per model in ``server.calls``."""
+    calls: Counter = Counter()
+    handler = type(
+        "StubRequestHandler", (_StubRequestHandler,), {"calls": calls, "calls_lock": threading.Lock()}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.calls = calls  # type: ignore[attr-defined]
+    return server
+
+
+def serve_stub(host: str = "127.0.0.1", port: int = 8999) -> None:
+    """Serve stub completions until interrupted."""
+    server = make_stub_server(host, port)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+__all__ = ["make_stub_server", "serve_stub", "stub_reply"]
@@ -1,13 +1,10 @@
 #!/usr/bin/env python
 import sys
+import time
 import warnings
 import os
 import json
 
-from datetime import datetime
-
-from company_research.crew import CompanyResearch
-from crewai import Crew, Process
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -18,130 +15,34 @@ warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 # Replace with inputs you want to test with, it will automatically
 # interpolate any tasks and agents information
 
-def read_report(report_path):
-    """Read the generated report file."""
-    try:
-        if os.path.exists(report_path):
-            with open(report_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        return None
-    except Exception as e:
-        print(f"Error reading report: {e}")
-        return None
-
-def read_feedback_file(feedback_path):
-    """Read the feedback file."""
-    try:
-        if os.path.exists(feedback_path):
-            with open(feedback_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        return ""
-    except Exception as e:
-        print(f"Error reading feedback file: {e}")
-        return ""
-
-def append_to_feedback_file(feedback_path, new_section):
-    """Append a new feedback section to the feedback file."""
-    try:
-        os.makedirs(os.path.dirname(feedback_path), exist_ok=True)
-        # Read existing feedback
-        existing_feedback = read_feedback_file(feedback_path)
-        
-        # Append new section
-        if existing_feedback:
-            updated_feedback = existing_feedback.rstrip() + "\n\n" + new_section + "\n"
-        else:
-            updated_feedback = new_section + "\n"
-        
-        # Write back
-        with open(feedback_path, 'w', encoding='utf-8') as f:
-            f.write(updated_feedback)
-        return True
-    except Exception as e:
-        print(f"Error writing to feedback file: {e}")
-        return False
-
-def get_combined_report(report_path, feedback_path):
-    """Get the combined report with all feedback."""
-    report_content = read_report(report_path)
-    feedback_content = read_feedback_file(feedback_path)
-    
-    if not report_content:
-        return None
-    
-    # Clean up report content (remove markdown code blocks if present)
-    content = report_content.strip()
-    if content.startswith("```markdown"):
-        content = content[11:].strip()
-    if content.startswith("```"):
-        content = content[3:].strip()
-    if content.endswith("```"):
-        content = content[:-3].strip()
-    
-    # Combine report and feedback
-    if feedback_content:
-        return content + "\n\n" + feedback_content
-    return content
-
 def run():
     """
     Run the crew with feedback loop.
     """
+    # Imported here so that lightweight commands don't pay for crewai's startup.
+    from company_research.pipeline import (
+        ResearchPipeline,
+        data_dir,
+        read_text,
+        report_path as report_path_for,
+        strip_code_fence,
+    )
+    from company_research.sections import targeted_sources
+    from company_research.speculation import Speculator, speculation_enabled
+
     company = input("Search the company :")
-    inputs = {
-        'topic': company,
-        'current_year': str(datetime.now().year)
-    }
-    
+
     try:
         # Initial crew run to generate the report
         print("\n" + "="*50)
         print("Generating initial report...")
         print("="*50 + "\n")
-        
-        crew_instance = CompanyResearch()
-        
-        # Get agents by calling the agent methods directly
-        company_info_agent = crew_instance.company_info_agent()
-        financial_analyst_agent = crew_instance.financial_analyst_agent()
-        market_analyst_agent = crew_instance.market_analyst_agent()
-        sentiment_agent = crew_instance.sentiment_agent()
-        report_writer_agent = crew_instance.report_writer_agent()
-        
-        agents_list = [
-            company_info_agent,
-            financial_analyst_agent,
-            market_analyst_agent,
-            sentiment_agent,
-            report_writer_agent
-        ]
-        
-        # Get tasks by calling the task methods directly
-        gather_info_task = crew_instance.gather_company_info()
-        analyze_financials_task = crew_instance.analyze_financials()
-        analyze_market_task = crew_instance.analyze_market_position()
-        analyze_sentiment_task = crew_instance.analyze_sentiment()
-        generate_report_task = crew_instance.generate_report()
-        revise_task = crew_instance.revise_report()
-        
-        # Initial tasks (all except revise_report)
-        initial_tasks = [
-            gather_info_task,
-            analyze_financials_task,
-            analyze_market_task,
-            analyze_sentiment_task,
-            generate_report_task
-        ]
-        
-        initial_crew = Crew(
-            agents=agents_list,
-            tasks=initial_tasks,
-            process=Process.sequential,
-            verbose=True,
-        )
-        
+
+        pipeline = ResearchPipeline()
+        started = time.time()
+
         try:
-            result = initial_crew.kickoff(inputs=inputs)
+            result = pipeline.research(company)
         except (ValueError, IndexError, Exception) as e:
             error_msg = str(e)
             if "Invalid response from LLM" in error_msg or "list index out of range" in error_msg:
@@ -149,10 +50,10 @@ def run():
                 print("Attempting to continue with partial results...")
                 
                 # Create default financials.json if it doesn't exist and task failed
-                financials_path = "data/financials.json"
+                financials_path = os.path.join(data_dir(company), "financials.json")
                 if not os.path.exists(financials_path):
                     print("Creating default financials.json file...")
-                    os.makedirs("data", exist_ok=True)
+                    os.makedirs(data_dir(company), exist_ok=True)
                     default_financials = {
                         "note": "Financial data tools were unavailable due to rate limiting or errors.",
                         "analysis": f"Unable to retrieve real-time financial data for {company}. This may be a private company or the financial data tools encountered issues.",
@@ -162,34 +63,32 @@ def run():
                         json.dump(default_financials, f, indent=2)
                     print("✓ Default financials.json created.")
                 
-                # Check if report was generated despite the error
-                report_path = f"reports/{company}_report.md"
-                if os.path.exists(report_path):
+                # Check if this run finalized the report despite the error; a
+                # report from an earlier run doesn't count.
+                report_path = report_path_for(company)
+                if os.path.exists(report_path) and os.path.getmtime(report_path) >= started:
                     print("✓ Report file found. Proceeding to feedback loop...")
                 else:
                     print("✗ Report not generated. Please try again or check your API keys.")
+                    print(f"Completed tasks were checkpointed; run `replay \"{company}\"` to resume from the failed task.")
                     raise Exception(f"Failed to generate report: {e}")
             else:
                 raise
         
         # Feedback loop
-        report_path = f"reports/{company}_report.md"
-        feedback_path = f"reports/{company}_feedback.md"
+        report_path = report_path_for(company)
         max_iterations = 10  # Prevent infinite loops
         iteration = 0
+        # Drafts common revisions in the background while the report is read.
+        speculator = Speculator(company) if speculation_enabled() else None
         
         while iteration < max_iterations:
             # Read and display the main report (which already contains all merged feedback)
-            report_content = read_report(report_path)
+            report_content = read_text(report_path)
+            if report_content and speculator is not None:
+                speculator.start(report_content)
             if report_content:
-                # Clean up report content (remove markdown code blocks if present)
-                content = report_content.strip()
-                if content.startswith("```markdown"):
-                    content = content[11:].strip()
-                if content.startswith("```"):
-                    content = content[3:].strip()
-                if content.endswith("```"):
-                    content = content[:-3].strip()
+                content = strip_code_fence(report_content)
                 
                 print("\n" + "="*50)
                 print("CURRENT REPORT (with all feedback merged):")
@@ -204,6 +103,8 @@ def run():
             feedback = input("\nPlease provide your feedback on the report (or press Enter to finish): ").strip()
             
             if not feedback:
+                if speculator is not None:
+                    speculator.discard()
                 print("\nReport finalized. All feedback has been merged into the main report.")
                 print("Thank you for your feedback!")
                 break
@@ -213,113 +114,35 @@ def run():
             print("Incorporating your feedback...")
             print("="*50 + "\n")
             
-            # IMPORTANT: Read the current report content BEFORE running the crew
-            # This ensures we preserve the original content even if CrewAI tries to write to the file
-            current_report_before = read_report(report_path)
-            if not current_report_before:
-                print("⚠️  Warning: Could not read current report. Skipping feedback incorporation.")
-                iteration += 1
-                continue
-            
-            revision_inputs = {
-                'topic': company,
-                'current_year': str(datetime.now().year),
-                'user_feedback': feedback
-            }
-            
-            # Create a revision crew with only the revise_report task
-            if revise_task:
-                revision_crew = Crew(
-                    agents=agents_list,
-                    tasks=[revise_task],
-                    process=Process.sequential,
-                    verbose=True,
-                )
-                try:
-                    result = revision_crew.kickoff(inputs=revision_inputs)
-                    
-                    # Extract the new section from the result
-                    new_section = None
-                    output = ""
-                    
-                    # Try different ways to extract the output
-                    if hasattr(result, 'raw'):
-                        output = str(result.raw)
-                    elif hasattr(result, 'output'):
-                        output = str(result.output)
-                    elif hasattr(result, 'tasks_output'):
-                        # Get output from the task
-                        if result.tasks_output:
-                            output = str(result.tasks_output[-1]) if isinstance(result.tasks_output, list) else str(result.tasks_output)
-                    else:
-                        output = str(result) if result else ""
-                    
-                    # Extract markdown content if wrapped in code blocks
-                    if "```markdown" in output:
-                        start = output.find("```markdown") + len("```markdown")
-                        end = output.find("```", start)
-                        if end != -1:
-                            new_section = output[start:end].strip()
-                    elif "```" in output:
-                        start = output.find("```") + 3
-                        end = output.find("```", start)
-                        if end != -1:
-                            new_section = output[start:end].strip()
-                    else:
-                        new_section = output.strip()
-                    
-                    # Clean up the section - remove any leading/trailing whitespace and ensure it starts with ##
-                    if new_section:
-                        new_section = new_section.strip()
-                        # If it doesn't start with ##, try to find the first heading
-                        if not new_section.startswith("##"):
-                            # Look for the first ## heading
-                            heading_pos = new_section.find("##")
-                            if heading_pos != -1:
-                                new_section = new_section[heading_pos:].strip()
-                    
-                    # If we got a new section, merge it into the main report immediately
-                    if new_section and new_section.startswith("##"):
-                        # First, append to feedback file (for backup/record)
-                        append_to_feedback_file(feedback_path, new_section)
-                        
-                        # Use the report content we read BEFORE the crew ran (to preserve original)
-                        # If the file was modified by CrewAI, we restore from our backup
-                        current_content = current_report_before
-                        
-                        # Clean up report content (remove markdown code blocks if present)
-                        content = current_content.strip()
-                        if content.startswith("```markdown"):
-                            content = content[11:].strip()
-                        if content.startswith("```"):
-                            content = content[3:].strip()
-                        if content.endswith("```"):
-                            content = content[:-3].strip()
-                        
-                        # Append new section to report
-                        if not content.endswith("\n"):
-                            content += "\n"
-                        updated_content = content + "\n" + new_section + "\n"
-                        
-                        # Write back to main report file
-                        os.makedirs(os.path.dirname(report_path), exist_ok=True)
-                        with open(report_path, 'w', encoding='utf-8') as f:
-                            f.write(updated_content)
-                        print(f"✓ Feedback section merged into the main report.")
-                    else:
-                        print("⚠️  No valid new section was generated. Report not updated.")
-                        if new_section:
-                            print(f"Debug: Generated content (first 200 chars): {new_section[:200]}")
-                        
-                except (ValueError, IndexError, Exception) as e:
-                    error_msg = str(e)
-                    if "Invalid response from LLM" in error_msg or "list index out of range" in error_msg:
-                        print(f"\n⚠️  Warning: LLM encountered an issue during revision ({error_msg}).")
-                        print("The report may not have been updated. Please try again.")
-                    else:
-                        print(f"\n⚠️  Error during revision: {error_msg}")
-            else:
-                print("Error: Could not find revise_report task. Skipping revision.")
+            try:
+                drafted = None
+                if speculator is not None and report_content and not targeted_sources(feedback, pipeline.sources):
+                    drafted = speculator.take(feedback, report_content)
+                if speculator is not None:
+                    speculator.discard()
+                if drafted is not None:
+                    intent, new_section = drafted
+                    pipeline.apply_revision(company, new_section, report_content)
+                    print(f"⚡ Used the precomputed '{intent.name}' section.")
+                else:
+                    new_section = pipeline.revise(company, feedback)
+                if new_section:
+                    print(f"✓ Feedback section merged into the main report.")
+                else:
+                    print("⚠️  No valid new section was generated. Report not updated.")
+            except ValueError as e:
+                if "No report found" in str(e):
+                    print("⚠️  Warning: Could not read current report. Skipping feedback incorporation.")
+                    iteration += 1
+                    continue
+                print(f"\n⚠️  Error during revision: {e}")
+            except (IndexError, Exception) as e:
+                error_msg = str(e)
+                if "Invalid response from LLM" in error_msg or "list index out of range" in error_msg:
+                    print(f"\n⚠️  Warning: LLM encountered an issue during revision ({error_msg}).")
+                    print("The report may not have been updated. Please try again.")
+                else:
+                    print(f"\n⚠️  Error during revision: {error_msg}")
             
             iteration += 1
             print(f"\nRevision {iteration} completed. Reviewing updated report...\n")
@@ -331,3 +154,317 @@ def run():
         raise Exception(f"An error occurred while running the crew: {e}")
 
 
+def replay():
+    """
+    Resume a failed run from its first incomplete task, reusing checkpointed outputs.
+
+    Usage: replay <company>
+    """
+    from company_research.pipeline import ResearchPipeline
+
+    company = sys.argv[1] if len(sys.argv) > 1 else input("Company to resume :")
+    try:
+        ResearchPipeline().research(company, resume=True)
+    except Exception as e:
+        raise Exception(f"An error occurred while replaying the crew: {e}")
+
+
+def regenerate():
+    """
+    Regenerate individual report sections from their upstream tasks.
+
+    Usage: regenerate <company> [section ...]
+
+    Sections are named by title or keyword (e.g. Financials, Sentiment). With
+    no sections, every section whose data has outlived its
+    ``data_max_age_hours`` in tasks.yaml is refreshed.
+    """
+    from company_research.pipeline import ResearchPipeline
+
+    if len(sys.argv) < 2:
+        raise Exception("Usage: regenerate <company> [section ...]")
+    company, requested = sys.argv[1], [a.lower() for a in sys.argv[2:]]
+
+    pipeline = ResearchPipeline()
+    if requested:
+        task_names = [
+            source.task
+            for source in pipeline.sources
+            if any(source.matches(name) for name in requested)
+        ]
+    else:
+        task_names = pipeline.expired_tasks(company)
+    if not task_names:
+        print("Nothing to regenerate.")
+        return
+
+    try:
+        replaced = pipeline.regenerate(company, task_names)
+    except Exception as e:
+        raise Exception(f"An error occurred while regenerating sections: {e}")
+    if replaced:
+        print(f"✓ Regenerated: {', '.join(replaced)}")
+    else:
+        print("⚠️  No sections were regenerated.")
+
+
+def refresh():
+    """
+    Patch an existing report with what changed upstream since it was written.
+
+    Usage: refresh <company>
+
+    Only analysis tasks whose sources report new data (Wikipedia edits, new
+    candles, new articles) or whose data has expired are re-run; a "What
+    Changed" section summarises the deltas.
+    """
+    from company_research.pipeline import ResearchPipeline
+
+    company = sys.argv[1] if len(sys.argv) > 1 else input("Company to refresh :")
+    try:
+        deltas = ResearchPipeline().refresh(company)
+    except ValueError as e:
+        raise Exception(f"{e} Run a full research first.")
+    except Exception as e:
+        raise Exception(f"An error occurred while refreshing the report: {e}")
+    changed = [d.task for d in deltas if d.changed]
+    print(f"✓ Refreshed {len(changed)} of {len(deltas)} analyses" + (f": {', '.join(changed)}" if changed else "."))
+
+
+def startup_profile():
+    """
+    Print an import-time breakdown of the crew and check it against a budget.
+
+    Usage: startup_profile [budget_ms]
+    """
+    from company_research.startup import measure_startup
+
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    report = measure_startup(budget_ms=budget_ms)
+    print(report.format())
+    if not report.within_budget:
+        sys.exit(1)
+
+
+def serve():
+    """
+    Run the long-running research service with a local job API.
+
+    Usage: serve [--host HOST] [--port PORT] [--socket PATH] [--workers N]
+    """
+    import argparse
+    import logging
+
+    from company_research.service import serve as serve_forever
+
+    parser = argparse.ArgumentParser(prog="serve", description=serve.__doc__)
+    parser.add_argument("--host", default=os.getenv("COMPANY_RESEARCH_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("COMPANY_RESEARCH_PORT", "8765")))
+    parser.add_argument("--socket", dest="socket_path", default=None, help="Listen on a Unix socket instead of TCP.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("COMPANY_RESEARCH_WORKERS", "2")))
+    args = parser.parse_args(sys.argv[1:])
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    where = args.socket_path or f"http://{args.host}:{args.port}"
+    print(f"Warming {args.workers} research worker(s), then listening on {where}")
+    serve_forever(
+        host=args.host,
+        port=args.port,
+        socket_path=args.socket_path,
+        max_workers=args.workers,
+    )
+
+
+def live():
+    """
+    Follow a ticker's intraday stream and print the live summary.
+
+    Usage: live <ticker> [interval] [refresh_seconds]
+
+    Interval is 1MIN, 5MIN (default), 15MIN, 30MIN or 1H. Set
+    LIVE_QUOTES_REPLAY to a CSV/JSONL tick file to replay it instead of
+    polling TwelveData.
+    """
+    import time
+
+    from company_research.tools.registry import create_tool
+
+    if len(sys.argv) < 2:
+        raise Exception("Usage: live <ticker> [interval] [refresh_seconds]")
+    ticker = sys.argv[1]
+    interval = sys.argv[2] if len(sys.argv) > 2 else "5MIN"
+    refresh = float(sys.argv[3]) if len(sys.argv) > 3 else 15.0
+
+    tool = create_tool("live_stock_tool")
+    try:
+        while True:
+            print(tool.run(ticker=ticker, interval=interval))
+            print()
+            time.sleep(refresh)
+    except KeyboardInterrupt:
+        pass
+
+
+def llm_stub():
+    """
+    Serve a local OpenAI-compatible stub LLM for trying model routes.
+
+    Usage: llm_stub [port]
+
+    Model names script the answer: stub-429, stub-error, stub-empty,
+    stub-slow-<seconds>, anything else answers at once. See
+    config/models.yaml for pointing a route at it.
+    """
+    from company_research.llm_stub import serve_stub
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8999
+    print(f"Stub LLM listening on http://127.0.0.1:{port}/v1")
+    try:
+        serve_stub(port=port)
+    except KeyboardInterrupt:
+        pass
+
+
+def artifacts():
+    """
+    Inspect and prune the generated-artifact store.
+
+    Usage: artifacts stats
+           artifacts latest <company> [kind]
+           artifacts history <company> [kind]
+           artifacts gc
+
+    Kinds are "chart", "chart_report", "chart_data" and "report". Retention is set with
+    COMPANY_RESEARCH_ARTIFACT_KEEP, COMPANY_RESEARCH_ARTIFACT_MAX_AGE_DAYS and
+    COMPANY_RESEARCH_ARTIFACT_MAX_MB.
+    """
+    from datetime import datetime
+
+    from company_research.artifacts import default_store
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    store = default_store()
+
+    def describe(artifact):
+        stamp = datetime.fromtimestamp(artifact.created_at).strftime("%Y-%m-%d %H:%M:%S")
+        return (
+            f"{stamp}  {artifact.kind:<12} {artifact.name:<28} "
+            f"{artifact.size / 1024:8.1f} KB -> {artifact.stored_size / 1024:8.1f} KB  {artifact.digest[:12]}"
+        )
+
+    if command == "stats":
+        stats = store.stats()
+        print(
+            f"{stats['entries']} entries, {stats['blobs']} unique blobs, "
+            f"{stats['bytes'] / 1024 / 1024:.1f} MB stored as {stats['stored_bytes'] / 1024 / 1024:.1f} MB "
+            f"in {store.root}"
+        )
+    elif command == "gc":
+        print(store.gc().format())
+    elif command in ("latest", "history") and len(sys.argv) > 2:
+        company = sys.argv[2]
+        kind = sys.argv[3] if len(sys.argv) > 3 else None
+        if command == "latest":
+            artifact = store.latest(company, kind or "chart")
+            print(describe(artifact) if artifact else f"No {kind or 'chart'} stored for {company}.")
+        else:
+            for artifact in store.history(company, kind):
+                print(describe(artifact))
+    else:
+        raise Exception(artifacts.__doc__)
+
+
+def schedule():
+    """
+    Warm tool caches and reports off-peak, as configured in config/schedule.yaml.
+
+    Usage: schedule              run the jobs on their cron schedule until stopped
+           schedule once <job>   run one job now
+           schedule plan [job]   list what each job would warm, by priority
+
+    COMPANY_RESEARCH_SCHEDULE_CONFIG points at an alternative schedule.
+    """
+    from company_research.scheduler import Scheduler
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    scheduler = Scheduler()
+    jobs = scheduler.config.jobs
+    if command == "run":
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            print("\nScheduler stopped.")
+    elif command == "once" and len(sys.argv) > 2 and sys.argv[2] in jobs:
+        print(scheduler.run_job(jobs[sys.argv[2]]).format())
+    elif command == "plan":
+        selected = [jobs[sys.argv[2]]] if len(sys.argv) > 2 and sys.argv[2] in jobs else list(jobs.values())
+        next_runs = {job.name: when for when, job in scheduler.next_runs()}
+        for job in selected:
+            print(f"{job.name} ({job.action}, next {next_runs[job.name]:%Y-%m-%d %H:%M}):")
+            for candidate in scheduler.candidates(job):
+                print(f"  {candidate.score:7.2f}  {candidate.company.name}: {candidate.detail}")
+    else:
+        raise Exception(schedule.__doc__)
+
+
+def queue():
+    """
+    Work with the durable job queue shared by research workers.
+
+    Usage: queue submit <kind> <company> [feedback] [--priority interactive|normal|batch]
+           queue list [status]
+           queue retry <job_id>
+           queue worker [--workers N] [--kinds research,refresh]
+           queue serve [--host HOST] [--port PORT]
+
+    Kinds are research, revision and refresh. Workers and clients use the
+    queue server at COMPANY_RESEARCH_QUEUE_URL when it is set, otherwise the
+    SQLite queue at COMPANY_RESEARCH_QUEUE_DB (data/queue.db). The server
+    listens on 127.0.0.1 by default; to serve other hosts (--host 0.0.0.0)
+    set COMPANY_RESEARCH_QUEUE_TOKEN on the server and every client.
+    """
+    import argparse
+    import logging
+    from datetime import datetime
+
+    from company_research.jobqueue import Worker, default_queue, serve_queue
+
+    parser = argparse.ArgumentParser(prog="queue", description=queue.__doc__)
+    parser.add_argument("command", choices=["submit", "list", "retry", "worker", "serve"])
+    parser.add_argument("args", nargs="*")
+    parser.add_argument("--priority", default="normal")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("COMPANY_RESEARCH_WORKERS", "1")))
+    parser.add_argument("--kinds", default=None)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.command == "serve":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        print(f"Serving the job queue on http://{args.host}:{args.port}")
+        serve_queue(args.host, args.port)
+        return
+    jobs = default_queue()
+    if args.command == "submit" and len(args.args) >= 2:
+        kind, company = args.args[0], args.args[1]
+        feedback = " ".join(args.args[2:]) or None
+        job = jobs.enqueue(kind, company, feedback, priority=args.priority)
+        print(f"Queued {job.kind} job {job.id} for '{job.topic}'.")
+    elif args.command == "list":
+        for job in jobs.list(args.args[0] if args.args else None):
+            stamp = datetime.fromtimestamp(job.created_at).strftime("%Y-%m-%d %H:%M:%S")
+            error = f"  {job.error}" if job.error else ""
+            print(f"{job.id}  {stamp}  {job.status:<9} {job.kind:<8} {job.topic}  attempts {job.attempts}/{job.max_attempts}{error}")
+    elif args.command == "retry" and args.args:
+        print("Requeued." if jobs.retry(args.args[0]) else "Only dead jobs can be retried.")
+    elif args.command == "worker":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        worker = Worker(jobs, concurrency=args.workers, kinds=args.kinds.split(",") if args.kinds else None)
+        print(f"Worker {worker.name} pulling jobs with {worker.concurrency} pipeline(s)")
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            worker.stop.set()
+            print("\nWorker stopped; leased jobs return to the queue when their leases expire.")
+    else:
+        raise Exception(queue.__doc__)
@@ -0,0 +1,678 @@
+"""Research pipeline shared by the CLI and the long-running service.
+
+A ``ResearchPipeline`` builds the ``CompanyResearch`` crew base, its agents,
+tasks and tools once and reuses them for every research or revision run, so
+callers that keep a pipeline around don't pay for YAML parsing and agent
+construction per request.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime
+from functools import partial
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from company_research.artifacts import record_report
+from company_research.checkpoints import CheckpointStore, inputs_hash
+from company_research.limits import (
+    TaskLimits,
+    active_run,
+    arm,
+    check_cancelled,
+    disarm,
+    mark_partial,
+    on_step,
+)
+from company_research.prefetch import PREFETCH_TASKS, placeholder_inputs
+from company_research.preflight import EntityProfile, applicable_tools, preflight
+from company_research.progressive import ProgressCallback, ProgressiveReport
+from company_research.report_templates import strip_blocks, with_factual_blocks
+from company_research.retrieval import knowledge_text
+from company_research.scheduler import record_request
+from company_research.sections import (
+    ReportTree,
+    SectionSource,
+    expired_sources,
+    section_sources,
+    sections_path,
+    targeted_sources,
+)
+from company_research.token_budget import (
+    BudgetLedger,
+    TaskBudgets,
+    fit_inputs,
+    set_active_ledger,
+)
+from company_research.utils import atomic_write_text, topic_slug
+
+if TYPE_CHECKING:
+    from crewai import Agent, Crew, Task
+
+logger = logging.getLogger(__name__)
+
+AGENT_NAMES = (
+    "company_info_agent",
+    "financial_analyst_agent",
+    "market_analyst_agent",
+    "sentiment_agent",
+    "report_writer_agent",
+)
+
+# Order matters: the crew runs these sequentially.
+INITIAL_TASK_NAMES = (
+    "gather_company_info",
+    "analyze_financials",
+    "analyze_market_position",
+    "analyze_sentiment",
+    "generate_report",
+)
+
+REVISION_TASK_NAME = "revise_report"
+REWRITE_TASK_NAME = "rewrite_section"
+
+
+def report_path(topic: str) -> str:
+    return f"reports/{topic}_report.md"
+
+
+def draft_path(topic: str) -> str:
+    """The report being assembled by a research run, before it is finalized."""
+    return f"reports/{topic}_report.draft.md"
+
+
+def feedback_path(topic: str) -> str:
+    return f"reports/{topic}_feedback.md"
+
+
+def data_dir(topic: str) -> str:
+    """Directory of the task output files (``output_file`` in tasks.yaml) for ``topic``."""
+    return os.path.join("data", topic_slug(topic))
+
+
+def build_inputs(topic: str, **extra: Any) -> Dict[str, Any]:
+    """Template inputs for a crew kickoff about ``topic``."""
+    inputs: Dict[str, Any] = {
+        "topic": topic,
+        # Task output files live under data/{topic_slug}/, one directory per
+        # topic, so concurrent runs on different topics don't share them.
+        "topic_slug": topic_slug(topic),
+        "current_year": str(datetime.now().year),
+        # Contents of knowledge/, so the writer knows who the report is for.
+        "user_profile": knowledge_text() or "No reader profile is available.",
+    }
+    # Listing status and ticker from the (cached) pre-flight classification.
+    inputs.update(preflight(topic).inputs())
+    # Filled in by the crew's prefetch hook at kickoff.
+    inputs.update(placeholder_inputs())
+    inputs.update(extra)
+    return inputs
+
+
+def read_text(path: str) -> Optional[str]:
+    """Read a text file, returning None if it doesn't exist or can't be read."""
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        return None
+    except Exception as e:
+        print(f"Error reading {path}: {e}")
+        return None
+
+
+def strip_code_fence(content: str) -> str:
+    """Remove a surrounding ```markdown fence that LLMs like to add."""
+    content = content.strip()
+    if content.startswith("```markdown"):
+        content = content[11:].strip()
+    if content.startswith("```"):
+        content = content[3:].strip()
+    if content.endswith("```"):
+        content = content[:-3].strip()
+    return content
+
+
+def result_text(result: Any) -> str:
+    """Extract the raw text from a crew kickoff result."""
+    if hasattr(result, "raw"):
+        return str(result.raw)
+    if hasattr(result, "output"):
+        return str(result.output)
+    if hasattr(result, "tasks_output"):
+        if result.tasks_output:
+            if isinstance(result.tasks_output, list):
+                return str(result.tasks_output[-1])
+            return str(result.tasks_output)
+        return ""
+    return str(result) if result else ""
+
+
+def extract_section(output: str) -> Optional[str]:
+    """Pull a single ``##`` Markdown section out of an LLM response."""
+    new_section = None
+    if "```markdown" in output:
+        start = output.find("```markdown") + len("```markdown")
+        end = output.find("```", start)
+        if end != -1:
+            new_section = output[start:end].strip()
+    elif "```" in output:
+        start = output.find("```") + 3
+        end = output.find("```", start)
+        if end != -1:
+            new_section = output[start:end].strip()
+    else:
+        new_section = output.strip()
+
+    if new_section:
+        new_section = new_section.strip()
+        # If it doesn't start with ##, try to find the first heading
+        if not new_section.startswith("##"):
+            heading_pos = new_section.find("##")
+            if heading_pos != -1:
+                new_section = new_section[heading_pos:].strip()
+    return new_section
+
+
+def append_section(path: str, section: str) -> None:
+    """Append ``section`` to the Markdown file at ``path``."""
+    existing = read_text(path) or ""
+    if existing.strip():
+        content = existing.rstrip() + "\n\n" + section + "\n"
+    else:
+        content = section + "\n"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def merge_section(report_before: str, section: str) -> str:
+    """Append a new section to the report content read before a revision."""
+    content = strip_code_fence(report_before)
+    if not content.endswith("\n"):
+        content += "\n"
+    return content + "\n" + section + "\n"
+
+
+class ResearchPipeline:
+    """Warm crew, agents and tasks that can run many research jobs."""
+
+    def __init__(self, verbose: bool = True) -> None:
+        from company_research.crew import CompanyResearch
+
+        self.verbose = verbose
+        self.crew_base = CompanyResearch()
+        self.agents: List["Agent"] = [
+            getattr(self.crew_base, name)() for name in AGENT_NAMES
+        ]
+        self.tasks: Dict[str, "Task"] = {
+            name: getattr(self.crew_base, name)()
+            for name in INITIAL_TASK_NAMES + (REVISION_TASK_NAME, REWRITE_TASK_NAME)
+        }
+        self.sources: List[SectionSource] = section_sources(self.crew_base.tasks_config)
+        # Full tool lists, narrowed per topic by ``_scope_tools``.
+        self._agent_tools = {id(a): list(a.tools or []) for a in self.agents}
+        self._task_tools = {name: list(t.tools or []) for name, t in self.tasks.items()}
+        self.budgets = TaskBudgets(self.crew_base.tasks_config)
+        self.limits = TaskLimits(self.crew_base.agents_config, self.crew_base.tasks_config)
+        self._agent_names = {id(a): name for name, a in zip(AGENT_NAMES, self.agents)}
+        for agent in self.agents:
+            agent.step_callback = on_step
+        self._revision_crew: Optional["Crew"] = None
+
+    @classmethod
+    def quiet(cls) -> "ResearchPipeline":
+        """A pipeline that prints nothing, for background work."""
+        pipeline = cls(verbose=False)
+        for agent in pipeline.agents:
+            agent.verbose = False
+        return pipeline
+
+    def _crew(self, task_names: List[str]) -> "Crew":
+        from crewai import Crew, Process
+
+        callbacks = []
+        if any(name in PREFETCH_TASKS for name in task_names):
+            callbacks.append(partial(self.crew_base.prefetch_data, tasks=task_names))
+        return Crew(
+            agents=self.agents,
+            tasks=[self.tasks[name] for name in task_names],
+            process=Process.sequential,
+            verbose=self.verbose,
+            before_kickoff_callbacks=callbacks,
+        )
+
+    def _scope_tools(self, profile: EntityProfile) -> None:
+        """Give every agent and task only the tools that can work for the entity."""
+        for agent in self.agents:
+            agent.tools = applicable_tools(self._agent_tools[id(agent)], profile)
+        for name, task in self.tasks.items():
+            task.tools = applicable_tools(self._task_tools[name], profile)
+
+    def _arm(self, task_name: str) -> None:
+        """Start enforcing ``task_name``'s limits; call right before it runs."""
+        agent = self.tasks[task_name].agent
+        limits = self.limits.get(task_name, self._agent_names.get(id(agent)))
+        arm(task_name, limits, agent)
+
+    def _settle(self, task_name: str, output: Any) -> None:
+        """Mark ``output`` partial if ``task_name`` ran out of a limit."""
+        run = active_run()
+        if run is None or run.task != task_name:
+            return
+        logger.info("%s used %s", task_name, run.summary())
+        if run.exhausted:
+            output.raw = mark_partial(str(output.raw), run.exhausted)
+            print(f"⏱  '{task_name}' stopped early ({run.exhausted}); output marked partial.")
+
+    def task_hashes(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        """Checkpoint hash for every initial task given the run's inputs."""
+        return {
+            name: inputs_hash(
+                name, inputs, self.crew_base.tasks_config[name].get("description", "")
+            )
+            for name in INITIAL_TASK_NAMES
+        }
+
+    def _template(self, task_name: str) -> str:
+        config = self.crew_base.tasks_config[task_name]
+        return f"{config.get('description', '')}\n{config.get('expected_output', '')}"
+
+    def _task_callback(
+        self,
+        name: str,
+        names: List[str],
+        store: CheckpointStore,
+        expected_hash: str,
+        ledger: BudgetLedger,
+        report: Optional["ProgressiveReport"] = None,
+    ):
+        """
+        Callback run as soon as ``name`` finishes.
+
+        Marks the output partial if the task hit one of its limits, compacts
+        it to the task's output budget, makes sure the next task's prompt fits
+        its budget and arms the next task's limits, checkpoints the full
+        output and, during a full run, renders it into its section of the
+        partial report. Compaction rewrites ``output.raw`` in place, so the
+        full text is copied first: the checkpoint and the report keep
+        everything the task found, and only the next prompts are trimmed.
+        """
+        record = store.recorder(name, expected_hash)
+        publish = report.recorder(name) if report is not None else None
+
+        def _callback(output: Any) -> None:
+            check_cancelled()
+            self._settle(name, output)
+            full = str(getattr(output, "raw", output))
+            self.budgets.fit_output(name, output, ledger)
+            index = names.index(name)
+            if index + 1 < len(names):
+                upcoming = names[index + 1]
+                context = [
+                    (n, self.tasks[n].output)
+                    for n in names[: index + 1]
+                    if self.tasks[n].output is not None
+                ]
+                self.budgets.fit_context(upcoming, self._template(upcoming), context, ledger)
+                self._arm(upcoming)
+            record(full)
+            if publish is not None:
+                publish(full)
+
+        return _callback
+
+    def _finish_ledger(self, ledger: BudgetLedger, quiet: bool = False) -> None:
+        from company_research.tools.streaming import stop_sessions
+
+        set_active_ledger(None)
+        disarm()
+        # Live quote streams only serve the run that started them.
+        stop_sessions()
+        if ledger.entries:
+            ledger.save()
+            if not quiet:
+                print(ledger.summary())
+
+    def research(
+        self,
+        topic: str,
+        resume: bool = False,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Any:
+        """
+        Run the full research pipeline, writing ``reports/{topic}_report.md``.
+
+        Every task is checkpointed as it completes. With ``resume=True`` the run
+        starts at the first task without a matching completed checkpoint and
+        hands the stored outputs of earlier tasks to the rest as context.
+
+        The report is assembled progressively: each analysis section is written
+        as soon as its task finishes (``on_progress`` is called with the ready
+        tasks and the section count), and the writer's final pass only adds
+        the Executive Summary and Conclusion.
+        """
+        from crewai.utilities.constants import NOT_SPECIFIED
+
+        record_request(topic)
+        self._scope_tools(preflight(topic))
+        inputs = build_inputs(topic)
+        hashes = self.task_hashes(inputs)
+        store = CheckpointStore(topic)
+        names = list(INITIAL_TASK_NAMES)
+
+        if resume:
+            start = store.first_incomplete(names, hashes)
+        else:
+            store.clear()
+            start = 0
+        if start == len(names):
+            print(f"All tasks for '{topic}' are already complete; nothing to resume.")
+            return None
+
+        report = ProgressiveReport(
+            topic, report_path(topic), self.sources, on_progress, draft_path=draft_path(topic)
+        )
+        report.start()
+        for name in names[:start]:
+            self._restore_output(name, store.completed(name, hashes[name]).output)
+            print(f"↺ Reusing checkpointed output of '{name}'.")
+            report.add(name, self.tasks[name].output.raw)
+
+        ledger = BudgetLedger(topic, run="resume" if resume else "research")
+        set_active_ledger(ledger)
+        remaining = names[start:]
+        for index, name in enumerate(remaining):
+            task = self.tasks[name]
+            task.callback = self._task_callback(
+                name, names, store, hashes[name], ledger, report
+            )
+            if start:
+                task.context = [self.tasks[n] for n in names[: start + index]]
+        if start:
+            # Checkpoints hold full outputs; trim them for the first prompt.
+            self.budgets.fit_context(
+                remaining[0],
+                self._template(remaining[0]),
+                [(n, self.tasks[n].output) for n in names[:start]],
+                ledger,
+            )
+
+        try:
+            self._arm(remaining[0])
+            result = self._crew(remaining).kickoff(inputs=inputs)
+            check_cancelled()
+            report.finalize(result_text(result))
+            return result
+        except Exception as exc:
+            failed_at = store.first_incomplete(names, hashes)
+            if failed_at < len(names):
+                failed = names[failed_at]
+                store.mark_failed(failed, hashes[failed], str(exc))
+            raise
+        finally:
+            for name in remaining:
+                self.tasks[name].context = NOT_SPECIFIED
+            self._finish_ledger(ledger)
+
+    def _restore_output(self, name: str, raw: str) -> None:
+        """Give ``name`` a stored output so later tasks can use it as context."""
+        from crewai.tasks.task_output import TaskOutput
+
+        task = self.tasks[name]
+        task.output = TaskOutput(
+            name=name,
+            description=task.description,
+            expected_output=task.expected_output,
+            raw=raw,
+            agent=task.agent.role if task.agent else "",
+        )
+
+    def source_for(self, task_name: str) -> SectionSource:
+        for source in self.sources:
+            if source.task == task_name:
+                return source
+        raise KeyError(f"Task '{task_name}' does not feed a report section.")
+
+    def report_tree(self, topic: str) -> ReportTree:
+        path = report_path(topic)
+        content = read_text(path)
+        if not content:
+            raise ValueError(f"No report found at {path}.")
+        tree = ReportTree.parse(strip_code_fence(content))
+        tree.load_metadata(sections_path(topic))
+        tree.assign_sources(self.sources)
+        return tree
+
+    def regenerate(
+        self,
+        topic: str,
+        task_names: List[str],
+        feedback: str = "",
+        task_feedback: Optional[Dict[str, str]] = None,
+    ) -> List[str]:
+        """
+        Refresh the report sections fed by ``task_names`` without a full run.
+
+        Each upstream task is re-run on its own (with the checkpointed outputs
+        of earlier tasks as context), then the writer rewrites only that
+        section, which is spliced into the report in place. ``task_feedback``
+        overrides ``feedback`` per task. Returns the titles of the sections
+        that were replaced.
+        """
+        tree = self.report_tree(topic)
+        ledger = BudgetLedger(topic, run="regenerate")
+        set_active_ledger(ledger)
+        try:
+            replaced = self._regenerate_sections(
+                topic, task_names, feedback, task_feedback or {}, tree, ledger
+            )
+        finally:
+            self._finish_ledger(ledger)
+
+        if replaced:
+            check_cancelled()
+            content = tree.render()
+            atomic_write_text(report_path(topic), content)
+            tree.save_metadata(sections_path(topic))
+            record_report(topic, content)
+        return replaced
+
+    def _regenerate_sections(
+        self,
+        topic: str,
+        task_names: List[str],
+        feedback: str,
+        task_feedback: Dict[str, str],
+        tree: ReportTree,
+        ledger: BudgetLedger,
+    ) -> List[str]:
+        from crewai.utilities.constants import NOT_SPECIFIED
+
+        self._scope_tools(preflight(topic))
+        inputs = build_inputs(topic)
+        hashes = self.task_hashes(inputs)
+        store = CheckpointStore(topic)
+        names = list(INITIAL_TASK_NAMES)
+        replaced: List[str] = []
+        for name in sorted(set(task_names), key=names.index):
+            upstream = [
+                n for n in names[: names.index(name)] if store.completed(n, hashes[n])
+            ]
+            for prior in upstream:
+                self._restore_output(prior, store.completed(prior, hashes[prior]).output)
+            task = self.tasks[name]
+            task.callback = self._task_callback(name, [name], store, hashes[name], ledger)
+            task.context = [self.tasks[n] for n in upstream]
+            self.budgets.fit_context(
+                name, self._template(name), [(n, self.tasks[n].output) for n in upstream], ledger
+            )
+            try:
+                self._arm(name)
+                data = result_text(self._crew([name]).kickoff(inputs=inputs))
+            finally:
+                task.context = NOT_SPECIFIED
+
+            current = tree.find(name)
+            title = current.title if current else self.source_for(name).title
+            rewrite_inputs = build_inputs(
+                topic,
+                section_title=title,
+                current_section=(
+                    strip_blocks(current.render()) if current else "(This section does not exist yet.)"
+                ),
+                section_data=data,
+                user_feedback=task_feedback.get(name, feedback),
+            )
+            self._arm(REWRITE_TASK_NAME)
+            output = result_text(self._crew([REWRITE_TASK_NAME]).kickoff(inputs=rewrite_inputs))
+            section = extract_section(output)
+            if not section or not section.startswith("##"):
+                print(f"⚠️  No valid '{title}' section was generated; keeping the old one.")
+                continue
+            heading, _, body = section.partition("\n")
+            section = f"{heading}\n\n{with_factual_blocks(name, topic, body)}"
+            replaced.append(tree.splice(name, section).title)
+        return replaced
+
+    def refresh(self, topic: str) -> List[Any]:
+        """
+        Patch the report with what changed upstream since it was written.
+
+        See ``company_research.refresh``; returns one ``Delta`` per analysis task.
+        """
+        from company_research.refresh import refresh_report
+
+        return refresh_report(self, topic)
+
+    def expired_tasks(self, topic: str) -> List[str]:
+        """Tasks whose data is older than the ``data_max_age_hours`` in tasks.yaml."""
+        store = CheckpointStore(topic)
+        updated_at = {}
+        for source in self.sources:
+            checkpoint = store.load(source.task)
+            updated_at[source.task] = checkpoint.updated_at if checkpoint else None
+        return [source.task for source in expired_sources(self.sources, updated_at)]
+
+    def revision_context(
+        self, topic: str, report: str, ledger: Optional[BudgetLedger] = None
+    ) -> str:
+        """
+        The existing report plus its ``input_files``, compacted to fit the
+        ``revise_report`` prompt budget.
+        """
+        from company_research.token_budget import estimate_tokens
+
+        config = self.crew_base.tasks_config[REVISION_TASK_NAME]
+        texts = {"Existing report": strip_code_fence(report)}
+        for pattern in config.get("input_files") or []:
+            path = pattern.format(topic=topic, topic_slug=topic_slug(topic))
+            if path == report_path(topic):
+                continue
+            content = read_text(path)
+            if content:
+                texts[os.path.basename(path)] = content
+
+        budget = self.budgets.get(REVISION_TASK_NAME, "prompt")
+        available = max(budget - estimate_tokens(self._template(REVISION_TASK_NAME)), 0)
+        fitted = fit_inputs(texts, available)
+        if ledger is not None:
+            for name, result in fitted.items():
+                ledger.record(REVISION_TASK_NAME, f"input:{name}", available, result)
+        return "\n\n".join(
+            f"=== {name} ===\n{fitted[name].text}" for name in texts
+        )
+
+    def revise(self, topic: str, feedback: str) -> Optional[str]:
+        """
+        Address ``feedback`` by changing the report.
+
+        Feedback that asks to fix an existing section ("the Financials section
+        is outdated") regenerates just that section in place; anything else
+        becomes a new section appended to the report.
+
+        Returns the new or replaced section(s), or None if the model didn't
+        produce one. Raises ValueError if there is no report to revise yet.
+        """
+        path = report_path(topic)
+        targets = targeted_sources(feedback, self.sources)
+        if targets and read_text(path):
+            replaced = self.regenerate(topic, [t.task for t in targets], feedback)
+            if not replaced:
+                return None
+            tree = self.report_tree(topic)
+            return "\n\n".join(
+                s.render() for s in tree.sections if s.title in replaced
+            )
+
+        # Read the report BEFORE running the crew so the original content is
+        # preserved even if CrewAI tries to write to the file.
+        report_before = read_text(path)
+        if not report_before:
+            raise ValueError(f"No report found at {path}.")
+
+        section = self.draft_revision(topic, feedback, report_before)
+        if section is None:
+            return None
+        self.apply_revision(topic, section, report_before)
+        return section
+
+    def draft_revision(
+        self, topic: str, feedback: str, report_before: str, run: str = "revise"
+    ) -> Optional[str]:
+        """
+        The new section addressing ``feedback`` for the report ``report_before``,
+        without writing anything. None if the model didn't produce a section.
+        """
+        ledger = BudgetLedger(topic, run=run)
+        set_active_ledger(ledger)
+        try:
+            if self._revision_crew is None:
+                self._revision_crew = self._crew([REVISION_TASK_NAME])
+            self._arm(REVISION_TASK_NAME)
+            result = self._revision_crew.kickoff(
+                inputs=build_inputs(
+                    topic,
+                    user_feedback=feedback,
+                    report_context=self.revision_context(topic, report_before, ledger),
+                )
+            )
+        finally:
+            self._finish_ledger(ledger, quiet=not self.verbose)
+
+        section = extract_section(result_text(result))
+        if not section or not section.startswith("##"):
+            if section and self.verbose:
+                print(f"Debug: Generated content (first 200 chars): {section[:200]}")
+            return None
+        return section
+
+    def apply_revision(self, topic: str, section: str, report_before: str) -> str:
+        """Merge ``section`` into the report read before it was drafted; returns the report."""
+        check_cancelled()
+        path = report_path(topic)
+        append_section(feedback_path(topic), section)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        merged = merge_section(report_before, section)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(merged)
+        record_report(topic, merged)
+        return merged
+
+__all__ = [
+    "AGENT_NAMES",
+    "INITIAL_TASK_NAMES",
+    "REVISION_TASK_NAME",
+    "REWRITE_TASK_NAME",
+    "ResearchPipeline",
+    "append_section",
+    "build_inputs",
+    "extract_section",
+    "feedback_path",
+    "merge_section",
+    "read_text",
+    "report_path",
+    "result_text",
+    "strip_code_fence",
+]
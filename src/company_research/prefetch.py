@@ -0,0 +1,233 @@
+"""Deterministic prefetch of the tool calls every research run makes.
+
+Most tool calls in a run follow from the topic alone: the Wikipedia summary,
+overview and competitor searches, the quote snapshot and stock chart of a
+listed company, news coverage and search interest. Instead of letting each
+agent discover them one LLM turn at a time, a ``before_kickoff`` hook on the
+crew issues them all concurrently from the topic and the pre-flight profile
+(ticker, listing status) and hands each task its results through a
+``{prefetched_<task>}`` template input. Agents then start with the data and
+only call tools for follow-ups.
+
+Results are cached on disk per topic with a per-tool time to live, so a
+re-run or a section regeneration shortly after reuses them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from company_research.preflight import EntityProfile, preflight
+from company_research.utils import atomic_write_text, topic_slug
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_TASKS = (
+    "gather_company_info",
+    "analyze_financials",
+    "analyze_market_position",
+    "analyze_sentiment",
+)
+NOTHING_PREFETCHED = "Nothing was prefetched for this task; use your tools."
+
+# How long a cached result stays fresh, in seconds.
+TOOL_TTLS: Dict[str, float] = {
+    "wikipedia_tool": 7 * 24 * 3600,
+    "serp_api_tool": 24 * 3600,
+    "google_trends_tool": 24 * 3600,
+    "news_api_tool": 3600,
+    "yahoo_finance_tool": 900,
+    "stock_chart_tool": 6 * 3600,
+}
+MAX_WORKERS = 8
+
+
+@dataclass
+class Fetch:
+    """One predictable tool call and the task whose prompt receives it."""
+
+    task: str
+    tool: str
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def label(self) -> str:
+        args = ", ".join(f"{k}={v}" for k, v in self.kwargs.items())
+        return f"{self.tool}({args})"
+
+    def key(self) -> str:
+        payload = json.dumps({"tool": self.tool, "kwargs": self.kwargs}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def plan(topic: str, profile: EntityProfile, tasks: Iterable[str] = PREFETCH_TASKS) -> List[Fetch]:
+    """The calls an agent would make first for each of ``tasks``."""
+    wanted = set(tasks)
+    fetches = [
+        Fetch("gather_company_info", "wikipedia_tool", {"topic": topic}),
+        Fetch(
+            "gather_company_info",
+            "serp_api_tool",
+            {"query": f"{topic} company founders headquarters employees subsidiaries"},
+        ),
+        Fetch("analyze_financials", "serp_api_tool", {"query": f"{topic} revenue profit funding valuation"}),
+        Fetch("analyze_market_position", "serp_api_tool", {"query": f"{topic} competitors market share industry"}),
+        Fetch("analyze_sentiment", "news_api_tool", {"query": topic}),
+        Fetch("analyze_sentiment", "google_trends_tool", {"keyword": topic}),
+    ]
+    if profile.listed and profile.ticker:
+        fetches += [
+            Fetch("analyze_financials", "yahoo_finance_tool", {"symbol": profile.ticker}),
+            Fetch("analyze_financials", "stock_chart_tool", {"ticker": profile.ticker}),
+        ]
+    return [f for f in fetches if f.task in wanted]
+
+
+class PrefetchCache:
+    """Tool results per topic under ``data/prefetch/<topic>/``."""
+
+    def __init__(self, topic: str, directory: Optional[str] = None) -> None:
+        root = directory or os.getenv("COMPANY_RESEARCH_PREFETCH_DIR", "data/prefetch")
+        self.directory = os.path.join(root, topic_slug(topic))
+
+    def _path(self, fetch: Fetch) -> str:
+        return os.path.join(self.directory, f"{fetch.tool}-{fetch.key()}.json")
+
+    def _entry(self, fetch: Fetch) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(fetch), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def age(self, fetch: Fetch) -> Optional[float]:
+        """Seconds since ``fetch`` was cached, or None if it never was."""
+        entry = self._entry(fetch)
+        return time.time() - entry.get("fetched_at", 0) if entry else None
+
+    def get(self, fetch: Fetch) -> Optional[Tuple[str, float]]:
+        """(result, fetched_at) of a cached ``fetch`` still within its TTL."""
+        entry = self._entry(fetch)
+        if entry is None or time.time() - entry.get("fetched_at", 0) > TOOL_TTLS.get(fetch.tool, 3600):
+            return None
+        return entry.get("result"), entry.get("fetched_at", 0)
+
+    def put(self, fetch: Fetch, result: str) -> None:
+        entry = {"tool": fetch.tool, "kwargs": fetch.kwargs, "fetched_at": time.time(), "result": result}
+        atomic_write_text(self._path(fetch), json.dumps(entry, indent=2))
+
+
+def _run_fetch(fetch: Fetch) -> Optional[str]:
+    """
+    The result of ``fetch``, or None if it failed.
+
+    The tool's ``_run`` is called directly: ``_observe`` would turn an open
+    provider circuit or a rate limit into a message for the agent, and that
+    message must not be cached as the result. Successful results are
+    compacted to the observation budget as an agent's would be.
+    """
+    from company_research.token_budget import fit_observation
+    from company_research.tools.registry import create_tool
+
+    try:
+        result = create_tool(fetch.tool)._run(**fetch.kwargs)
+    except Exception as exc:
+        logger.warning("Prefetch %s failed: %s", fetch.label, exc)
+        return None
+    if not isinstance(result, str) or not result.strip():
+        return None
+    return fit_observation(fetch.tool, result)
+
+
+def prefetch(topic: str, tasks: Iterable[str] = PREFETCH_TASKS) -> Dict[str, List[Tuple[Fetch, str, float]]]:
+    """
+    Run (or load from cache) every planned call; (fetch, result, fetched_at)
+    grouped by task, ``fetched_at`` being when the result was fetched.
+    """
+    fetches = plan(topic, preflight(topic), tasks)
+    cache = PrefetchCache(topic)
+    results: Dict[str, List[Tuple[Fetch, str, float]]] = {}
+    missing = []
+    for fetch in fetches:
+        cached = cache.get(fetch)
+        if cached is not None:
+            results.setdefault(fetch.task, []).append((fetch, *cached))
+        else:
+            missing.append(fetch)
+
+    started = time.monotonic()
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(missing))) as pool:
+            for fetch, result in zip(missing, pool.map(_run_fetch, missing)):
+                if result is None:
+                    continue
+                cache.put(fetch, result)
+                results.setdefault(fetch.task, []).append((fetch, result, time.time()))
+    print(
+        f"⇣ Prefetched {sum(len(v) for v in results.values())}/{len(fetches)} tool results "
+        f"({len(fetches) - len(missing)} cached) in {time.monotonic() - started:.1f}s."
+    )
+    return results
+
+
+def prefetched_inputs(
+    topic: str,
+    tasks: Iterable[str] = PREFETCH_TASKS,
+    budgets: Optional[Any] = None,
+) -> Dict[str, str]:
+    """
+    ``prefetched_<task>`` template inputs for ``tasks``.
+
+    With ``budgets`` (a ``TaskBudgets``) each task's block is compacted to
+    its ``prefetch`` token budget.
+    """
+    from company_research.token_budget import fit_inputs
+
+    tasks = [t for t in tasks if t in PREFETCH_TASKS]
+    results = prefetch(topic, tasks)
+    inputs: Dict[str, str] = {}
+    for task in tasks:
+        entries = results.get(task) or []
+        texts = {fetch.label: result for fetch, result, _ in entries}
+        # Cached results carry the time they were fetched, not this run's.
+        stamps = {
+            fetch.label: datetime.fromtimestamp(fetched_at).strftime("%Y-%m-%d %H:%M")
+            for fetch, _, fetched_at in entries
+        }
+        if budgets is not None and texts:
+            fitted = fit_inputs(texts, budgets.get(task, "prefetch"))
+            texts = {label: fitted[label].text for label in texts}
+        blocks = [f"=== {label} (fetched {stamps[label]}) ===\n{text}" for label, text in texts.items()]
+        inputs[f"prefetched_{task}"] = "\n\n".join(blocks) or NOTHING_PREFETCHED
+    return inputs
+
+
+def placeholder_inputs() -> Dict[str, str]:
+    """Defaults so every task template can be interpolated without a prefetch."""
+    return {f"prefetched_{task}": NOTHING_PREFETCHED for task in PREFETCH_TASKS}
+
+
+def prefetch_enabled() -> bool:
+    return os.getenv("COMPANY_RESEARCH_PREFETCH", "1").lower() not in ("0", "false", "no", "off")
+
+
+__all__ = [
+    "NOTHING_PREFETCHED",
+    "PREFETCH_TASKS",
+    "TOOL_TTLS",
+    "Fetch",
+    "PrefetchCache",
+    "placeholder_inputs",
+    "plan",
+    "prefetch",
+    "prefetch_enabled",
+    "prefetched_inputs",
+]
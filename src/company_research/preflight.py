@@ -0,0 +1,417 @@
+"""Pre-flight classification of the research topic.
+
+Before any agent runs, the topic is classified once: is it a publicly listed
+company, and if so on which exchange and under which ticker, and where is it
+based. The answer comes from the Wikipedia infobox (``type``, ``traded_as``
+and the headquarters country) and, when a TwelveData key is set and the
+infobox leaves the listing open, from TwelveData's symbol search. Results are
+cached on disk, so later runs on the same topic classify for free.
+
+The pipeline uses the profile to hand each task only the tools that can work
+for the entity (no quote or chart tools for a private company) and to give
+the financial analyst the ticker directly instead of letting it search.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from company_research.utils import atomic_write_text, topic_slug
+
+if TYPE_CHECKING:
+    from crewai.tools import BaseTool
+
+logger = logging.getLogger(__name__)
+
+# Resolved profiles change rarely (IPOs, delistings); failed lookups are
+# retried soon.
+RESOLVED_TTL = timedelta(days=7)
+UNRESOLVED_TTL = timedelta(hours=1)
+
+_WIKIPEDIA_HEADERS = {"User-Agent": "CompanyResearchAgent/1.0 (company_research@example.com)"}
+_INFOBOX_START = re.compile(r"\{\{\s*infobox", re.IGNORECASE)
+_FIELD_NAME = re.compile(r"\s*(\w+)\s*")
+_TICKER_TEMPLATE = re.compile(r"\{\{\s*([A-Za-z][\w .&-]*?)\s*\|\s*([A-Za-z0-9][A-Za-z0-9.\-]*)\s*[|}]")
+# Templates inside ``traded_as`` that wrap lists rather than name an exchange.
+_LIST_TEMPLATES = {"ubl", "unbulleted list", "plainlist", "flatlist", "hlist", "nowrap"}
+# Listings the market data tools resolve as they are.
+_US_EXCHANGES = {"NYSE", "NASDAQ", "NYSE AMERICAN", "NYSE ARCA", "NYSE MKT", "AMEX"}
+# Suffixes that make other listings resolvable ("2330" on TWSE is "2330.TW").
+_EXCHANGE_SUFFIXES = {
+    "TWSE": ".TW",
+    "TPEX": ".TWO",
+    "NSE": ".NS",
+    "BSE": ".BO",
+    "LSE": ".L",
+    "TYO": ".T",
+    "TSE": ".T",
+    "SEHK": ".HK",
+    "HKEX": ".HK",
+    "ASX": ".AX",
+    "TSX": ".TO",
+    "TSXV": ".V",
+    "FWB": ".F",
+    "XETRA": ".DE",
+    "SIX": ".SW",
+    "KRX": ".KS",
+    "KOSDAQ": ".KQ",
+    "SGX": ".SI",
+    "JSE": ".JO",
+    "BMV": ".MX",
+    "B3": ".SA",
+    "SSE": ".SS",
+    "SZSE": ".SZ",
+    # A bare {{Euronext}} template is used for Paris and Amsterdam listings
+    # alike, so only the venue-specific names are mapped.
+    "EURONEXT PARIS": ".PA",
+    "EURONEXT AMSTERDAM": ".AS",
+    "EURONEXT BRUSSELS": ".BR",
+    "EURONEXT LISBON": ".LS",
+    "EURONEXT DUBLIN": ".IR",
+    "EURONEXT MILAN": ".MI",
+    "EURONEXT OSLO": ".OL",
+    "BIT": ".MI",
+    "OSE": ".OL",
+}
+_NOT_LISTED_TYPES = ("private", "subsidiary", "government", "state-owned", "nonprofit", "non-profit", "cooperative")
+
+
+@dataclass
+class EntityProfile:
+    topic: str
+    listed: Optional[bool]  # None when it could not be determined
+    ticker: Optional[str] = None
+    exchange: Optional[str] = None
+    country: Optional[str] = None
+    kind: Optional[str] = None  # infobox "type", e.g. "Public" or "Private"
+    source: str = ""
+    resolved_at: str = ""
+
+    @property
+    def resolved(self) -> bool:
+        return self.listed is not None
+
+    def describe(self) -> str:
+        """One or two sentences for the task prompts."""
+        where = f" ({self.country})" if self.country else ""
+        if self.listed and self.ticker:
+            venue = f" on {self.exchange}" if self.exchange else ""
+            return (
+                f"{self.topic} is publicly listed{venue} as {self.ticker}{where}. "
+                f"Pass the ticker {self.ticker} directly to the market data tools; "
+                "no symbol search is needed."
+            )
+        if self.listed:
+            return f"{self.topic} is publicly listed{where}; its ticker is not known yet."
+        if self.listed is False:
+            kind = (self.kind or "private").lower()
+            return (
+                f"{self.topic} is a {kind} company{where} without a listed stock, so no "
+                "quote or chart data exists. Focus on funding rounds, valuation and "
+                "reported revenue."
+            )
+        return f"Whether {self.topic} is publicly listed could not be determined in advance."
+
+    def inputs(self) -> Dict[str, str]:
+        return {"entity_profile": self.describe()}
+
+
+def _plain(wikitext: str) -> str:
+    """Strip links, templates and markup from an infobox value."""
+    text = re.sub(r"<ref[^>]*/>|<ref.*?</ref>|<!--.*?-->", "", wikitext, flags=re.DOTALL)
+    text = re.sub(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]", r"\1", text)
+    text = re.sub(r"\{\{[^{}]*\}\}", "", text)
+    text = re.sub(r"<[^>]+>|'{2,}", "", text)
+    return text.strip(" ,;")
+
+
+def infobox_fields(wikitext: str) -> Dict[str, str]:
+    """
+    ``name = value`` fields of the first infobox in ``wikitext``.
+
+    Values may span lines and contain nested templates and links (``traded_as
+    = {{Unbulleted list |{{TWSE|2330}} |{{NYSE|TSM}}}}``); only pipes at the
+    infobox's own level separate fields.
+    """
+    text = re.sub(r"<!--.*?-->", "", wikitext, flags=re.DOTALL)
+    start = _INFOBOX_START.search(text)
+    parts: List[str] = []
+    current: List[str] = []
+    depth = 0
+    i = start.end() if start else 0
+    while i < len(text):
+        pair = text[i:i + 2]
+        if pair in ("{{", "[["):
+            depth += 1
+            current.append(pair)
+            i += 2
+        elif pair in ("}}", "]]"):
+            if depth == 0 and pair == "}}" and start:
+                break
+            depth = max(depth - 1, 0)
+            current.append(pair)
+            i += 2
+        elif text[i] == "|" and depth == 0:
+            parts.append("".join(current))
+            current = []
+            i += 1
+        else:
+            current.append(text[i])
+            i += 1
+    parts.append("".join(current))
+
+    fields: Dict[str, str] = {}
+    for part in parts[1:]:
+        name, sep, value = part.partition("=")
+        if sep and _FIELD_NAME.fullmatch(name):
+            fields.setdefault(name.strip().lower(), value.strip())
+    return fields
+
+
+def _provider_symbol(exchange: str, symbol: str) -> Optional[str]:
+    """``symbol`` as the market data tools know it, or None if the exchange is not mapped."""
+    if exchange in _US_EXCHANGES:
+        return symbol
+    suffix = _EXCHANGE_SUFFIXES.get(exchange)
+    if suffix is None:
+        return None
+    symbol = symbol.rstrip(".")
+    if suffix == ".HK":
+        symbol = symbol.zfill(4)
+    return symbol + suffix
+
+
+def choose_listing(listings: List[Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+    """
+    The (exchange, ticker) to research from an infobox's listings.
+
+    A US listing (often an ADR) comes first, as every market data tool
+    resolves it; then a listing on a mapped exchange with its suffix. A
+    symbol on an unmapped exchange is not used as written: LVMH's
+    ``{{Euronext|MC}}`` would research Moelis on US feeds. None is returned
+    instead, so the name-checked symbol search picks the listing.
+    """
+    listings = [(exchange.upper(), symbol.upper()) for exchange, symbol in listings]
+    for exchange, symbol in listings:
+        if exchange in _US_EXCHANGES:
+            return exchange, symbol
+    for exchange, symbol in listings:
+        mapped = _provider_symbol(exchange, symbol)
+        if mapped:
+            return exchange, mapped
+    return None
+
+
+def parse_infobox(wikitext: str) -> Dict[str, Optional[str]]:
+    """Listing facts from the lead section of a company article."""
+    fields = infobox_fields(wikitext)
+    result: Dict[str, Optional[str]] = {"kind": None, "exchange": None, "ticker": None, "country": None}
+    if fields.get("type"):
+        result["kind"] = _plain(fields["type"]) or None
+    listings = [
+        (name, symbol)
+        for name, symbol in _TICKER_TEMPLATE.findall(fields.get("traded_as", ""))
+        if name.lower() not in _LIST_TEMPLATES
+    ]
+    listing = choose_listing(listings)
+    if listing:
+        result["exchange"], result["ticker"] = listing
+    elif listings:
+        # Listed, but the symbol needs the symbol search to be usable.
+        result["exchange"] = listings[0][0].upper()
+    for key in ("hq_location_country", "location_country", "country"):
+        if fields.get(key):
+            result["country"] = _plain(fields[key]) or None
+            break
+    return result
+
+
+def _wikipedia_facts(topic: str) -> Tuple[Optional[str], Dict[str, Optional[str]]]:
+    from company_research.tools.custom_tool import _request_json
+
+    data = _request_json(
+        "https://en.wikipedia.org/w/api.php",
+        {
+            "action": "query",
+            "prop": "revisions",
+            "titles": topic,
+            "rvprop": "content",
+            "rvslots": "main",
+            "rvsection": 0,
+            "redirects": 1,
+            "format": "json",
+            "formatversion": 2,
+        },
+        headers=_WIKIPEDIA_HEADERS,
+    )
+    pages = (data.get("query") or {}).get("pages") or []
+    page = pages[0] if pages else {}
+    revisions = page.get("revisions") or []
+    if page.get("missing") or not revisions:
+        return None, {}
+    content = revisions[0].get("slots", {}).get("main", {}).get("content", "")
+    if "{{Infobox" not in content and "{{infobox" not in content:
+        return page.get("title"), {}
+    return page.get("title"), parse_infobox(content)
+
+
+def _normalize_name(name: str) -> str:
+    name = re.sub(r"[^a-z0-9 ]+", " ", name.lower())
+    name = re.sub(r"\b(inc|corp|corporation|ltd|limited|plc|co|company|group|holdings|sa|ag|nv)\b", " ", name)
+    return " ".join(name.split())
+
+
+def _symbol_match(topic: str, api_key: str) -> Optional[Dict[str, Any]]:
+    """The TwelveData listing whose instrument name matches ``topic``, if any."""
+    from company_research.tools.custom_tool import _request_json
+
+    data = _request_json(
+        "https://api.twelvedata.com/symbol_search", {"symbol": topic, "apikey": api_key}
+    )
+    wanted = _normalize_name(topic)
+    for match in data.get("data") or []:
+        name = _normalize_name(match.get("instrument_name", ""))
+        if wanted and (name == wanted or name.startswith(wanted + " ")):
+            return match
+    return None
+
+
+def classify(topic: str) -> EntityProfile:
+    """Classify ``topic`` from Wikipedia and, if needed, TwelveData (no cache)."""
+    profile = EntityProfile(topic=topic, listed=None, resolved_at=datetime.now().isoformat())
+    sources: List[str] = []
+    try:
+        title, facts = _wikipedia_facts(topic)
+    except Exception as exc:  # no network, provider down, odd page
+        logger.warning("Wikipedia lookup for '%s' failed: %s", topic, exc)
+        title, facts = None, {}
+    if facts:
+        sources.append(f"wikipedia:{title}")
+        profile.kind, profile.country = facts["kind"], facts["country"]
+        if facts["ticker"]:
+            profile.listed, profile.ticker, profile.exchange = True, facts["ticker"], facts["exchange"]
+        elif facts["exchange"]:
+            profile.listed, profile.exchange = True, facts["exchange"]
+        elif profile.kind:
+            kind = profile.kind.lower()
+            if "public" in kind:
+                profile.listed = True
+            elif any(word in kind for word in _NOT_LISTED_TYPES):
+                profile.listed = False
+
+    api_key = os.getenv("TWELVEDATA_API_KEY")
+    if api_key and profile.listed is not False and not profile.ticker:
+        try:
+            match = _symbol_match(title or topic, api_key)
+        except Exception as exc:
+            logger.warning("Symbol search for '%s' failed: %s", topic, exc)
+            match = None
+        if match:
+            sources.append("twelvedata")
+            profile.listed = True
+            profile.ticker = match.get("symbol")
+            profile.exchange = match.get("exchange")
+            profile.country = profile.country or match.get("country")
+
+    profile.source = ", ".join(sources)
+    return profile
+
+
+class EntityCache:
+    """Entity profiles by topic, kept in a small JSON file."""
+
+    _lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.getenv("COMPANY_RESEARCH_ENTITY_CACHE", "data/entities.json")
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, topic: str) -> Optional[EntityProfile]:
+        entry = self._load().get(topic_slug(topic))
+        if not entry:
+            return None
+        try:
+            profile = EntityProfile(**entry)
+            age = datetime.now() - datetime.fromisoformat(profile.resolved_at)
+        except (TypeError, ValueError):
+            return None
+        return profile if age < (RESOLVED_TTL if profile.resolved else UNRESOLVED_TTL) else None
+
+    def aliases(self, name: str) -> Set[str]:
+        """
+        Slugs ``name`` is known by: itself, its ticker if it is a cached topic,
+        and the topics listed under it if it is a ticker.
+
+        Listings rarely change, so entries count here whatever their age.
+        """
+        slug = topic_slug(name)
+        aliases = {slug}
+        for key, entry in self._load().items():
+            ticker = entry.get("ticker")
+            if not ticker:
+                continue
+            if key == slug:
+                aliases.add(topic_slug(ticker))
+            elif topic_slug(ticker) == slug:
+                aliases.add(key)
+        return aliases
+
+    def put(self, profile: EntityProfile) -> None:
+        with self._lock:
+            entries = self._load()
+            entries[topic_slug(profile.topic)] = asdict(profile)
+            atomic_write_text(self.path, json.dumps(entries, indent=2))
+
+
+def preflight(topic: str, cache: Optional[EntityCache] = None) -> EntityProfile:
+    """The entity profile of ``topic``, classified once and then served from the cache."""
+    cache = cache or EntityCache()
+    profile = cache.get(topic)
+    if profile is None:
+        profile = classify(topic)
+        cache.put(profile)
+        logger.info("Classified '%s': %s", topic, profile.describe())
+    return profile
+
+
+def applicable_tools(tools: List["BaseTool"], profile: EntityProfile) -> List["BaseTool"]:
+    """
+    ``tools`` without the ones that cannot work for the entity.
+
+    Tools whose registry spec needs a listing are dropped for entities known
+    to be unlisted; an unresolved profile keeps every tool.
+    """
+    from company_research.tools.registry import TOOL_SPECS
+
+    if profile.listed is not False:
+        return list(tools)
+    return [
+        tool
+        for tool in tools
+        if not (tool.name in TOOL_SPECS and TOOL_SPECS[tool.name].needs_listing)
+    ]
+
+
+__all__ = [
+    "EntityCache",
+    "EntityProfile",
+    "applicable_tools",
+    "choose_listing",
+    "classify",
+    "infobox_fields",
+    "parse_infobox",
+    "preflight",
+]
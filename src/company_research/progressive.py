@@ -0,0 +1,195 @@
+"""Progressive report assembly while the research pipeline runs.
+
+As soon as an analysis task finishes, its output is rendered into the report
+section it feeds (``report_section`` in tasks.yaml) and the partial report is
+written atomically to a draft next to the report
+(``reports/{topic}_report.draft.md``). Readers (the service's report
+endpoint) see useful content after the first task instead of after the whole
+pipeline, while the previous finished report stays in place until
+``finalize`` replaces it. Sections also carry the data blocks rendered by
+``company_research.report_templates`` (market data for Financials). The
+writer's final pass only adds the Executive Summary and Conclusion around the
+sections already in place.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+
+from company_research.artifacts import record_report
+from company_research.limits import split_partial
+from company_research.report_templates import render_structured, with_factual_blocks
+from company_research.sections import ReportSection, ReportTree, SectionSource, sections_path
+from company_research.utils import atomic_write_text
+
+SUMMARY_TITLE = "Executive Summary"
+CONCLUSION_TITLE = "Conclusion"
+SYNTHESIS_TASK = "generate_report"
+PENDING = "_Analysis in progress..._"
+
+ProgressCallback = Callable[[List[str], int], None]
+
+
+def render_task_output(raw: str) -> str:
+    """
+    Markdown body for a section from a task's raw output.
+
+    JSON outputs (the analysis tasks are asked for JSON) are rendered by
+    ``render_structured`` into tables and lists; prose is kept with its
+    headings demoted below ``##`` so it cannot split the report's section
+    structure. Outputs cut short by a task limit keep a visible note saying
+    so.
+    """
+    from company_research.pipeline import strip_code_fence
+
+    raw, partial = split_partial(raw)
+    text = strip_code_fence(raw)
+    if text.startswith("```json"):
+        text = text[7:].strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, (dict, list)):
+        body = "\n".join(render_structured(data)).strip()
+    else:
+        body = re.sub(r"^#{1,2}(?=\s)", "###", text, flags=re.MULTILINE).strip()
+    if partial:
+        body += f"\n\n> Partial result: the analysis stopped early ({partial})."
+    return body
+
+
+class ProgressiveReport:
+    """The report of one research run, filled in section by section."""
+
+    def __init__(
+        self,
+        topic: str,
+        path: str,
+        sources: List[SectionSource],
+        on_progress: Optional[ProgressCallback] = None,
+        draft_path: Optional[str] = None,
+    ) -> None:
+        self.topic = topic
+        self.path = path
+        self.draft_path = draft_path or f"{os.path.splitext(path)[0]}.draft.md"
+        self.sources = sources
+        self.on_progress = on_progress
+        self.ready: List[str] = []
+        self._lock = threading.Lock()
+        self.tree = ReportTree(
+            sections=[
+                ReportSection(title=source.title, body=PENDING, source_task=source.task)
+                for source in sources
+            ]
+        )
+
+    def _preamble(self, final: bool) -> str:
+        title = f"# {self.topic} Report"
+        if final:
+            return title
+        return (
+            f"{title}\n\n> Draft: {len(self.ready)} of {len(self.sources)} sections ready; "
+            "the summary and conclusion are added when all analyses are done."
+        )
+
+    def _write(self, final: bool = False) -> None:
+        self.tree.preamble = self._preamble(final)
+        if not final:
+            atomic_write_text(self.draft_path, self.tree.render())
+            return
+        atomic_write_text(self.path, self.tree.render())
+        self.tree.save_metadata(sections_path(self.topic))
+        try:
+            os.remove(self.draft_path)
+        except OSError:
+            pass
+
+    def start(self) -> None:
+        """Write the skeleton so the draft exists from the first second of the run."""
+        with self._lock:
+            self._write()
+
+    def add(self, task_name: str, raw: str) -> None:
+        """Render ``task_name``'s output into its section and rewrite the draft."""
+        section = self.tree.find(task_name)
+        if section is None:
+            return
+        with self._lock:
+            body = render_task_output(raw) or "_No findings were returned._"
+            section.body = with_factual_blocks(task_name, self.topic, body)
+            section.updated_at = datetime.now().isoformat()
+            if task_name not in self.ready:
+                self.ready.append(task_name)
+            self._write()
+        print(f"✓ {section.title} section ready in {self.draft_path}")
+        if self.on_progress is not None:
+            self.on_progress(list(self.ready), len(self.sources))
+
+    def recorder(self, task_name: str) -> Callable[[Any], None]:
+        """Task callback adding the task's output to the report."""
+
+        def _record(output: Any) -> None:
+            self.add(task_name, str(getattr(output, "raw", output)))
+
+        return _record
+
+    def finalize(self, synthesis: str) -> str:
+        """
+        Wrap the analysis sections with the writer's summary and conclusion.
+
+        The writer is asked for exactly those two sections. Any extra sections
+        it adds go before the conclusion, and prose without headings becomes
+        the summary.
+        """
+        from company_research.pipeline import strip_code_fence
+
+        synthesis, partial = split_partial(synthesis)
+        written = ReportTree.parse(strip_code_fence(synthesis))
+        summary = conclusion = None
+        extra: List[ReportSection] = []
+        for section in written.sections:
+            lowered = section.title.lower()
+            if summary is None and "summary" in lowered:
+                summary = section
+            elif conclusion is None and ("conclusion" in lowered or "recommendation" in lowered):
+                conclusion = section
+            elif not any(section.title == s.title for s in self.tree.sections):
+                extra.append(section)
+        if summary is None and written.preamble and not written.preamble.startswith("#"):
+            summary = ReportSection(SUMMARY_TITLE, written.preamble)
+
+        closing = conclusion or summary
+        if partial and closing is not None:
+            closing.body += f"\n\n> Partial result: the synthesis stopped early ({partial})."
+
+        now = datetime.now().isoformat()
+        for section in (summary, conclusion, *extra):
+            if section is not None:
+                section.source_task = SYNTHESIS_TASK
+                section.updated_at = now
+
+        with self._lock:
+            analyses = [s for s in self.tree.sections if s.source_task != SYNTHESIS_TASK]
+            self.tree.sections = (
+                ([summary] if summary else []) + analyses + extra + ([conclusion] if conclusion else [])
+            )
+            self._write(final=True)
+            rendered = self.tree.render()
+        record_report(self.topic, rendered)
+        return rendered
+
+
+__all__ = [
+    "CONCLUSION_TITLE",
+    "PENDING",
+    "ProgressCallback",
+    "ProgressiveReport",
+    "SUMMARY_TITLE",
+    "render_task_output",
+]
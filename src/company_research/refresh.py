@@ -0,0 +1,322 @@
+"""Delta refresh: patch an existing report with what changed since it was written.
+
+Each analysis task has a cheap change probe that asks its upstream source
+only for what is new since a watermark:
+
+- ``gather_company_info``: the Wikipedia article's latest revision id.
+- ``analyze_financials``: TwelveData daily candles after the last one seen.
+- ``analyze_sentiment``: NewsAPI articles published after the last one seen.
+- ``analyze_market_position``: no cheap delta source exists, so it falls back
+  to the task's ``data_max_age_hours``.
+
+The first refresh after a full run has no watermarks yet, so the task's
+checkpoint timestamp serves as the "since" time. Probes that cannot run
+(missing key, provider down) also fall back to the age check.
+
+Only tasks whose probe reports a change are re-run, through
+``ResearchPipeline.regenerate``, with the delta handed to the writer. A
+"What Changed" section at the top of the report lists the deltas.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from company_research.artifacts import record_report
+from company_research.checkpoints import CheckpointStore
+from company_research.sections import expired_sources
+from company_research.utils import atomic_write_text
+
+if TYPE_CHECKING:
+    from company_research.pipeline import ResearchPipeline
+
+logger = logging.getLogger(__name__)
+
+WHAT_CHANGED_TASK = "refresh"
+WHAT_CHANGED_TITLE = "What Changed"
+_WIKIPEDIA_HEADERS = {"User-Agent": "CompanyResearchAgent/1.0 (company_research@example.com)"}
+
+
+@dataclass
+class Delta:
+    task: str
+    changed: bool
+    summary: str
+    watermark: Dict[str, Any] = field(default_factory=dict)
+    probed: bool = True  # False when the age fallback decided
+
+
+def _utc(value: str) -> datetime:
+    """
+    Parse an ISO timestamp as UTC.
+
+    API timestamps carry an offset or ``Z``; naive ones (checkpoint times) are
+    local time.
+    """
+    stamp = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if stamp.tzinfo is None:
+        stamp = stamp.astimezone()
+    return stamp.astimezone(timezone.utc)
+
+
+def probe_wikipedia(topic: str, since: str, watermark: Dict[str, Any]) -> Delta:
+    from company_research.tools.custom_tool import _request_json
+
+    data = _request_json(
+        "https://en.wikipedia.org/w/api.php",
+        {
+            "action": "query",
+            "prop": "revisions",
+            "titles": watermark.get("title") or topic,
+            "rvprop": "ids|timestamp",
+            "redirects": 1,
+            "format": "json",
+        },
+        headers=_WIKIPEDIA_HEADERS,
+    )
+    pages = (data.get("query") or {}).get("pages") or {}
+    page = next(iter(pages.values()), {})
+    revisions = page.get("revisions") or []
+    if not revisions:
+        raise RuntimeError(f"No Wikipedia article found for '{topic}'.")
+    revision = revisions[0]
+    mark = {"title": page.get("title"), "revid": revision["revid"]}
+    if "revid" in watermark:
+        changed = revision["revid"] != watermark["revid"]
+    else:
+        changed = _utc(revision["timestamp"]) > _utc(since)
+    summary = (
+        f"Wikipedia article '{page.get('title')}' was edited on {revision['timestamp'][:10]}."
+        if changed
+        else "No Wikipedia edits."
+    )
+    return Delta("gather_company_info", changed, summary, mark)
+
+
+def probe_candles(topic: str, since: str, watermark: Dict[str, Any]) -> Delta:
+    """
+    New daily candles of the ticker the pre-flight profile resolved.
+
+    The profile's ticker is the one the report was researched with (a symbol
+    search's first match can be another company); unlisted entities have no
+    candles to compare.
+    """
+    from company_research.preflight import preflight
+    from company_research.tools.custom_tool import _request_json
+
+    profile = preflight(topic)
+    if profile.listed is False:
+        return Delta("analyze_financials", False, f"{topic} is not listed; no candles to compare.", {})
+    if not profile.ticker:
+        return Delta("analyze_financials", False, "No listed ticker; nothing to compare.", {})
+    api_key = os.getenv("TWELVEDATA_API_KEY")
+    if not api_key:
+        raise RuntimeError("TWELVEDATA_API_KEY is not set.")
+    symbol = profile.ticker
+    if watermark.get("symbol") != symbol:
+        # A watermark for another symbol says nothing about this one.
+        watermark = {}
+
+    last_seen = watermark.get("last_candle") or since[:10]
+    data = _request_json(
+        "https://api.twelvedata.com/time_series",
+        {
+            "symbol": symbol,
+            "interval": "1day",
+            "start_date": last_seen,
+            "outputsize": 60,
+            "apikey": api_key,
+        },
+    )
+    if data.get("status") == "error":
+        raise RuntimeError(f"TwelveData API error for {symbol}: {data.get('message')}")
+    values = sorted(data.get("values") or [], key=lambda v: v["datetime"])
+    new = [v for v in values if v["datetime"][:10] > last_seen[:10]]
+    mark = {"symbol": symbol, "last_candle": (new[-1] if new else {"datetime": last_seen})["datetime"][:10]}
+    if not new:
+        return Delta("analyze_financials", False, f"No new {symbol} candles.", mark)
+    base = [v for v in values if v["datetime"][:10] <= last_seen[:10]]
+    start_close = float((base[-1] if base else new[0])["close"])
+    end_close = float(new[-1]["close"])
+    change = (end_close / start_close - 1) * 100 if start_close else 0.0
+    summary = (
+        f"{len(new)} new {symbol} daily candles since {last_seen[:10]}: "
+        f"close {start_close:.2f} -> {end_close:.2f} ({change:+.2f}%), "
+        f"range {min(float(v['low']) for v in new):.2f}-{max(float(v['high']) for v in new):.2f}."
+    )
+    return Delta("analyze_financials", True, summary, mark)
+
+
+def probe_news(topic: str, since: str, watermark: Dict[str, Any]) -> Delta:
+    from company_research.tools.custom_tool import _request_json
+
+    api_key = os.getenv("NEWSAPI_API_KEY")
+    if not api_key:
+        raise RuntimeError("NEWSAPI_API_KEY is not set.")
+    last_seen = watermark.get("last_published_at") or since
+    data = _request_json(
+        "https://newsapi.org/v2/everything",
+        {
+            "q": topic,
+            "language": "en",
+            "sortBy": "publishedAt",
+            "pageSize": 20,
+            "from": _utc(last_seen).strftime("%Y-%m-%dT%H:%M:%S"),
+            "apiKey": api_key,
+        },
+    )
+    articles = [
+        a
+        for a in data.get("articles") or []
+        if a.get("publishedAt") and _utc(a["publishedAt"]) > _utc(last_seen)
+    ]
+    if not articles:
+        return Delta("analyze_sentiment", False, "No new articles.", {"last_published_at": last_seen})
+    articles.sort(key=lambda a: a["publishedAt"], reverse=True)
+    headlines = "; ".join(
+        f"{a.get('title', 'Untitled')} ({(a.get('source') or {}).get('name', 'unknown')}, {a['publishedAt'][:10]})"
+        for a in articles[:5]
+    )
+    total = data.get("totalResults", len(articles))
+    summary = f"{len(articles)} new articles (of {total} matching) including: {headlines}."
+    return Delta(
+        "analyze_sentiment", True, summary, {"last_published_at": articles[0]["publishedAt"]}
+    )
+
+
+PROBES: Dict[str, Callable[[str, str, Dict[str, Any]], Delta]] = {
+    "gather_company_info": probe_wikipedia,
+    "analyze_financials": probe_candles,
+    "analyze_sentiment": probe_news,
+}
+
+
+class WatermarkStore:
+    """Per-topic probe watermarks, kept next to the topic's checkpoints."""
+
+    def __init__(self, store: CheckpointStore) -> None:
+        self.path = os.path.join(store.directory, "_watermarks.json")
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, watermarks: Dict[str, Dict[str, Any]]) -> None:
+        atomic_write_text(self.path, json.dumps(watermarks, indent=2))
+
+
+def detect_changes(pipeline: "ResearchPipeline", topic: str) -> List[Delta]:
+    """Probe every section source concurrently; one Delta per analysis task."""
+    store = CheckpointStore(topic)
+    watermarks = WatermarkStore(store).load()
+    updated_at: Dict[str, Optional[str]] = {}
+    for source in pipeline.sources:
+        checkpoint = store.load(source.task)
+        updated_at[source.task] = checkpoint.updated_at if checkpoint else None
+    expired = {source.task for source in expired_sources(pipeline.sources, updated_at)}
+
+    def _probe(task: str) -> Delta:
+        since = updated_at.get(task)
+        probe = PROBES.get(task)
+        if probe is not None and since is not None:
+            try:
+                return probe(topic, since, watermarks.get(task, {}))
+            except Exception as exc:  # any probe failure degrades to the age check
+                logger.warning("Change probe for %s failed (%s); using data age.", task, exc)
+        changed = task in expired
+        summary = (
+            f"Data is older than {pipeline.source_for(task).max_age_hours} hours."
+            if changed
+            else "Within its refresh window."
+        )
+        return Delta(task, changed, summary, watermarks.get(task, {}), probed=False)
+
+    tasks = [source.task for source in pipeline.sources]
+    with ThreadPoolExecutor(max_workers=len(tasks) or 1) as pool:
+        return list(pool.map(_probe, tasks))
+
+
+def what_changed_section(deltas: List[Delta], replaced: List[str]) -> str:
+    lines = [f"## {WHAT_CHANGED_TITLE}", "", f"*Refreshed {datetime.now():%Y-%m-%d %H:%M}.*", ""]
+    changed = [d for d in deltas if d.changed]
+    if not changed:
+        lines.append("No upstream data changed since the previous version of this report.")
+    for delta in changed:
+        lines.append(f"- **{delta.task.replace('_', ' ').capitalize()}**: {delta.summary}")
+    if replaced:
+        lines.extend(["", f"Updated sections: {', '.join(replaced)}."])
+    return "\n".join(lines)
+
+
+def refresh_report(pipeline: "ResearchPipeline", topic: str) -> List[Delta]:
+    """
+    Re-run only the analysis tasks whose upstream data changed and patch the
+    report in place, adding a "What Changed" section at the top.
+
+    Raises ValueError if ``topic`` has no report yet (run a full research first).
+    """
+    from company_research.pipeline import report_path
+    from company_research.sections import sections_path
+
+    tree = pipeline.report_tree(topic)  # raises ValueError without a report
+    deltas = detect_changes(pipeline, topic)
+    changed = [d for d in deltas if d.changed]
+    for delta in deltas:
+        state = "changed" if delta.changed else "unchanged"
+        print(f"{'•' if delta.changed else '·'} {delta.task}: {state} — {delta.summary}")
+
+    started = datetime.now().isoformat()
+    replaced: List[str] = []
+    if changed:
+        replaced = pipeline.regenerate(
+            topic,
+            [d.task for d in changed],
+            task_feedback={
+                d.task: f"Update the section for what changed since the last report: {d.summary}"
+                for d in changed
+            },
+        )
+        tree = pipeline.report_tree(topic)
+
+    tree.splice(WHAT_CHANGED_TASK, what_changed_section(deltas, replaced))
+    # Keep "What Changed" first so readers see it before the body.
+    tree.sections.sort(key=lambda s: s.source_task != WHAT_CHANGED_TASK)
+    content = tree.render()
+    atomic_write_text(report_path(topic), content)
+    tree.save_metadata(sections_path(topic))
+    record_report(topic, content)
+
+    # Watermarks only advance for tasks that are now up to date, so a delta
+    # whose section failed to regenerate is picked up again next time.
+    watermarks = WatermarkStore(CheckpointStore(topic))
+    marks = watermarks.load()
+    for delta in deltas:
+        section = tree.find(delta.task)
+        refreshed = section is not None and (section.updated_at or "") >= started
+        if delta.probed and (refreshed or not delta.changed):
+            marks[delta.task] = delta.watermark
+    watermarks.save(marks)
+    return deltas
+
+
+__all__ = [
+    "PROBES",
+    "WHAT_CHANGED_TITLE",
+    "Delta",
+    "WatermarkStore",
+    "detect_changes",
+    "probe_candles",
+    "probe_news",
+    "probe_wikipedia",
+    "refresh_report",
+    "what_changed_section",
+]
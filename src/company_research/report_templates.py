@@ -0,0 +1,460 @@
+"""Deterministic rendering of the factual parts of reports.
+
+Numbers in a report come from data, not from a model restating them: the
+stock chart tool's results become a ``MarketSnapshot`` (prices, returns over
+fixed horizons, moving averages, recent bars) that is rendered into the
+chart report and into a "Market data" block of the Financials section, and
+structured task outputs are rendered into tables and lists. The writer only
+adds narrative that refers to those blocks.
+
+Returns are measured over fixed horizons (1 month to 5 years, plus the full
+period annualised) rather than from the first bar of whatever history was
+fetched, which on decades of monthly bars gave changes like "+511577%".
+
+Blocks added to a section are wrapped in ``<!-- data:<name> -->`` markers,
+so a regenerated section gets fresh blocks instead of an LLM copy of old
+ones.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HORIZONS: Tuple[Tuple[str, Dict[str, int]], ...] = (
+    ("1 month", {"months": 1}),
+    ("3 months", {"months": 3}),
+    ("6 months", {"months": 6}),
+    ("1 year", {"years": 1}),
+    ("3 years", {"years": 3}),
+    ("5 years", {"years": 5}),
+)
+# Market data older than this is left out of the Financials section.
+SNAPSHOT_MAX_AGE_HOURS = 24.0
+RECENT_BARS = 5
+_BLOCK = re.compile(r"\n*<!-- data:(\w+) -->.*?<!-- /data:\1 -->\n*", re.DOTALL)
+
+
+@dataclass
+class PriceChange:
+    label: str
+    since: str  # date of the close the change is measured from
+    start: float
+    change_pct: float
+    annualized_pct: Optional[float] = None
+
+
+def _date(stamp: "pd.Timestamp") -> str:
+    return stamp.strftime("%Y-%m-%d" if stamp == stamp.normalize() else "%Y-%m-%d %H:%M")
+
+
+def price_changes(df: "pd.DataFrame") -> List[PriceChange]:
+    """
+    Close-to-close changes over ``HORIZONS``, year to date and the full period.
+
+    Each change is measured from the last close at or before the horizon's
+    start; horizons the data does not reach back to are left out. The full
+    period carries an annualised rate when it spans a year or more.
+    """
+    import pandas as pd
+
+    closes = df["close"].astype("float64").dropna()
+    if len(closes) < 2:
+        return []
+    end, latest = closes.index[-1], float(closes.iloc[-1])
+
+    def _change(label: str, target: "pd.Timestamp") -> Optional[PriceChange]:
+        before = closes[closes.index <= target]
+        if before.empty or before.index[-1] == end or not before.iloc[-1]:
+            return None
+        start = float(before.iloc[-1])
+        return PriceChange(label, _date(before.index[-1]), start, (latest / start - 1) * 100)
+
+    changes = []
+    for label, offset in HORIZONS[:3]:
+        changes.append(_change(label, end - pd.DateOffset(**offset)))
+    # Year to date runs from the last close of the previous year.
+    changes.append(_change("Year to date", end.normalize().replace(month=1, day=1) - pd.Timedelta(microseconds=1)))
+    for label, offset in HORIZONS[3:]:
+        changes.append(_change(label, end - pd.DateOffset(**offset)))
+    changes = [c for c in changes if c is not None]
+
+    first, start = closes.index[0], float(closes.iloc[0])
+    if start:
+        years = (end - first).days / 365.25
+        label = f"Full period ({years:.1f} years)" if years >= 1 else "Full period"
+        full = PriceChange(label, _date(first), start, (latest / start - 1) * 100)
+        if years >= 1:
+            full.annualized_pct = ((latest / start) ** (1 / years) - 1) * 100
+        changes.append(full)
+    return changes
+
+
+def headline_change(changes: List[PriceChange]) -> Optional[PriceChange]:
+    """The 1-year change, or the longest shorter horizon when history is short."""
+    by_label = {change.label: change for change in changes}
+    for label in ("1 year", "6 months", "3 months", "1 month"):
+        if label in by_label:
+            return by_label[label]
+    return changes[-1] if changes else None
+
+
+@dataclass
+class MarketSnapshot:
+    """What the stock chart tool computed for one symbol and timeframe."""
+
+    symbol: str
+    timeframe: str
+    as_of: str
+    first_date: str
+    bars: int
+    latest_close: float
+    period_high: float
+    period_low: float
+    high_52w: Optional[float] = None
+    low_52w: Optional[float] = None
+    avg_volume_recent: float = 0.0
+    moving_averages: Dict[str, Optional[float]] = field(default_factory=dict)
+    changes: List[PriceChange] = field(default_factory=list)
+    recent: List[Dict[str, Any]] = field(default_factory=list)
+    chart_file: Optional[str] = None
+    currency: Optional[str] = None  # ISO code from the feed, e.g. "USD" or "TWD"
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: "pd.DataFrame",
+        symbol: str,
+        timeframe: str,
+        chart_file: Optional[str] = None,
+        currency: Optional[str] = None,
+    ) -> "MarketSnapshot":
+        import pandas as pd
+
+        end = df.index[-1]
+        last_year = df[df.index > end - pd.DateOffset(years=1)]
+        covers_year = df.index[0] <= end - pd.DateOffset(years=1)
+        closes = df["close"].astype("float64")
+        averages = {
+            f"MA {window}": float(closes.rolling(window).mean().iloc[-1]) if len(df) >= window else None
+            for window in (20, 50, 200)
+        }
+        return cls(
+            symbol=symbol,
+            timeframe=timeframe,
+            as_of=_date(end),
+            first_date=_date(df.index[0]),
+            bars=len(df),
+            latest_close=float(closes.iloc[-1]),
+            period_high=float(df["high"].max()),
+            period_low=float(df["low"].min()),
+            high_52w=float(last_year["high"].max()) if covers_year else None,
+            low_52w=float(last_year["low"].min()) if covers_year else None,
+            avg_volume_recent=float(df["volume"].tail(20).mean()),
+            moving_averages=averages,
+            changes=price_changes(df),
+            recent=[
+                {
+                    "date": _date(stamp),
+                    **{key: float(row[key]) for key in ("open", "high", "low", "close")},
+                    "volume": int(row["volume"]),
+                }
+                for stamp, row in df.tail(RECENT_BARS).iterrows()
+            ],
+            chart_file=chart_file,
+            currency=currency,
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), indent=2)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MarketSnapshot":
+        data = dict(data)
+        data["changes"] = [PriceChange(**c) for c in data.get("changes") or []]
+        return cls(**data)
+
+    def summary(self) -> str:
+        """One line for the agent that called the tool."""
+        text = f"Latest close {_money(self.latest_close, self.currency)} ({self.as_of})"
+        change = headline_change(self.changes)
+        if change is not None:
+            text += f", {change.change_pct:+.2f}% over {change.label.lower()} (since {change.since})"
+        return text + "."
+
+
+_CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "CNY": "¥", "INR": "₹", "KRW": "₩"}
+
+
+def _money(value: Optional[float], currency: Optional[str] = None) -> str:
+    """``value`` in ``currency``: a symbol where one is unambiguous, else the code after it."""
+    if value is None:
+        return "N/A"
+    symbol = _CURRENCY_SYMBOLS.get(currency or "")
+    if symbol:
+        return f"{symbol}{value:,.2f}"
+    return f"{value:,.2f} {currency}" if currency else f"{value:,.2f}"
+
+
+def _table(headers: List[str], rows: List[List[Any]]) -> List[str]:
+    cells = [[_cell(value) for value in row] for row in rows]
+    return [
+        "| " + " | ".join(headers) + " |",
+        "|" + "|".join("---" for _ in headers) + "|",
+        *("| " + " | ".join(row) + " |" for row in cells),
+    ]
+
+
+def _cell(value: Any) -> str:
+    text = "" if value is None else str(value)
+    return text.replace("|", "\\|").replace("\n", " ")
+
+
+def returns_table(changes: List[PriceChange], currency: Optional[str] = None) -> List[str]:
+    rows = []
+    for change in changes:
+        annual = f" ({change.annualized_pct:+.2f}% a year)" if change.annualized_pct is not None else ""
+        rows.append(
+            [change.label, change.since, _money(change.start, currency), f"{change.change_pct:+.2f}%{annual}"]
+        )
+    return _table(["Horizon", "From", "Close then", "Change"], rows)
+
+
+def key_metrics_table(snapshot: MarketSnapshot) -> List[str]:
+    money = partial(_money, currency=snapshot.currency)
+    rows = [
+        ["Latest close", f"{money(snapshot.latest_close)} ({snapshot.as_of})"],
+        ["52-week high / low", f"{money(snapshot.high_52w)} / {money(snapshot.low_52w)}"],
+        [
+            f"High / low since {snapshot.first_date}",
+            f"{money(snapshot.period_high)} / {money(snapshot.period_low)}",
+        ],
+        ["Average volume (last 20 bars)", f"{snapshot.avg_volume_recent:,.0f}"],
+    ]
+    rows += [[f"{name} ({snapshot.timeframe} bars)", money(value)] for name, value in snapshot.moving_averages.items()]
+    return _table(["Metric", "Value"], rows)
+
+
+def recent_bars_table(snapshot: MarketSnapshot) -> List[str]:
+    money = partial(_money, currency=snapshot.currency)
+    return _table(
+        ["Date", "Open", "High", "Low", "Close", "Volume"],
+        [
+            [bar["date"], money(bar["open"]), money(bar["high"]), money(bar["low"]), money(bar["close"]), f"{bar['volume']:,}"]
+            for bar in snapshot.recent
+        ],
+    )
+
+
+def _chart_link(chart_file: str, alt: str) -> str:
+    if chart_file.endswith((".png", ".svg")):
+        return f"![{alt}]({chart_file})"
+    return f"[View interactive chart]({chart_file})"
+
+
+def render_chart_report(snapshot: MarketSnapshot, generated: Optional[str] = None) -> str:
+    """The stock chart tool's Markdown report."""
+    generated = generated or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    lines = [
+        f"# Stock Analysis Report: {snapshot.symbol}",
+        f"**Generated:** {generated}  ",
+        f"**Timeframe:** {snapshot.timeframe}  ",
+        f"**Data Points:** {snapshot.bars} ({snapshot.first_date} to {snapshot.as_of})",
+        "",
+    ]
+    if snapshot.chart_file:
+        lines += ["## Chart", "", _chart_link(snapshot.chart_file, f"{snapshot.symbol} Chart"), ""]
+    lines += ["## Key Metrics", "", *key_metrics_table(snapshot), ""]
+    lines += ["## Returns", "", *returns_table(snapshot.changes, snapshot.currency), ""]
+    lines += [f"## Recent Data (Last {len(snapshot.recent)} bars)", "", *recent_bars_table(snapshot), ""]
+    lines += ["---", "", "*Report generated by Stock Chart Tool*"]
+    return "\n".join(lines)
+
+
+def block(name: str, body: str) -> str:
+    """``body`` wrapped in the markers ``strip_blocks`` recognises."""
+    return f"<!-- data:{name} -->\n{body.strip()}\n<!-- /data:{name} -->"
+
+
+def strip_blocks(text: str) -> str:
+    """``text`` without any rendered data blocks."""
+    return _BLOCK.sub("\n\n", text).strip()
+
+
+def render_market_data(snapshot: MarketSnapshot, chart_dir: str = "") -> str:
+    lines = [f"### Market data: {snapshot.symbol}", ""]
+    lines += [f"_{snapshot.timeframe} bars from {snapshot.first_date} to {snapshot.as_of}, rendered from the market data feed._", ""]
+    lines += [*key_metrics_table(snapshot), "", *returns_table(snapshot.changes, snapshot.currency)]
+    if snapshot.chart_file:
+        path = f"{chart_dir.rstrip('/')}/{snapshot.chart_file}" if chart_dir else snapshot.chart_file
+        lines += ["", _chart_link(path, f"{snapshot.symbol} chart")]
+    return block("market", "\n".join(lines))
+
+
+def latest_snapshot(symbol: str, max_age_hours: float = SNAPSHOT_MAX_AGE_HOURS) -> Optional[MarketSnapshot]:
+    """The newest snapshot the stock chart tool stored for ``symbol``, if recent enough."""
+    import sqlite3
+
+    from company_research.artifacts import default_store
+
+    try:
+        store = default_store()
+        artifact = store.latest(symbol, "chart_data")
+        if artifact is None or time.time() - artifact.created_at > max_age_hours * 3600:
+            return None
+        return MarketSnapshot.from_dict(json.loads(store.read(artifact)))
+    except (OSError, ValueError, TypeError, sqlite3.Error) as exc:
+        logger.warning("Could not load market data for %s: %s", symbol, exc)
+        return None
+
+
+def factual_blocks(task_name: str, topic: str) -> List[str]:
+    """Data blocks rendered into ``task_name``'s report section."""
+    if task_name != "analyze_financials":
+        return []
+    import os
+
+    from company_research.preflight import EntityCache
+
+    profile = EntityCache().get(topic)
+    if profile is None or not profile.ticker:
+        return []
+    snapshot = latest_snapshot(profile.ticker)
+    if snapshot is None:
+        return []
+    return [render_market_data(snapshot, os.getenv("STOCK_CHART_OUTPUT_DIR", "stock_reports"))]
+
+
+def with_factual_blocks(task_name: str, topic: str, body: str) -> str:
+    """``body`` with its data blocks replaced by freshly rendered ones."""
+    blocks = factual_blocks(task_name, topic)
+    return "\n\n".join([strip_blocks(body), *blocks]).strip()
+
+
+# Structured task outputs
+
+
+def _humanize(key: str) -> str:
+    # Keys already written as labels ("Revenue FY2025") keep their casing.
+    if " " in key.strip():
+        return key.strip()
+    return key.replace("_", " ").strip().capitalize()
+
+
+def _scalar(value: Any) -> bool:
+    return not isinstance(value, (dict, list))
+
+
+def _tabular(items: List[Any]) -> bool:
+    """A list of flat records with shared keys, which reads best as a table."""
+    if len(items) < 2 or not all(isinstance(i, dict) and i and all(_scalar(v) for v in i.values()) for i in items):
+        return False
+    keys = set(items[0])
+    return all(len(keys & set(item)) >= max(1, len(keys) // 2) for item in items[1:])
+
+
+def _records_table(items: List[Dict[str, Any]]) -> List[str]:
+    headers: List[str] = []
+    for item in items:
+        headers += [key for key in item if key not in headers]
+    return _table([_humanize(h) for h in headers], [[item.get(h) for h in headers] for item in items])
+
+
+_SWOT_KEYS = ("strengths", "weaknesses", "opportunities", "threats")
+
+
+def _swot_table(swot: Dict[str, Any]) -> List[str]:
+    columns = []
+    for key in _SWOT_KEYS:
+        entries = swot.get(key) or []
+        columns.append([str(e) for e in entries] if isinstance(entries, list) else [str(entries)])
+    depth = max(len(column) for column in columns)
+    rows = [[column[i] if i < len(column) else "" for column in columns] for i in range(depth)]
+    return _table([_humanize(key) for key in _SWOT_KEYS], rows)
+
+
+def render_structured(value: Any, depth: int = 0) -> List[str]:
+    """
+    Markdown for a parsed JSON task output.
+
+    Top-level scalars become a key-figures table, lists of flat records
+    (competitors, funding rounds, articles) become tables, a SWOT mapping
+    becomes a four-column table, and anything else nests as bullets.
+    """
+    indent = "  " * depth
+    lines: List[str] = []
+    if isinstance(value, dict):
+        items = list(value.items())
+        if depth == 0:
+            scalars = [(k, v) for k, v in items if _scalar(v) and v not in (None, "")]
+            long_text = [(k, v) for k, v in scalars if isinstance(v, str) and len(v) > 120]
+            figures = [(k, v) for k, v in scalars if (k, v) not in long_text]
+            for _, text in long_text:
+                lines += [str(text), ""]
+            if figures:
+                lines += _table(["Item", "Value"], [[_humanize(k), v] for k, v in figures]) + [""]
+            items = [(k, v) for k, v in items if not _scalar(v) and v]
+        for key, item in items:
+            if depth == 0:
+                lines += [f"### {_humanize(key)}", ""]
+                if isinstance(item, list):
+                    lines += render_structured(item)
+                elif set(_SWOT_KEYS) <= {k.lower() for k in item}:
+                    lines += _swot_table({k.lower(): v for k, v in item.items()})
+                else:
+                    lines += _nested(item)
+                lines.append("")
+            elif _scalar(item):
+                lines.append(f"{indent}- **{_humanize(key)}:** {item}")
+            else:
+                lines.append(f"{indent}- **{_humanize(key)}:**")
+                lines.extend(render_structured(item, depth + 1))
+    elif isinstance(value, list):
+        if depth == 0 and _tabular(value):
+            return _records_table(value)
+        for item in value:
+            if _scalar(item):
+                lines.append(f"{indent}- {item}")
+            else:
+                nested = render_structured(item, depth + 1)
+                if nested:
+                    lines.append(f"{indent}- " + nested[0].strip().lstrip("- "))
+                    lines.extend(nested[1:])
+    elif value not in (None, ""):
+        lines.append(f"{indent}{value}")
+    return lines
+
+
+def _nested(item: Dict[str, Any]) -> List[str]:
+    """A nested mapping under a top-level heading: flat ones as a table, others as bullets."""
+    if all(_scalar(v) for v in item.values()):
+        return _table(["Item", "Value"], [[_humanize(k), v] for k, v in item.items()])
+    return [line[2:] if line.startswith("  ") else line for line in render_structured(item, 1)]
+
+
+__all__ = [
+    "HORIZONS",
+    "MarketSnapshot",
+    "PriceChange",
+    "block",
+    "factual_blocks",
+    "headline_change",
+    "latest_snapshot",
+    "price_changes",
+    "render_chart_report",
+    "render_market_data",
+    "render_structured",
+    "strip_blocks",
+    "with_factual_blocks",
+]
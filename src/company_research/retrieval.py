@@ -0,0 +1,451 @@
+"""Local retrieval over past research.
+
+Past reports, feedback files, chart summaries, task data and the knowledge
+directory are split into chunks and indexed with BM25. Everything is built
+and queried locally, so prior research on a company or its peers comes back
+in milliseconds without a web search.
+
+The index is persisted under ``data/index/`` and kept current
+incrementally. Each lookup first stats the corpus and re-chunks only files
+whose size or mtime changed, dropping files that disappeared.
+
+When ``COMPANY_RESEARCH_EMBEDDING_MODEL`` names a locally available
+sentence-transformers model, chunks are also embedded (loading with
+``local_files_only``, never downloading). Results then fuse the BM25 and
+cosine rankings with reciprocal rank fusion.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from company_research.utils import atomic_write_text, topic_slug
+
+logger = logging.getLogger(__name__)
+
+# Task output files (``output_file`` in tasks.yaml), kept per topic under
+# ``data/<topic_slug>/``.
+TASK_DATA_FILES = ("company_info", "financials", "market_analysis", "sentiment")
+
+# (glob pattern, kind) pairs making up the corpus.
+DEFAULT_SOURCES: Tuple[Tuple[str, str], ...] = (
+    ("reports/*_report.md", "report"),
+    ("reports/*_feedback.md", "feedback"),
+    ("stock_reports/*.md", "chart"),
+    *((f"data/*/{name}.json", "data") for name in TASK_DATA_FILES),
+    ("knowledge/*.txt", "knowledge"),
+    ("knowledge/*.md", "knowledge"),
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this "
+    "to was were will with".split()
+)
+_CHUNK_WORDS = 160
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        # Light plural folding so "revenues" finds "revenue".
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+@dataclass
+class Chunk:
+    id: str
+    path: str
+    kind: str
+    company: str
+    heading: str
+    text: str
+    mtime: float
+    terms: Dict[str, int] = field(default_factory=dict)
+    length: int = 0
+
+
+@dataclass
+class SearchHit:
+    chunk: Chunk
+    score: float
+
+    def format(self, max_chars: int = 600) -> str:
+        chunk = self.chunk
+        age_days = max(0.0, (time.time() - chunk.mtime) / 86400)
+        text = " ".join(chunk.text.split())
+        if len(text) > max_chars:
+            text = text[:max_chars].rsplit(" ", 1)[0] + " ..."
+        heading = f" § {chunk.heading}" if chunk.heading else ""
+        return f"[{chunk.path}{heading}] ({chunk.kind}, {age_days:.0f} days old)\n{text}"
+
+
+def company_of(path: str) -> str:
+    """
+    Company a file is about, from names like ``tsmc_report.md`` or
+    ``MSFT_1D_....md``, or the topic directory of ``data/tsmc/financials.json``.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name in TASK_DATA_FILES:
+        return os.path.basename(os.path.dirname(path)).lower()
+    for suffix in ("_report", "_feedback", "_sections"):
+        if name.endswith(suffix):
+            return name[: -len(suffix)].lower()
+    return name.split("_")[0].lower() if "_" in name else ""
+
+
+def _company_keys(company: str) -> Set[str]:
+    """Slugs that files about ``company`` can carry, ticker included."""
+    from company_research.preflight import EntityCache
+
+    try:
+        return EntityCache().aliases(company)
+    except (OSError, AttributeError) as exc:
+        logger.warning("Could not read the entity cache: %s", exc)
+        return {topic_slug(company)}
+
+
+def _flatten_json(value: object, prefix: str = "") -> Iterable[str]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten_json(item, f"{prefix}{key}: " if not prefix else f"{prefix}{key} / ")
+    elif isinstance(value, list):
+        for item in value:
+            yield from _flatten_json(item, prefix)
+    elif value is not None:
+        yield f"{prefix}{value}"
+
+
+def chunk_text(text: str, path: str) -> List[Tuple[str, str]]:
+    """(heading, text) chunks: Markdown split by heading, then by ~160 words."""
+    if path.endswith(".json"):
+        try:
+            text = "\n".join(_flatten_json(json.loads(text)))
+        except ValueError:
+            pass  # Task outputs are sometimes prose saved under a .json name.
+
+    sections: List[Tuple[str, List[str]]] = [("", [])]
+    for line in text.splitlines():
+        heading = re.match(r"^#{1,6}\s+(.*)", line)
+        if heading:
+            sections.append((heading.group(1).strip(), []))
+        else:
+            sections[-1][1].append(line)
+
+    chunks = []
+    for heading, lines in sections:
+        words = " ".join(lines).split()
+        for start in range(0, len(words), _CHUNK_WORDS):
+            body = " ".join(words[start : start + _CHUNK_WORDS])
+            if body:
+                chunks.append((heading, body))
+    return chunks
+
+
+class _Embedder:
+    """Optional local sentence-transformers model; disabled if unavailable."""
+
+    def __init__(self, model_name: Optional[str]) -> None:
+        self.model_name = model_name
+        self._model = None
+        self._failed = not model_name
+
+    @property
+    def enabled(self) -> bool:
+        if self._failed:
+            return False
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+
+                self._model = SentenceTransformer(self.model_name, local_files_only=True)
+            except Exception as exc:  # missing package or model not cached locally
+                logger.info("Embeddings disabled (%s); using BM25 only.", exc)
+                self._failed = True
+                return False
+        return True
+
+    def encode(self, texts: Sequence[str]):
+        return self._model.encode(list(texts), normalize_embeddings=True)
+
+
+class ResearchIndex:
+    """Incrementally maintained BM25 (plus optional embedding) index."""
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(
+        self,
+        root: str = ".",
+        sources: Sequence[Tuple[str, str]] = DEFAULT_SOURCES,
+        index_dir: Optional[str] = None,
+        embedding_model: Optional[str] = None,
+        min_refresh_interval: float = 1.0,
+    ) -> None:
+        self.root = root
+        self.sources = tuple(sources)
+        self.index_dir = index_dir or os.getenv("COMPANY_RESEARCH_INDEX_DIR", "data/index")
+        self.min_refresh_interval = min_refresh_interval
+        self._embedder = _Embedder(
+            embedding_model or os.getenv("COMPANY_RESEARCH_EMBEDDING_MODEL")
+        )
+        self._files: Dict[str, Tuple[float, int]] = {}
+        self._chunks: Dict[str, Chunk] = {}
+        self._by_file: Dict[str, List[str]] = defaultdict(list)
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._total_length = 0
+        self._vectors: Dict[str, object] = {}
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+        self._load()
+
+    # -- persistence -----------------------------------------------------
+
+    @property
+    def _state_path(self) -> str:
+        return os.path.join(self.index_dir, "retrieval.json")
+
+    def _load(self) -> None:
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        for path, (mtime, size) in state.get("files", {}).items():
+            self._files[path] = (mtime, size)
+        for data in state.get("chunks", []):
+            self._add_chunk(Chunk(**data))
+
+    def _save(self) -> None:
+        state = {
+            "files": self._files,
+            "chunks": [asdict(chunk) for chunk in self._chunks.values()],
+        }
+        atomic_write_text(self._state_path, json.dumps(state))
+
+    # -- maintenance -----------------------------------------------------
+
+    def _add_chunk(self, chunk: Chunk) -> None:
+        self._chunks[chunk.id] = chunk
+        self._by_file[chunk.path].append(chunk.id)
+        for term, count in chunk.terms.items():
+            self._postings[term][chunk.id] = count
+        self._total_length += chunk.length
+
+    def _drop_file(self, path: str) -> None:
+        for chunk_id in self._by_file.pop(path, []):
+            chunk = self._chunks.pop(chunk_id)
+            for term in chunk.terms:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._total_length -= chunk.length
+            self._vectors.pop(chunk_id, None)
+        self._files.pop(path, None)
+
+    def _index_file(self, path: str, kind: str, mtime: float, size: int) -> None:
+        try:
+            with open(os.path.join(self.root, path), "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        except OSError:
+            return
+        company = company_of(path)
+        for heading, body in chunk_text(text, path):
+            terms = Counter(tokenize(f"{heading} {body}"))
+            chunk_id = hashlib.sha1(f"{path}\0{heading}\0{body}".encode("utf-8")).hexdigest()[:16]
+            if chunk_id in self._chunks:
+                continue
+            self._add_chunk(
+                Chunk(
+                    id=chunk_id,
+                    path=path,
+                    kind=kind,
+                    company=company,
+                    heading=heading,
+                    text=body,
+                    mtime=mtime,
+                    terms=dict(terms),
+                    length=sum(terms.values()),
+                )
+            )
+        self._files[path] = (mtime, size)
+
+    def _scan(self) -> Dict[str, Tuple[str, float, int]]:
+        found: Dict[str, Tuple[str, float, int]] = {}
+        for pattern, kind in self.sources:
+            for full in glob.glob(os.path.join(self.root, pattern)):
+                path = os.path.relpath(full, self.root)
+                if path in found:
+                    continue
+                try:
+                    stat = os.stat(full)
+                except OSError:
+                    continue
+                found[path] = (kind, stat.st_mtime, stat.st_size)
+        return found
+
+    def refresh(self, force: bool = False) -> int:
+        """Re-index changed files; returns how many files were (re)indexed or dropped."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.min_refresh_interval:
+                return 0
+            self._last_refresh = now
+            found = self._scan()
+            changed = 0
+            for path in [p for p in self._files if p not in found]:
+                self._drop_file(path)
+                changed += 1
+            for path, (kind, mtime, size) in found.items():
+                if self._files.get(path) == (mtime, size):
+                    continue
+                self._drop_file(path)
+                self._index_file(path, kind, mtime, size)
+                changed += 1
+            if changed:
+                logger.info("Research index updated: %d file(s) changed.", changed)
+                self._save()
+            return changed
+
+    # -- search ----------------------------------------------------------
+
+    def _bm25(self, terms: Sequence[str], candidates: Optional[set]) -> Dict[str, float]:
+        count = len(self._chunks)
+        if not count:
+            return {}
+        avg_length = self._total_length / count
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                if candidates is not None and chunk_id not in candidates:
+                    continue
+                length = self._chunks[chunk_id].length
+                norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / norm
+        return scores
+
+    def _dense(self, query: str, candidates: Optional[set]) -> Dict[str, float]:
+        if not self._embedder.enabled:
+            return {}
+        import numpy as np
+
+        ids = [cid for cid in self._chunks if candidates is None or cid in candidates]
+        missing = [cid for cid in ids if cid not in self._vectors]
+        if missing:
+            vectors = self._embedder.encode(
+                [f"{self._chunks[c].heading}\n{self._chunks[c].text}" for c in missing]
+            )
+            self._vectors.update(zip(missing, vectors))
+        if not ids:
+            return {}
+        matrix = np.vstack([self._vectors[cid] for cid in ids])
+        similarities = matrix @ self._embedder.encode([query])[0]
+        return dict(zip(ids, similarities.tolist()))
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        company: Optional[str] = None,
+        kinds: Optional[Sequence[str]] = None,
+    ) -> List[SearchHit]:
+        self.refresh()
+        with self._lock:
+            candidates = None
+            if company or kinds:
+                # Compared as slugs: reports keep the topic as typed, task
+                # data directories are slugs ("tata motors" / "tata_motors").
+                # Chart files are named by ticker, so the entity cache's
+                # ticker for the company counts too (MSFT_1D.md for Microsoft).
+                company_keys = _company_keys(company) if company else set()
+                candidates = {
+                    cid
+                    for cid, chunk in self._chunks.items()
+                    if (not company_keys or topic_slug(chunk.company) in company_keys)
+                    and (not kinds or chunk.kind in kinds)
+                }
+            sparse = self._bm25(tokenize(query), candidates)
+            dense = self._dense(query, candidates)
+            if dense:
+                # Reciprocal rank fusion of the two rankings.
+                fused: Dict[str, float] = defaultdict(float)
+                for ranking in (sparse, dense):
+                    ordered = sorted(ranking, key=ranking.get, reverse=True)
+                    for rank, cid in enumerate(ordered[: max(k * 10, 50)]):
+                        fused[cid] += 1.0 / (60 + rank)
+                scores = fused
+            else:
+                scores = sparse
+            best = sorted(scores, key=scores.get, reverse=True)[:k]
+            return [SearchHit(self._chunks[cid], scores[cid]) for cid in best]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "chunks": len(self._chunks),
+                "terms": len(self._postings),
+            }
+
+
+def knowledge_text(directory: str = "knowledge", max_chars: int = 4000) -> str:
+    """Contents of the knowledge files, for injection into agent prompts."""
+    parts = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.txt")) + glob.glob(os.path.join(directory, "*.md"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                parts.append(f.read().strip())
+        except OSError:
+            continue
+    text = "\n\n".join(part for part in parts if part)
+    return text[:max_chars]
+
+
+_default_index: Optional[ResearchIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def default_index() -> ResearchIndex:
+    """Process-wide index shared by every tool instance."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = ResearchIndex()
+        return _default_index
+
+
+__all__ = [
+    "DEFAULT_SOURCES",
+    "Chunk",
+    "ResearchIndex",
+    "SearchHit",
+    "TASK_DATA_FILES",
+    "chunk_text",
+    "company_of",
+    "default_index",
+    "knowledge_text",
+    "tokenize",
+]
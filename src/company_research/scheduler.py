@@ -0,0 +1,494 @@
+"""Off-peak warming of tool caches and reports for a coverage universe.
+
+Daytime research runs hit Yahoo, TwelveData and NewsAPI when they are
+slowest and most rate limited. The scheduler is a long-lived process
+(``schedule``) that runs the jobs in ``config/schedule.yaml`` on cron
+expressions, typically at night and just before the market opens:
+
+- ``prefetch`` jobs fill the prefetch cache (see ``company_research.prefetch``)
+  with the calls a research run makes first, so a daytime run starts warm.
+- ``refresh`` jobs run the delta refresh of existing reports, so their task
+  checkpoints and sections are current.
+
+Companies come from the configured universe plus everything users researched
+recently, ordered by request frequency times staleness. Every call is
+charged against a per-tool daily quota and calls to one tool are spaced out,
+so the scheduler never spends the daytime's provider allowance.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple
+
+import yaml
+
+from company_research.utils import atomic_write_text, topic_slug
+
+if TYPE_CHECKING:
+    from company_research.pipeline import ResearchPipeline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config", "schedule.yaml")
+ACTIONS = ("prefetch", "refresh")
+
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_field(text: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in text.split(","):
+        base, _, step = part.partition("/")
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(v) for v in base.split("-", 1))
+        else:
+            start = end = int(base)
+            if step:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron field '{text}' is outside {low}-{high}.")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
+
+
+@dataclass(frozen=True)
+class CronSpec:
+    """A five-field cron expression: minute hour day-of-month month day-of-week."""
+
+    expression: str
+    minutes: frozenset
+    hours: frozenset
+    days: frozenset
+    months: frozenset
+    weekdays: frozenset  # 0 = Sunday, as in cron
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronSpec":
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' needs 5 fields.")
+        minutes, hours, days, months, weekdays = (
+            frozenset(_parse_field(text, low, high)) for text, (low, high) in zip(fields, _FIELD_RANGES)
+        )
+        return cls(
+            expression,
+            minutes,
+            hours,
+            days,
+            months,
+            frozenset(d % 7 for d in weekdays),
+            any_day=fields[2] == "*",
+            any_weekday=fields[4] == "*",
+        )
+
+    def _day_matches(self, when: datetime) -> bool:
+        if when.month not in self.months:
+            return False
+        day = when.day in self.days
+        weekday = (when.weekday() + 1) % 7 in self.weekdays
+        # Like cron: when both are restricted, either one matching is enough.
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def matches(self, when: datetime) -> bool:
+        return self._day_matches(when) and when.hour in self.hours and when.minute in self.minutes
+
+    def next_after(self, when: datetime) -> datetime:
+        """The first matching minute strictly after ``when``."""
+        candidate = when.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression '{self.expression}' never fires.")
+
+
+@dataclass
+class Job:
+    name: str
+    cron: CronSpec
+    action: str
+    tools: Optional[List[str]] = None  # prefetch: only these tools
+    max_minutes: float = 60.0
+    min_age_hours: float = 12.0  # refresh: skip reports younger than this
+
+
+@dataclass
+class Company:
+    name: str
+    ticker: Optional[str] = None
+    priority: float = 1.0
+
+
+@dataclass
+class ScheduleConfig:
+    jobs: Dict[str, Job] = field(default_factory=dict)
+    universe: List[Company] = field(default_factory=list)
+    quotas: Dict[str, int] = field(default_factory=dict)
+    pacing_seconds: float = 0.0
+    include_requested: bool = True
+    request_window_days: float = 30.0
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "ScheduleConfig":
+        jobs = {}
+        for name, spec in (config.get("jobs") or {}).items():
+            action = spec.get("action", "prefetch")
+            if action not in ACTIONS:
+                raise ValueError(f"Job '{name}' has unknown action '{action}'; use one of {ACTIONS}.")
+            jobs[name] = Job(
+                name=name,
+                cron=CronSpec.parse(str(spec["cron"])),
+                action=action,
+                tools=list(spec["tools"]) if spec.get("tools") else None,
+                max_minutes=float(spec.get("max_minutes", 60)),
+                min_age_hours=float(spec.get("min_age_hours", 12)),
+            )
+        universe = [
+            Company(str(entry["company"]), entry.get("ticker"), float(entry.get("priority", 1)))
+            if isinstance(entry, dict)
+            else Company(str(entry))
+            for entry in config.get("universe") or []
+        ]
+        return cls(
+            jobs=jobs,
+            universe=universe,
+            quotas={k: int(v) for k, v in (config.get("quotas") or {}).items()},
+            pacing_seconds=float(config.get("pacing_seconds", 0)),
+            include_requested=bool(config.get("include_requested", True)),
+            request_window_days=float(config.get("request_window_days", 30)),
+        )
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "ScheduleConfig":
+        path = path or os.getenv("COMPANY_RESEARCH_SCHEDULE_CONFIG", DEFAULT_CONFIG_PATH)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            config = {}
+        return cls.from_dict(config)
+
+
+def _state_dir() -> str:
+    return os.getenv("COMPANY_RESEARCH_SCHEDULE_DIR", "data/schedule")
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class RequestLog:
+    """When users asked for research on each topic, for prioritising."""
+
+    _lock = threading.Lock()
+    KEEP_DAYS = 90
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.path.join(_state_dir(), "requests.json")
+
+    def record(self, topic: str) -> None:
+        now = time.time()
+        cutoff = now - self.KEEP_DAYS * 86400
+        with self._lock:
+            entries = _load_json(self.path)
+            entry = entries.setdefault(topic_slug(topic), {"topic": topic, "times": []})
+            entry["topic"] = topic
+            entry["times"] = [t for t in entry["times"] if t >= cutoff] + [now]
+            atomic_write_text(self.path, json.dumps(entries, indent=2))
+
+    def counts(self, days: float) -> Dict[str, Tuple[str, int]]:
+        """Requests per topic slug within ``days``: ``{slug: (topic, count)}``."""
+        cutoff = time.time() - days * 86400
+        return {
+            slug: (entry["topic"], sum(1 for t in entry.get("times", []) if t >= cutoff))
+            for slug, entry in _load_json(self.path).items()
+        }
+
+
+def record_request(topic: str) -> None:
+    try:
+        RequestLog().record(topic)
+    except OSError as exc:
+        logger.warning("Could not record the request for %s: %s", topic, exc)
+
+
+class ScheduleState:
+    """Per-day quota use and the last run of each job, persisted across restarts."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.path.join(_state_dir(), "state.json")
+        self._lock = threading.Lock()
+        self.data = _load_json(self.path)
+
+    def _today(self) -> Dict[str, int]:
+        today = datetime.now().date().isoformat()
+        if self.data.get("day") != today:
+            self.data["day"], self.data["used"] = today, {}
+        return self.data.setdefault("used", {})
+
+    def used(self, name: str) -> int:
+        with self._lock:
+            return self._today().get(name, 0)
+
+    def take(self, name: str, quotas: Dict[str, int]) -> bool:
+        """Charge one call to ``name``; False once its daily quota is spent."""
+        with self._lock:
+            used = self._today()
+            limit = quotas.get(name)
+            if limit is not None and used.get(name, 0) >= limit:
+                return False
+            used[name] = used.get(name, 0) + 1
+            self._save()
+            return True
+
+    def refund(self, name: str) -> None:
+        """Give back a call to ``name`` that did not produce a result."""
+        with self._lock:
+            used = self._today()
+            if used.get(name, 0) > 0:
+                used[name] -= 1
+                self._save()
+
+    def last_run(self, job: str) -> Optional[datetime]:
+        stamp = (self.data.get("last_run") or {}).get(job)
+        return datetime.fromisoformat(stamp) if stamp else None
+
+    def mark_run(self, job: str, when: datetime) -> None:
+        with self._lock:
+            self.data.setdefault("last_run", {})[job] = when.isoformat()
+            self._save()
+
+    def _save(self) -> None:
+        atomic_write_text(self.path, json.dumps(self.data, indent=2))
+
+
+@dataclass
+class Candidate:
+    company: Company
+    score: float
+    detail: str
+    fetches: List[Any] = field(default_factory=list)  # prefetch: the stale ``Fetch``es
+
+
+@dataclass
+class JobReport:
+    job: str
+    done: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    calls: int = 0
+    seconds: float = 0.0
+
+    def format(self) -> str:
+        text = f"{self.job}: {len(self.done)} companies warmed, {self.calls} calls in {self.seconds:.0f}s"
+        if self.skipped:
+            text += f"; skipped {', '.join(self.skipped)}"
+        return text
+
+
+class Scheduler:
+    """Runs the warming jobs of a ``ScheduleConfig``."""
+
+    def __init__(
+        self,
+        config: Optional[ScheduleConfig] = None,
+        state: Optional[ScheduleState] = None,
+        requests: Optional[RequestLog] = None,
+        pipeline_factory: Optional[Callable[[], "ResearchPipeline"]] = None,
+    ) -> None:
+        self.config = config or ScheduleConfig.from_file()
+        self.state = state or ScheduleState()
+        self.requests = requests or RequestLog()
+        self.pipeline_factory = pipeline_factory
+        self._pipeline: Optional["ResearchPipeline"] = None
+        self._last_call: Dict[str, float] = {}
+
+    def universe(self) -> List[Tuple[Company, int]]:
+        """Configured and recently requested companies with their request counts."""
+        counts = self.requests.counts(self.config.request_window_days)
+        companies = {topic_slug(c.name): c for c in self.config.universe}
+        if self.config.include_requested:
+            for slug, (topic, count) in counts.items():
+                if count and slug not in companies:
+                    companies[slug] = Company(topic)
+        return [(c, counts.get(slug, ("", 0))[1]) for slug, c in companies.items()]
+
+    def candidates(self, job: Job) -> List[Candidate]:
+        """Companies with something to warm for ``job``, highest priority first."""
+        result = []
+        for company, requested in self.universe():
+            weight = (1 + requested) * company.priority
+            if job.action == "prefetch":
+                candidate = self._prefetch_candidate(job, company, weight)
+            else:
+                candidate = self._refresh_candidate(job, company, weight)
+            if candidate is not None:
+                candidate.detail += f", {requested} recent requests"
+                result.append(candidate)
+        return sorted(result, key=lambda c: -c.score)
+
+    def _profile(self, company: Company) -> Any:
+        from company_research.preflight import EntityCache, EntityProfile, preflight
+
+        cache = EntityCache()
+        profile = cache.get(company.name)
+        if company.ticker and (profile is None or not profile.ticker):
+            # The configured ticker settles the listing without a lookup.
+            profile = EntityProfile(
+                topic=company.name,
+                listed=True,
+                ticker=company.ticker,
+                source="schedule.yaml",
+                resolved_at=datetime.now().isoformat(),
+            )
+            cache.put(profile)
+        return profile or preflight(company.name, cache)
+
+    def _prefetch_candidate(self, job: Job, company: Company, weight: float) -> Optional[Candidate]:
+        from company_research.prefetch import TOOL_TTLS, PrefetchCache, plan
+
+        fetches = [
+            f for f in plan(company.name, self._profile(company)) if job.tools is None or f.tool in job.tools
+        ]
+        cache = PrefetchCache(company.name)
+        # Refetch results past half their lifetime so they last into the day.
+        stale = [
+            f
+            for f in fetches
+            if (cache.age(f) or float("inf")) > TOOL_TTLS.get(f.tool, 3600) / 2
+        ]
+        if not stale:
+            return None
+        staleness = len(stale) / len(fetches)
+        return Candidate(company, weight * staleness, f"{len(stale)}/{len(fetches)} results stale", stale)
+
+    def _refresh_candidate(self, job: Job, company: Company, weight: float) -> Optional[Candidate]:
+        from company_research.pipeline import report_path
+
+        try:
+            age_hours = (time.time() - os.path.getmtime(report_path(company.name))) / 3600
+        except OSError:
+            return None
+        if age_hours < job.min_age_hours:
+            return None
+        return Candidate(company, weight * age_hours / 24, f"report {age_hours:.0f}h old")
+
+    def _new_pipeline(self) -> "ResearchPipeline":
+        if self.pipeline_factory is not None:
+            return self.pipeline_factory()
+        from company_research.pipeline import ResearchPipeline
+
+        return ResearchPipeline.quiet()
+
+    def _pace(self, tool: str) -> None:
+        wait = self._last_call.get(tool, 0.0) + self.config.pacing_seconds - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_call[tool] = time.monotonic()
+
+    def run_job(self, job: Job) -> JobReport:
+        """Warm companies for ``job`` in priority order until its time or quotas run out."""
+        from company_research.prefetch import PrefetchCache, _run_fetch
+
+        report = JobReport(job.name)
+        started = time.monotonic()
+        deadline = started + job.max_minutes * 60
+        for candidate in self.candidates(job):
+            name = candidate.company.name
+            if time.monotonic() >= deadline:
+                report.skipped.append(f"{name} (out of time)")
+                continue
+            if job.action == "refresh":
+                if not self.state.take("refresh", self.config.quotas):
+                    report.skipped.append(f"{name} (refresh quota)")
+                    continue
+                try:
+                    if self._pipeline is None:
+                        self._pipeline = self._new_pipeline()
+                    self._pipeline.refresh(name)
+                    report.done.append(name)
+                except Exception as exc:
+                    logger.warning("Scheduled refresh of %s failed: %s", name, exc)
+                    report.skipped.append(f"{name} (failed)")
+                continue
+
+            cache = PrefetchCache(name)
+            warmed = 0
+            for fetch in candidate.fetches:
+                if time.monotonic() >= deadline:
+                    break
+                if not self.state.take(fetch.tool, self.config.quotas):
+                    logger.info("Daily quota for %s is spent; skipping %s.", fetch.tool, fetch.label)
+                    continue
+                self._pace(fetch.tool)
+                report.calls += 1
+                result = _run_fetch(fetch)
+                if result is None:
+                    # Failures are neither cached nor counted against the quota.
+                    self.state.refund(fetch.tool)
+                    continue
+                cache.put(fetch, result)
+                warmed += 1
+            (report.done if warmed else report.skipped).append(name)
+        report.seconds = time.monotonic() - started
+        self.state.mark_run(job.name, datetime.now())
+        logger.info(report.format())
+        return report
+
+    def next_runs(self, now: Optional[datetime] = None) -> List[Tuple[datetime, Job]]:
+        """Each job's next fire time, soonest first."""
+        now = now or datetime.now()
+        runs = []
+        for job in self.config.jobs.values():
+            last = self.state.last_run(job.name)
+            runs.append((job.cron.next_after(max(now, last) if last else now), job))
+        return sorted(runs, key=lambda run: run[0])
+
+    def run_forever(self, stop: Optional[threading.Event] = None) -> None:
+        """Run jobs as they fall due until ``stop`` is set."""
+        stop = stop or threading.Event()
+        if not self.config.jobs:
+            raise ValueError("No jobs are configured in the schedule.")
+        while not stop.is_set():
+            when, job = self.next_runs()[0]
+            print(f"Next: {job.name} at {when:%Y-%m-%d %H:%M}")
+            while not stop.is_set() and datetime.now() < when:
+                stop.wait(min(60.0, max((when - datetime.now()).total_seconds(), 0.1)))
+            if stop.is_set():
+                break
+            print(self.run_job(job).format())
+
+
+__all__ = [
+    "CronSpec",
+    "Company",
+    "Job",
+    "JobReport",
+    "RequestLog",
+    "ScheduleConfig",
+    "ScheduleState",
+    "Scheduler",
+    "record_request",
+]
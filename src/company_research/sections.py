@@ -0,0 +1,243 @@
+"""Reports as a tree of ``##`` sections that know where their data came from.
+
+Each analysis task in ``tasks.yaml`` declares the report section it feeds via
+``report_section`` (plus optional ``section_keywords`` used to recognise the
+section under the titles the writer actually picks). That lets a single stale
+or disputed section be regenerated from its upstream task and spliced back in
+place instead of re-running the whole pipeline.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from company_research.utils import atomic_write_text
+
+# Words that mark feedback as "fix this existing section" rather than
+# "add something new"; with them, naming the section's topic is enough
+# ("the stock figures are outdated").
+REFRESH_CUES = (
+    "outdated",
+    "out of date",
+    "stale",
+    "refresh",
+    "wrong",
+    "incorrect",
+    "inaccurate",
+    "redo",
+    "regenerate",
+    "rewrite",
+)
+# Generic words that are just as common in additive feedback ("update with an
+# investment recommendation based on the stock"); they only count when the
+# feedback names a section explicitly ("update the Financials section").
+WEAK_REFRESH_CUES = ("update", "fix", "old")
+
+
+@dataclass
+class SectionSource:
+    """The task whose output feeds a report section."""
+
+    task: str
+    title: str
+    keywords: List[str] = field(default_factory=list)
+    max_age_hours: Optional[float] = None
+
+    def matches(self, text: str) -> bool:
+        text = text.lower()
+        return self.title.lower() in text or any(k.lower() in text for k in self.keywords)
+
+    def referenced_in(self, text: str) -> bool:
+        """Whether ``text`` names this section itself: "the Financials section", "analyze_financials"."""
+        text = text.lower()
+        if self.task.lower() in text:
+            return True
+        for name in (self.title, *self.keywords):
+            name = re.escape(name.lower())
+            if re.search(rf"\b{name}\w*\s+(?:section|part|chapter)\b", text) or re.search(
+                rf"\b(?:section|part|chapter)\s+(?:on|about|called|titled)\s+(?:the\s+)?\W?{name}", text
+            ):
+                return True
+        return False
+
+
+def section_sources(tasks_config: Dict[str, Dict[str, Any]]) -> List[SectionSource]:
+    """Section sources declared in ``tasks.yaml``, in pipeline order."""
+    sources = []
+    for name, config in tasks_config.items():
+        title = config.get("report_section")
+        if not title:
+            continue
+        sources.append(
+            SectionSource(
+                task=name,
+                title=title,
+                keywords=list(config.get("section_keywords") or []),
+                max_age_hours=config.get("data_max_age_hours"),
+            )
+        )
+    return sources
+
+
+@dataclass
+class ReportSection:
+    title: str
+    body: str
+    source_task: Optional[str] = None
+    updated_at: Optional[str] = None
+
+    def render(self) -> str:
+        body = self.body.strip("\n")
+        return f"## {self.title}\n\n{body}" if body else f"## {self.title}"
+
+
+_HEADING = re.compile(r"^##(?!#)\s*(.+?)\s*#*\s*$", re.MULTILINE)
+
+
+class ReportTree:
+    """A report split into its preamble and level-two sections."""
+
+    def __init__(self, preamble: str = "", sections: Optional[List[ReportSection]] = None) -> None:
+        self.preamble = preamble
+        self.sections: List[ReportSection] = sections or []
+
+    @classmethod
+    def parse(cls, markdown: str, sources: Optional[List[SectionSource]] = None) -> "ReportTree":
+        matches = list(_HEADING.finditer(markdown))
+        if not matches:
+            return cls(preamble=markdown.strip())
+        tree = cls(preamble=markdown[: matches[0].start()].strip())
+        for index, match in enumerate(matches):
+            end = matches[index + 1].start() if index + 1 < len(matches) else len(markdown)
+            title = match.group(1).strip()
+            tree.sections.append(
+                ReportSection(title=title, body=markdown[match.end():end].strip("\n"))
+            )
+        if sources:
+            tree.assign_sources(sources)
+        return tree
+
+    def assign_sources(self, sources: List[SectionSource]) -> None:
+        """Attribute each untagged section to the first source whose title or keywords it matches."""
+        for section in self.sections:
+            if section.source_task:
+                continue
+            for source in sources:
+                if source.matches(section.title):
+                    section.source_task = source.task
+                    break
+
+    def render(self) -> str:
+        parts = [self.preamble] if self.preamble else []
+        parts.extend(section.render() for section in self.sections)
+        return "\n\n".join(parts).rstrip() + "\n"
+
+    def find(self, source_task: str) -> Optional[ReportSection]:
+        for section in self.sections:
+            if section.source_task == source_task:
+                return section
+        return None
+
+    def splice(self, source_task: str, new_section_markdown: str) -> ReportSection:
+        """
+        Replace the section fed by ``source_task`` with ``new_section_markdown``.
+
+        The section is appended if the report doesn't have one yet.
+        """
+        replacement = ReportTree.parse(new_section_markdown).sections
+        if not replacement:
+            raise ValueError("The regenerated section has no '##' heading.")
+        new_section = replacement[0]
+        new_section.source_task = source_task
+        new_section.updated_at = datetime.now().isoformat()
+
+        for index, section in enumerate(self.sections):
+            if section.source_task == source_task:
+                self.sections[index] = new_section
+                return new_section
+        self.sections.append(new_section)
+        return new_section
+
+    # Section metadata lives in a JSON sidecar next to the report so that it
+    # survives edits to the Markdown itself.
+
+    def save_metadata(self, path: str) -> None:
+        metadata = [
+            {"title": s.title, "source_task": s.source_task, "updated_at": s.updated_at}
+            for s in self.sections
+        ]
+        atomic_write_text(path, json.dumps(metadata, indent=2))
+
+    def load_metadata(self, path: str) -> None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return
+        by_title = {entry.get("title"): entry for entry in metadata}
+        for section in self.sections:
+            entry = by_title.get(section.title)
+            if entry:
+                section.source_task = entry.get("source_task") or section.source_task
+                section.updated_at = entry.get("updated_at") or section.updated_at
+
+
+def sections_path(topic: str) -> str:
+    return f"reports/{topic}_sections.json"
+
+
+def _has_cue(text: str, cues: tuple) -> bool:
+    return any(re.search(rf"\b{re.escape(cue)}\b", text) for cue in cues)
+
+
+def targeted_sources(feedback: str, sources: List[SectionSource]) -> List[SectionSource]:
+    """
+    Sources whose section the feedback asks to fix, e.g. "Financials is outdated".
+
+    A strong cue ("outdated", "wrong", "rewrite") with the section's title or
+    keywords targets it; a generic one ("update", "fix") only targets
+    sections named explicitly ("update the Financials section"). Anything
+    else is left to the normal revision, which adds a section.
+    """
+    text = feedback.lower()
+    if _has_cue(text, REFRESH_CUES):
+        return [source for source in sources if source.matches(text)]
+    if _has_cue(text, WEAK_REFRESH_CUES):
+        return [source for source in sources if source.referenced_in(text)]
+    return []
+
+
+def expired_sources(
+    sources: List[SectionSource],
+    updated_at: Dict[str, Optional[str]],
+    now: Optional[datetime] = None,
+) -> List[SectionSource]:
+    """Sources whose data is older than their ``data_max_age_hours``."""
+    now = now or datetime.now()
+    expired = []
+    for source in sources:
+        if source.max_age_hours is None:
+            continue
+        stamp = updated_at.get(source.task)
+        if stamp is None or now - datetime.fromisoformat(stamp) > timedelta(
+            hours=float(source.max_age_hours)
+        ):
+            expired.append(source)
+    return expired
+
+
+__all__ = [
+    "REFRESH_CUES",
+    "WEAK_REFRESH_CUES",
+    "ReportSection",
+    "ReportTree",
+    "SectionSource",
+    "expired_sources",
+    "section_sources",
+    "sections_path",
+    "targeted_sources",
+]
@@ -0,0 +1,319 @@
+"""Long-running research service with a small local HTTP job API.
+
+The service keeps one warm ``ResearchPipeline`` per worker thread (configs,
+agents, tools and their pooled HTTP sessions) and runs research and revision
+jobs on a bounded pool, so an internal UI can submit work without paying
+process startup per request.
+
+Endpoints (JSON unless noted):
+
+- ``GET  /health``, including per-provider circuit state
+- ``POST /jobs`` with ``{"kind": "research", "topic": "..."}`` or
+  ``{"kind": "revision", "topic": "...", "feedback": "..."}`` or
+  ``{"kind": "refresh", "topic": "..."}``
+- ``GET  /jobs`` and ``GET /jobs/<id>``
+- ``GET  /jobs/<id>/report`` returns the report as ``text/markdown``; while a
+  research job runs this is the partial report, and the job's ``progress``
+  artifact says how many sections are ready
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from socketserver import TCPServer, ThreadingMixIn
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from company_research.jobqueue import validate
+from company_research.pipeline import ResearchPipeline, draft_path, read_text, report_path
+from company_research.tools.health import PROVIDER_HEALTH
+from company_research.utils import topic_slug
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    topic: str
+    feedback: Optional[str] = None
+    status: str = "queued"
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    artifacts: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def perform(
+    pipeline: ResearchPipeline,
+    kind: str,
+    topic: str,
+    feedback: Optional[str],
+    artifacts: Dict[str, str],
+) -> None:
+    """Run one research, refresh or revision job, filling ``artifacts`` as it goes."""
+    if kind == "research":
+        artifacts["report"] = report_path(topic)
+
+        def _progress(ready: List[str], total: int) -> None:
+            artifacts["progress"] = f"{len(ready)}/{total} sections ready"
+
+        pipeline.research(topic, on_progress=_progress)
+    elif kind == "refresh":
+        deltas = pipeline.refresh(topic)
+        artifacts["changed"] = ", ".join(d.task for d in deltas if d.changed)
+    else:
+        section = pipeline.revise(topic, feedback or "")
+        if section is None:
+            raise RuntimeError("No valid new section was generated.")
+        artifacts["section"] = section
+    artifacts["report"] = report_path(topic)
+
+
+class ResearchService:
+    """Accepts jobs and runs them on a bounded pool of warm pipelines."""
+
+    WARM_UP_TIMEOUT = 300.0
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        pipeline_factory: Callable[[], ResearchPipeline] = ResearchPipeline,
+    ) -> None:
+        self.max_workers = max_workers
+        self._pipeline_factory = pipeline_factory
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="research-worker"
+        )
+        self._local = threading.local()
+        self._jobs: Dict[str, Job] = {}
+        self._jobs_lock = threading.Lock()
+        # Jobs on the same topic share report, checkpoint and task data files,
+        # so they run one at a time. A topic with a job on the pool queues the
+        # rest here, keyed by slug like those files, and each finished job
+        # submits the next; waiting jobs never hold a worker.
+        self._pending: Dict[str, Deque[Job]] = {}
+
+    def warm_up(self) -> None:
+        """Build a pipeline on every worker thread ahead of the first job."""
+        # The barrier keeps each worker busy until all have started, so every
+        # thread builds its own pipeline instead of one thread building them
+        # all. A failed build aborts it rather than leaving the others waiting.
+        barrier = threading.Barrier(self.max_workers)
+
+        def _warm() -> None:
+            try:
+                self._pipeline()
+            except Exception:
+                barrier.abort()
+                raise
+            try:
+                barrier.wait(timeout=self.WARM_UP_TIMEOUT)
+            except threading.BrokenBarrierError:
+                logger.warning("Warm-up did not reach every worker; the rest warm on first use.")
+
+        futures = [self._executor.submit(_warm) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def submit(self, kind: str, topic: str, feedback: Optional[str] = None) -> Job:
+        validate(kind, topic, feedback)
+        job = Job(id=uuid.uuid4().hex[:12], kind=kind, topic=topic, feedback=feedback)
+        slug = topic_slug(topic)
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            pending = self._pending.get(slug)
+            if pending is not None:
+                pending.append(job)
+                return job
+            self._pending[slug] = deque()
+        self._executor.submit(self._execute, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._jobs_lock:
+            return list(self._jobs.values())
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _pipeline(self) -> ResearchPipeline:
+        pipeline = getattr(self._local, "pipeline", None)
+        if pipeline is None:
+            pipeline = self._pipeline_factory()
+            self._local.pipeline = pipeline
+        return pipeline
+
+    def _execute(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = datetime.now().isoformat()
+        try:
+            perform(self._pipeline(), job.kind, job.topic, job.feedback, job.artifacts)
+            job.status = "succeeded"
+        except Exception as exc:
+            logger.exception("Job %s failed", job.id)
+            job.status = "failed"
+            job.error = str(exc)
+        finally:
+            job.finished_at = datetime.now().isoformat()
+            self._submit_next(topic_slug(job.topic))
+
+    def _submit_next(self, slug: str) -> None:
+        """Start the next queued job on ``slug``, or mark the topic idle."""
+        with self._jobs_lock:
+            pending = self._pending[slug]
+            if not pending:
+                del self._pending[slug]
+                return
+            job = pending.popleft()
+        try:
+            self._executor.submit(self._execute, job)
+        except RuntimeError:  # shutting down
+            job.status = "failed"
+            job.error = "The service shut down before the job started."
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    server_version = "CompanyResearch/1.0"
+    service: ResearchService
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def address_string(self) -> str:
+        # Unix-socket peers have no (host, port) address.
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def _send(self, status: int, body: Any, content_type: str = "application/json") -> None:
+        payload = (
+            body if isinstance(body, str) else json.dumps(body, indent=2)
+        ).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self) -> Tuple[str, ...]:
+        return tuple(part for part in self.path.split("?")[0].split("/") if part)
+
+    def do_GET(self) -> None:
+        parts = self._route()
+        if parts == ("health",):
+            self._send(
+                200,
+                {
+                    "status": "ok",
+                    "workers": self.service.max_workers,
+                    "providers": PROVIDER_HEALTH.snapshot(),
+                },
+            )
+        elif parts == ("jobs",):
+            self._send(200, [job.to_dict() for job in self.service.list()])
+        elif len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.service.get(parts[1])
+            if job is None:
+                self._send(404, {"error": f"Unknown job '{parts[1]}'."})
+            elif len(parts) == 2:
+                self._send(200, job.to_dict())
+            elif parts[2] == "report":
+                # A running research job serves its draft; the finished
+                # report only replaces the previous one at the end.
+                content = None
+                if job.kind == "research" and job.status == "running":
+                    content = read_text(draft_path(job.topic))
+                content = content or read_text(report_path(job.topic))
+                if content is None:
+                    self._send(404, {"error": "Report not available yet.", "status": job.status})
+                else:
+                    self._send(200, content, content_type="text/markdown")
+            else:
+                self._send(404, {"error": "Not found."})
+        else:
+            self._send(404, {"error": "Not found."})
+
+    def do_POST(self) -> None:
+        if self._route() != ("jobs",):
+            self._send(404, {"error": "Not found."})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            job = self.service.submit(
+                kind=body.get("kind", "research"),
+                topic=(body.get("topic") or "").strip(),
+                feedback=body.get("feedback"),
+            )
+        except (ValueError, AttributeError) as exc:
+            self._send(400, {"error": str(exc)})
+            return
+        self._send(202, job.to_dict())
+
+
+class UnixHTTPServer(ThreadingMixIn, HTTPServer):
+    address_family = socket.AF_UNIX
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        # Skip HTTPServer.server_bind, which expects a (host, port) address.
+        TCPServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def make_server(
+    service: ResearchService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Optional[str] = None,
+) -> HTTPServer:
+    handler = type("JobRequestHandler", (_JobRequestHandler,), {"service": service})
+    if socket_path:
+        return UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Optional[str] = None,
+    max_workers: int = 2,
+    warm: bool = True,
+) -> None:
+    """Run the service until interrupted."""
+    service = ResearchService(max_workers=max_workers)
+    if warm:
+        service.warm_up()
+    server = make_server(service, host=host, port=port, socket_path=socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.shutdown(wait=False)
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+__all__ = ["Job", "ResearchService", "UnixHTTPServer", "make_server", "perform", "serve"]
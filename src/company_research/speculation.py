@@ -0,0 +1,251 @@
+"""Speculative drafting of likely revisions while the user reads the report.
+
+In the feedback loop the process would otherwise sit idle in ``input()``.
+With speculation on, a background thread drafts the sections users ask for
+most often (an investment recommendation, leadership, risks, a peer
+comparison) against the report being read. Which asks are most common is
+learned from the ``##`` headings of past ``reports/*_feedback.md`` files.
+
+Feedback that clearly asks for one of those sections is answered with the
+draft at once; anything else runs the normal revision and the drafts are
+thrown away. Drafts run on their own warm pipeline (separate agents), so a
+normal revision never waits for them, and their number is bounded per read
+and per session.
+"""
+
+from __future__ import annotations
+
+import glob
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from company_research.sections import ReportTree
+
+if TYPE_CHECKING:
+    from company_research.pipeline import ResearchPipeline
+
+logger = logging.getLogger(__name__)
+
+# Longer feedback usually carries specifics a generic draft would miss.
+MAX_MATCH_WORDS = 12
+# Wording that asks for less of a topic rather than a new section: "remove
+# the risks section", "no buy/sell advice", "don't compare with peers".
+_SUBTRACTIVE = re.compile(
+    r"\b(?:don[’']?t|do not|doesn[’']?t|no|not|never|without|remove|delete|drop|omit|skip|cut|"
+    r"less|fewer|shorten|trim|exclude|instead of)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class Intent:
+    """A common kind of feedback and the request drafted for it."""
+
+    name: str
+    feedback: str  # formatted with ``topic``
+    cues: Tuple[str, ...]  # regexes, matched case-insensitively
+
+    def matches(self, text: str) -> bool:
+        return any(re.search(cue, text, re.IGNORECASE) for cue in self.cues)
+
+    def request(self, topic: str) -> str:
+        return self.feedback.format(topic=topic)
+
+
+DEFAULT_INTENTS: Tuple[Intent, ...] = (
+    Intent(
+        "investment_recommendation",
+        "Add an investment recommendation: should an investor buy, hold or avoid {topic}, "
+        "with the reasoning and the key caveats.",
+        (r"\binvest", r"\brecommend", r"\bbuy\b", r"\bsell\b", r"\bhold\b", r"\bshould i\b"),
+    ),
+    Intent(
+        "leadership",
+        "Add a section on {topic}'s leadership: founders or promoters, the CEO and key "
+        "executives, with their backgrounds.",
+        (r"\bleader", r"\bceo\b", r"\bfounder", r"\bpromoter", r"\bexecutive", r"\bmanagement\b", r"\bboard\b"),
+    ),
+    Intent(
+        "risks",
+        "Add a section on the key risks facing {topic}: business, financial, regulatory "
+        "and competitive.",
+        (r"\brisk", r"\bthreat", r"\bdownside", r"\bchallenge"),
+    ),
+    Intent(
+        "peer_comparison",
+        "Add a peer comparison of {topic} against its main competitors on scale, growth, "
+        "profitability and valuation.",
+        (r"\bpeer", r"\bcompetitor", r"\bcompar", r"\bversus\b", r"\bvs\b"),
+    ),
+)
+
+
+def matching_intents(text: str, intents: Iterable[Intent] = DEFAULT_INTENTS) -> List[Intent]:
+    return [intent for intent in intents if intent.matches(text)]
+
+
+def learn_frequencies(
+    directory: str = "reports", intents: Iterable[Intent] = DEFAULT_INTENTS
+) -> Counter:
+    """How often each intent was asked for, from past feedback sections."""
+    intents = list(intents)
+    counts: Counter = Counter()
+    for path in glob.glob(os.path.join(directory, "*_feedback.md")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                tree = ReportTree.parse(f.read())
+        except OSError:
+            continue
+        for section in tree.sections:
+            for intent in matching_intents(section.title, intents):
+                counts[intent.name] += 1
+    return counts
+
+
+def rank_intents(
+    intents: Iterable[Intent] = DEFAULT_INTENTS, counts: Optional[Counter] = None
+) -> List[Intent]:
+    """``intents`` by past frequency; ties keep their declared order."""
+    intents = list(intents)
+    counts = counts or Counter()
+    return sorted(intents, key=lambda intent: -counts[intent.name])
+
+
+@dataclass
+class Draft:
+    intent: Intent
+    report_before: str
+    section: Optional[str] = None
+    started: bool = False
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+class Speculator:
+    """Drafts likely revisions of one topic's report in the background."""
+
+    def __init__(
+        self,
+        topic: str,
+        pipeline_factory: Optional[Callable[[], "ResearchPipeline"]] = None,
+        intents: Iterable[Intent] = DEFAULT_INTENTS,
+        per_read: Optional[int] = None,
+        budget: Optional[int] = None,
+        feedback_dir: str = "reports",
+    ) -> None:
+        if pipeline_factory is None:
+            from company_research.pipeline import ResearchPipeline
+
+            pipeline_factory = ResearchPipeline.quiet
+        self.topic = topic
+        self.pipeline_factory = pipeline_factory
+        self.intents = rank_intents(intents, learn_frequencies(feedback_dir, intents))
+        self.per_read = per_read if per_read is not None else int(os.getenv("COMPANY_RESEARCH_SPECULATE_DRAFTS", "2"))
+        self.budget = budget if budget is not None else int(os.getenv("COMPANY_RESEARCH_SPECULATE_BUDGET", "6"))
+        self.drafts: Dict[str, Draft] = {}
+        self._pipeline: Optional["ResearchPipeline"] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, report_before: str) -> List[str]:
+        """
+        Start drafting for ``report_before``; returns the intents queued.
+
+        Intents the report already covers (judged by its headings) are
+        skipped, as is everything once the session budget is spent.
+        """
+        self.discard()
+        covered = {
+            intent.name
+            for section in ReportTree.parse(report_before).sections
+            for intent in matching_intents(section.title, self.intents)
+        }
+        queued = [i for i in self.intents if i.name not in covered][: max(min(self.per_read, self.budget), 0)]
+        if not queued:
+            return []
+        self.budget -= len(queued)
+        stop = self._stop = threading.Event()
+        with self._lock:
+            self.drafts = {intent.name: Draft(intent, report_before) for intent in queued}
+            drafts = list(self.drafts.values())
+        previous = self._thread
+        self._thread = threading.Thread(
+            target=self._run, args=(drafts, stop, previous), name="speculation", daemon=True
+        )
+        self._thread.start()
+        return [intent.name for intent in queued]
+
+    def _run(self, drafts: List[Draft], stop: threading.Event, previous: Optional[threading.Thread]) -> None:
+        # One pipeline serves every round; wait for a discarded round still
+        # finishing its last draft.
+        if previous is not None:
+            previous.join()
+        for draft in drafts:
+            if stop.is_set():
+                break
+            draft.started = True
+            try:
+                if self._pipeline is None:
+                    self._pipeline = self.pipeline_factory()
+                draft.section = self._pipeline.draft_revision(
+                    self.topic, draft.intent.request(self.topic), draft.report_before, run="speculate"
+                )
+            except Exception as exc:
+                logger.warning("Speculative draft '%s' failed: %s", draft.intent.name, exc)
+            finally:
+                draft.done.set()
+        for draft in drafts:
+            draft.done.set()
+
+    def take(self, feedback: str, report_before: str) -> Optional[Tuple[Intent, str]]:
+        """
+        The drafted section answering ``feedback``, if there is one.
+
+        Only short feedback matching exactly one drafted intent qualifies,
+        and only if the report has not changed since the draft started.
+        Feedback with negating or removing wording ("remove the risks
+        section", "no buy/sell advice") mentions an intent without asking
+        for the section, so it always takes the normal revision. A
+        draft still being written is waited for, as it is further along than
+        a fresh revision would be; a draft not yet started is not.
+        """
+        if len(feedback.split()) > MAX_MATCH_WORDS or _SUBTRACTIVE.search(feedback):
+            return None
+        matched = matching_intents(feedback, self.intents)
+        if len(matched) != 1:
+            return None
+        with self._lock:
+            draft = self.drafts.get(matched[0].name)
+        if draft is None or draft.report_before != report_before or not draft.started:
+            return None
+        if not draft.done.is_set():
+            print(f"Finishing the precomputed '{draft.intent.name}' section...")
+            draft.done.wait()
+        return (draft.intent, draft.section) if draft.section else None
+
+    def discard(self) -> None:
+        """Stop queued drafts and drop every draft; a draft in progress finishes unused."""
+        self._stop.set()
+        with self._lock:
+            self.drafts = {}
+
+
+def speculation_enabled() -> bool:
+    return os.getenv("COMPANY_RESEARCH_SPECULATE", "0").lower() in ("1", "true", "yes", "on")
+
+
+__all__ = [
+    "DEFAULT_INTENTS",
+    "Draft",
+    "Intent",
+    "Speculator",
+    "learn_frequencies",
+    "matching_intents",
+    "rank_intents",
+    "speculation_enabled",
+]
@@ -0,0 +1,162 @@
+"""Cold-start measurement for the crew.
+
+Import times are collected in a fresh interpreter with ``python -X importtime``
+so the numbers reflect what a new CLI or worker process actually pays. The
+framework (crewai) is imported first and timed on its own; the budget applies
+to the project's own import time on top of it, which is what changes here.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+from company_research.tools.registry import heavy_modules
+
+DEFAULT_MODULE = "company_research.crew"
+DEFAULT_BUDGET_MS = 3000.0
+# Modules imported by the framework itself are not counted as eager imports
+# of ours, even when they overlap with a tool's heavy dependencies.
+FRAMEWORK_MODULES = ("crewai",)
+
+# Written to stderr between the framework preload and the project import.
+_PRELOAD_MARKER = "company_research.startup: preload done"
+
+_IMPORTTIME_LINE = re.compile(
+    r"^import time:\s+(?P<self>\d+)\s+\|\s+(?P<cumulative>\d+)\s+\|(?P<name>.*)$"
+)
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_ms: float
+    cumulative_ms: float
+    depth: int
+
+
+@dataclass
+class StartupReport:
+    module: str
+    total_ms: float
+    budget_ms: float
+    # Interpreter startup plus the preloaded framework imports.
+    framework_ms: float = 0.0
+    # Imports made by ``module`` itself, after the framework preload.
+    timings: List[ImportTiming] = field(default_factory=list)
+    eager_heavy_modules: List[str] = field(default_factory=list)
+    framework: Sequence[str] = FRAMEWORK_MODULES
+
+    @property
+    def project_ms(self) -> float:
+        return self.total_ms - self.framework_ms
+
+    @property
+    def within_budget(self) -> bool:
+        return self.project_ms <= self.budget_ms and not self.eager_heavy_modules
+
+    def top_level(self, limit: int = 15) -> List[ImportTiming]:
+        """Slowest imports of the project's first two levels, each including what it pulled in."""
+        roots = [t for t in self.timings if t.depth <= 1]
+        return sorted(roots, key=lambda t: t.cumulative_ms, reverse=True)[:limit]
+
+    def format(self, limit: int = 15) -> str:
+        status = "OK" if self.within_budget else "OVER BUDGET"
+        lines = [
+            f"Startup import of {self.module}: {self.project_ms:.0f} ms "
+            f"(budget {self.budget_ms:.0f} ms) — {status}",
+            f"Interpreter and framework ({', '.join(self.framework) or 'none'}): "
+            f"{self.framework_ms:.0f} ms, not budgeted; total {self.total_ms:.0f} ms",
+            "",
+            f"{'cumulative ms':>14}  {'self ms':>8}  module",
+        ]
+        for timing in self.top_level(limit):
+            lines.append(
+                f"{timing.cumulative_ms:>14.1f}  {timing.self_ms:>8.1f}  {timing.module}"
+            )
+        if self.eager_heavy_modules:
+            lines.append("")
+            lines.append(
+                "Imported eagerly (should be lazy): "
+                + ", ".join(self.eager_heavy_modules)
+            )
+        return "\n".join(lines)
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    timings: List[ImportTiming] = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        raw_name = match.group("name")
+        name = raw_name.lstrip()
+        # -X importtime indents nested imports by two spaces per level.
+        depth = max(0, (len(raw_name) - len(name) - 1) // 2)
+        timings.append(
+            ImportTiming(
+                module=name,
+                self_ms=int(match.group("self")) / 1000,
+                cumulative_ms=int(match.group("cumulative")) / 1000,
+                depth=depth,
+            )
+        )
+    return timings
+
+
+def measure_startup(
+    module: str = DEFAULT_MODULE,
+    budget_ms: Optional[float] = None,
+    watch: Sequence[str] = (),
+    baseline: Sequence[str] = FRAMEWORK_MODULES,
+) -> StartupReport:
+    """Import ``module`` in a fresh interpreter and report where the time goes."""
+    if budget_ms is None:
+        budget_ms = float(
+            os.getenv("COMPANY_RESEARCH_STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS)
+        )
+    watched = tuple(watch) or heavy_modules()
+    preload = "".join(f"import {name}; " for name in baseline)
+    probe = (
+        f"import sys; {preload}sys.stderr.write({_PRELOAD_MARKER!r} + '\\n'); sys.stderr.flush(); "
+        f"base = set(sys.modules); import {module}; "
+        f"print(','.join(m for m in {watched!r} if m in sys.modules and m not in base))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(
+            f"Failed to import {module} in a fresh interpreter: "
+            f"{completed.stderr.strip().splitlines()[-1:] or completed.returncode}"
+        )
+
+    preload_output, _, project_output = completed.stderr.partition(_PRELOAD_MARKER)
+    framework = parse_importtime(preload_output)
+    timings = parse_importtime(project_output)
+    framework_ms = sum(t.self_ms for t in framework)
+    eager = [m for m in completed.stdout.strip().split(",") if m]
+    return StartupReport(
+        module=module,
+        total_ms=framework_ms + sum(t.self_ms for t in timings),
+        budget_ms=budget_ms,
+        framework_ms=framework_ms,
+        timings=timings,
+        eager_heavy_modules=eager,
+        framework=tuple(baseline),
+    )
+
+
+__all__ = [
+    "ImportTiming",
+    "StartupReport",
+    "measure_startup",
+    "parse_importtime",
+]
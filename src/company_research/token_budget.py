@@ -0,0 +1,464 @@
+"""Token budgets for task prompts and tool observations.
+
+Token counts are estimated locally (no tokenizer download, no API call) and
+compared against per-task budgets declared under ``token_budget`` in
+``tasks.yaml``. When text is over budget it is compacted with increasingly
+lossy strategies: exact-duplicate removal, dropping low-value fields such as
+URLs and image links, then extractive summarisation of the longest inputs.
+
+JSON (the analysis tasks answer in JSON) is never edited line by line: it is
+parsed, low-value fields and then trailing list items and the tails of long
+strings are dropped, and the result is re-serialized, so it still parses.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from company_research.utils import atomic_write_text, topic_slug
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGETS = {
+    # Estimated tokens of task description + context handed to the agent.
+    "prompt": 12000,
+    # Estimated tokens of a task's output as forwarded to later tasks.
+    "output": 3000,
+    # Estimated tokens of prefetched tool results placed in a task's prompt.
+    "prefetch": 4000,
+}
+DEFAULT_OBSERVATION_TOKENS = 1500
+
+# Keys (in JSON payloads) and line shapes (in text) that rarely help an analyst.
+LOW_VALUE_FIELDS = frozenset(
+    {
+        "url",
+        "link",
+        "links",
+        "urltoimage",
+        "image",
+        "thumbnail",
+        "favicon",
+        "logo",
+        "id",
+        "position",
+        "cached_page_link",
+        "redirect_link",
+        "displayed_link",
+        "serpapi_link",
+        "apikey",
+    }
+)
+_LOW_VALUE_LINE = re.compile(
+    r"^\s*(?:(?:url|link|image|source link):\s*)?(?:https?://\S+|!\[[^\]]*\]\([^)]*\))\s*$",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"[A-Za-z0-9]+")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(*])")
+_CONDENSED_NOTE = "[... condensed to fit the token budget ...]"
+_JSON_FENCE = re.compile(r"^```(?:json)?\s*\n(.*?)\n?```$", re.DOTALL)
+# Strings longer than this (in tokens) may be shortened when trimming JSON.
+_LONG_STRING_TOKENS = 60
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with which their they its also been than into".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for ``text``.
+
+    Uses the larger of the ~4-characters-per-token rule of thumb and a
+    word/punctuation count, which keeps numeric tables and code from being
+    underestimated.
+    """
+    if not text:
+        return 0
+    pieces = len(re.findall(r"\w+|[^\w\s]", text))
+    return max(math.ceil(len(text) / 4), pieces)
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    strategies: List[str] = field(default_factory=list)
+
+
+def parse_structured(text: str) -> Any:
+    """The JSON object or array in ``text`` (optionally fenced), else None."""
+    stripped = text.strip()
+    fenced = _JSON_FENCE.match(stripped)
+    if fenced:
+        stripped = fenced.group(1).strip()
+    if not stripped.startswith(("{", "[")):
+        return None
+    try:
+        value = json.loads(stripped)
+    except ValueError:
+        return None
+    return value if isinstance(value, (dict, list)) else None
+
+
+def _dump(value: Any) -> str:
+    return json.dumps(value, indent=1, ensure_ascii=False)
+
+
+def dedupe(text: str) -> str:
+    """
+    Drop repeated lines and paragraphs, keeping the first occurrence.
+
+    JSON is returned unchanged: its repeated lines (``{``, ``},``, shared
+    values) are structure, not duplication.
+    """
+    if parse_structured(text) is not None:
+        return text
+    seen = set()
+    kept = []
+    for line in text.splitlines():
+        key = " ".join(line.lower().split())
+        if key and key in seen and not key.startswith(("|", "#", "---")):
+            continue
+        if key:
+            seen.add(key)
+        kept.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept))
+
+
+def _drop_fields(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            k: _drop_fields(v)
+            for k, v in value.items()
+            if k.lower() not in LOW_VALUE_FIELDS and v not in (None, "", [], {})
+        }
+    if isinstance(value, list):
+        return [_drop_fields(v) for v in value]
+    return value
+
+
+def drop_low_value(text: str) -> str:
+    """Remove URL-only lines, image links and low-value JSON fields."""
+    structured = parse_structured(text)
+    if structured is not None:
+        return _dump(_drop_fields(structured))
+    return "\n".join(line for line in text.splitlines() if not _LOW_VALUE_LINE.match(line))
+
+
+def _shrinkable(value: Any, parent: Any = None, key: Any = None):
+    """(node, parent, key) for the lists and long strings inside ``value``."""
+    if isinstance(value, dict):
+        for k, v in value.items():
+            yield from _shrinkable(v, value, k)
+    elif isinstance(value, list):
+        if len(value) > 1:
+            yield value, parent, key
+        for i, v in enumerate(value):
+            yield from _shrinkable(v, value, i)
+    elif isinstance(value, str) and parent is not None and estimate_tokens(value) > _LONG_STRING_TOKENS:
+        yield value, parent, key
+
+
+def trim_json(value: Any, max_tokens: int) -> Any:
+    """
+    Shrink parsed JSON ``value`` in place until it serializes within ``max_tokens``.
+
+    The largest list loses its last item, or the largest long string loses
+    its second half, one step at a time. Lists keep at least one item, so
+    every key survives and the result may still be over budget.
+    """
+    while estimate_tokens(_dump(value)) > max_tokens:
+        candidates = list(_shrinkable(value))
+        if not candidates:
+            break
+        node, parent, key = max(candidates, key=lambda c: estimate_tokens(_dump(c[0])))
+        if isinstance(node, list):
+            node.pop()
+        else:
+            words = node.split()
+            parent[key] = " ".join(words[: len(words) // 2]) + " ..."
+    return value
+
+
+def summarize(text: str, max_tokens: int) -> str:
+    """
+    Extractive summary of ``text`` within ``max_tokens``.
+
+    Headings and table rows are kept; prose sentences are ranked by the
+    frequency of their content words and the best ones are kept in their
+    original order. JSON is trimmed with ``trim_json`` instead, so the
+    summary still parses.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    structured = parse_structured(text)
+    if structured is not None:
+        return _dump(trim_json(structured, max_tokens))
+
+    units: List[tuple[int, str, bool]] = []
+    seen = set()
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        structural = line.lstrip().startswith(("#", "|"))
+        if structural:
+            units.append((len(units), line, True))
+            continue
+        for sentence in _SENTENCE_SPLIT.split(line.strip()):
+            key = " ".join(sentence.lower().split())
+            if key not in seen:
+                seen.add(key)
+                units.append((len(units), sentence, False))
+
+    frequencies = Counter(
+        w for _, u, _ in units for w in _WORD.findall(u.lower()) if w not in _STOPWORDS
+    )
+
+    def score(unit: str) -> float:
+        words = [w for w in _WORD.findall(unit.lower()) if w not in _STOPWORDS]
+        if not words:
+            return 0.0
+        return sum(frequencies[w] for w in words) / math.sqrt(len(words))
+
+    budget = max_tokens - estimate_tokens(_CONDENSED_NOTE)
+    chosen = set()
+    for index, unit, structural in units:
+        if structural:
+            cost = estimate_tokens(unit)
+            if cost <= budget:
+                chosen.add(index)
+                budget -= cost
+    for index, unit, _ in sorted(
+        (u for u in units if not u[2]), key=lambda u: score(u[1]), reverse=True
+    ):
+        cost = estimate_tokens(unit)
+        if cost <= budget:
+            chosen.add(index)
+            budget -= cost
+
+    summary = "\n".join(unit for index, unit, _ in units if index in chosen)
+    return f"{summary}\n{_CONDENSED_NOTE}"
+
+
+def compact(text: str, max_tokens: int) -> CompactionResult:
+    """Apply compaction strategies in order until ``text`` fits ``max_tokens``."""
+    before = estimate_tokens(text)
+    result = CompactionResult(text=text, tokens_before=before, tokens_after=before)
+    if before <= max_tokens:
+        return result
+    for name, strategy in (
+        ("dedupe", dedupe),
+        ("drop_low_value", drop_low_value),
+        ("summarize", lambda t: summarize(t, max_tokens)),
+    ):
+        compacted = strategy(result.text)
+        tokens = estimate_tokens(compacted)
+        if tokens < result.tokens_after:
+            result.text, result.tokens_after = compacted, tokens
+            result.strategies.append(name)
+        if result.tokens_after <= max_tokens:
+            break
+    return result
+
+
+def fit_inputs(inputs: Dict[str, str], max_tokens: int) -> Dict[str, CompactionResult]:
+    """
+    Compact a set of named inputs so that together they fit ``max_tokens``.
+
+    Cheap strategies are applied to every input first; if that isn't enough,
+    the longest inputs are summarised down to a fair share of the budget.
+    """
+    results = {
+        name: CompactionResult(text, estimate_tokens(text), estimate_tokens(text))
+        for name, text in inputs.items()
+    }
+    if sum(r.tokens_before for r in results.values()) <= max_tokens:
+        return results
+
+    for name, text in inputs.items():
+        before = results[name].tokens_before
+        cheap = drop_low_value(dedupe(text))
+        after = estimate_tokens(cheap)
+        if after < before:
+            results[name] = CompactionResult(cheap, before, after, ["dedupe", "drop_low_value"])
+
+    def total() -> int:
+        return sum(r.tokens_after for r in results.values())
+
+    while total() > max_tokens:
+        longest = max(results, key=lambda n: results[n].tokens_after)
+        others = total() - results[longest].tokens_after
+        target = max(max_tokens - others, max_tokens // max(len(results), 1))
+        if target >= results[longest].tokens_after:
+            break
+        summarized = summarize(results[longest].text, target)
+        tokens = estimate_tokens(summarized)
+        if tokens >= results[longest].tokens_after:
+            break
+        results[longest].text = summarized
+        results[longest].tokens_after = tokens
+        results[longest].strategies.append("summarize")
+    return results
+
+
+@dataclass
+class BudgetEntry:
+    task: str
+    kind: str
+    budget: int
+    tokens_before: int
+    tokens_after: int
+    strategies: List[str] = field(default_factory=list)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.tokens_after > self.budget
+
+
+class BudgetLedger:
+    """Budget use for one run, logged and saved under ``data/budgets/``."""
+
+    def __init__(self, topic: str, run: str = "research") -> None:
+        self.topic = topic
+        self.run = run
+        self.started_at = datetime.now().isoformat()
+        self.entries: List[BudgetEntry] = []
+        self._lock = threading.Lock()
+
+    def record(self, task: str, kind: str, budget: int, result: CompactionResult) -> None:
+        entry = BudgetEntry(
+            task, kind, budget, result.tokens_before, result.tokens_after, list(result.strategies)
+        )
+        with self._lock:
+            self.entries.append(entry)
+        if entry.strategies:
+            logger.info(
+                "%s %s: %d -> %d tokens (budget %d) via %s",
+                task, kind, entry.tokens_before, entry.tokens_after, budget,
+                ", ".join(entry.strategies),
+            )
+
+    def summary(self) -> str:
+        lines = [f"Token budget use for '{self.topic}' ({self.run}):"]
+        for e in self.entries:
+            flag = " OVER" if e.over_budget else ""
+            via = f" via {', '.join(e.strategies)}" if e.strategies else ""
+            lines.append(
+                f"- {e.task} {e.kind}: {e.tokens_after}/{e.budget}"
+                f" (from {e.tokens_before}){via}{flag}"
+            )
+        return "\n".join(lines)
+
+    def save(self, directory: Optional[str] = None) -> str:
+        directory = directory or os.getenv("COMPANY_RESEARCH_BUDGET_DIR", "data/budgets")
+        path = os.path.join(directory, f"{topic_slug(self.topic)}.json")
+        payload = {
+            "topic": self.topic,
+            "run": self.run,
+            "started_at": self.started_at,
+            "entries": [asdict(e) for e in self.entries],
+        }
+        atomic_write_text(path, json.dumps(payload, indent=2))
+        return path
+
+
+class TaskBudgets:
+    """Per-task budgets from the ``token_budget`` keys in ``tasks.yaml``."""
+
+    def __init__(self, tasks_config: Dict[str, Dict[str, Any]]) -> None:
+        self._config = tasks_config
+
+    def get(self, task: str, kind: str) -> int:
+        configured = (self._config.get(task) or {}).get("token_budget") or {}
+        return int(configured.get(kind, DEFAULT_BUDGETS[kind]))
+
+    def fit_output(self, task: str, output: Any, ledger: BudgetLedger) -> None:
+        """Compact a finished task's output in place before later tasks see it."""
+        budget = self.get(task, "output")
+        result = compact(str(output.raw), budget)
+        ledger.record(task, "output", budget, result)
+        output.raw = result.text
+
+    def fit_context(
+        self,
+        task: str,
+        template: str,
+        outputs: Sequence[tuple[str, Any]],
+        ledger: BudgetLedger,
+    ) -> None:
+        """
+        Make the prompt of the upcoming ``task`` fit its budget.
+
+        ``outputs`` are the (name, TaskOutput) pairs the task will receive as
+        context; the longest are summarised in place if the prompt is over.
+        """
+        budget = self.get(task, "prompt")
+        available = max(budget - estimate_tokens(template), 0)
+        texts = {name: str(output.raw) for name, output in outputs}
+        before = sum(estimate_tokens(t) for t in texts.values())
+        fitted = fit_inputs(texts, available)
+        strategies: List[str] = []
+        for name, output in outputs:
+            output.raw = fitted[name].text
+            strategies.extend(s for s in fitted[name].strategies if s not in strategies)
+        after = sum(r.tokens_after for r in fitted.values())
+        overhead = estimate_tokens(template)
+        ledger.record(
+            task,
+            "prompt",
+            budget,
+            CompactionResult("", before + overhead, after + overhead, strategies),
+        )
+
+
+# Tool observations are compacted against a process-wide budget; the ledger
+# of the run executing on the current thread (if any) records them.
+_active = threading.local()
+
+
+def set_active_ledger(ledger: Optional[BudgetLedger]) -> None:
+    _active.ledger = ledger
+
+
+def observation_budget() -> int:
+    return int(os.getenv("COMPANY_RESEARCH_OBSERVATION_TOKENS", DEFAULT_OBSERVATION_TOKENS))
+
+
+def fit_observation(tool_name: str, observation: Any) -> Any:
+    """Compact a tool's result before it is handed back to the agent."""
+    if not isinstance(observation, str):
+        return observation
+    budget = observation_budget()
+    result = compact(observation, budget)
+    ledger = getattr(_active, "ledger", None)
+    if ledger is not None:
+        ledger.record(tool_name, "observation", budget, result)
+    return result.text
+
+
+__all__ = [
+    "BudgetLedger",
+    "CompactionResult",
+    "TaskBudgets",
+    "compact",
+    "dedupe",
+    "drop_low_value",
+    "estimate_tokens",
+    "fit_inputs",
+    "fit_observation",
+    "parse_structured",
+    "set_active_ledger",
+    "summarize",
+    "trim_json",
+]
@@ -1,16 +1,40 @@
-from .custom_tool import (
-    GoogleTrendsTool,
-    NewsApiTool,
-    SerpApiTool,
-    WikipediaTool,
-    YahooFinanceTool,
-)
+from typing import Any
+
+from .registry import TOOL_SPECS, ToolSpec, create_tool
+
+# Tool classes are resolved on first attribute access so that importing the
+# package does not pull in the tool implementations.
+_LAZY_TOOLS = {
+    "GoogleTrendsTool": "google_trends_tool",
+    "LiveStockTool": "live_stock_tool",
+    "NewsApiTool": "news_api_tool",
+    "ResearchArchiveTool": "research_archive_tool",
+    "SerpApiTool": "serp_api_tool",
+    "StockChartTool": "stock_chart_tool",
+    "WatchlistTool": "watchlist_tool",
+    "WikipediaTool": "wikipedia_tool",
+    "YahooFinanceTool": "yahoo_finance_tool",
+}
+
+
+def __getattr__(name: str) -> Any:
+    tool_name = _LAZY_TOOLS.get(name)
+    if tool_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return TOOL_SPECS[tool_name].load()
+
 
 __all__ = [
     "GoogleTrendsTool",
+    "LiveStockTool",
     "NewsApiTool",
+    "ResearchArchiveTool",
     "SerpApiTool",
+    "StockChartTool",
+    "WatchlistTool",
     "WikipediaTool",
     "YahooFinanceTool",
+    "TOOL_SPECS",
+    "ToolSpec",
+    "create_tool",
 ]
-
@@ -1,38 +1,128 @@
 from __future__ import annotations
 
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, ClassVar, Dict, Optional, Type
-
-import pandas as pd
-import plotly.graph_objects as go
-import requests
-import wikipedia
-import wikipediaapi
-from plotly.subplots import make_subplots
+from typing import TYPE_CHECKING, Any, ClassVar, Dict, List, Optional, Type
+
 from crewai.tools import BaseTool
 from pydantic import BaseModel, Field, PrivateAttr, field_validator
 
+from company_research.limits import charge_tool
+from company_research.token_budget import fit_observation
+from company_research.tools.health import PROVIDER_HEALTH, ProviderUnavailable
+from company_research.utils import atomic_write_text
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Heavy third-party dependencies (pandas, plotly, wikipedia, requests) are
+# imported inside the methods that use them so that importing this module,
+# and therefore the crew, stays cheap for agents that never call them.
+
+
+_local = threading.local()
+
+
+def _session():
+    """Per-thread pooled HTTP session, so keep-alive connections are reused."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        import requests
+
+        session = requests.Session()
+        _local.session = session
+    return session
+
 
 def _request_json(
     url: str,
     params: Dict[str, Any],
     headers: Optional[Dict[str, str]] = None,
-    timeout: int = 30,
+    timeout: Optional[float] = None,
 ) -> Dict[str, Any]:
+    """
+    GET ``url`` and decode its JSON body, tracking the host's health.
+
+    The timeout defaults to the host's adaptive timeout. While the host's
+    circuit is open this raises ``ProviderUnavailable`` without a request.
+    """
+    import requests
+
+    health = PROVIDER_HEALTH.for_url(url)
+    health.before_request()
+    started = time.monotonic()
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=timeout)
+        response = _session().get(
+            url, params=params, headers=headers, timeout=timeout or health.timeout()
+        )
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+    except requests.HTTPError as exc:
+        # 4xx responses (bad key, unknown symbol) mean the host is up; only
+        # throttling and server errors count against it.
+        status = exc.response.status_code if exc.response is not None else 500
+        if status == 429 or status >= 500:
+            health.record_failure(time.monotonic() - started)
+        else:
+            health.record_success(time.monotonic() - started)
+        raise RuntimeError(
+            f"Failed to fetch data from {url}. Details: {exc}"
+        ) from exc
     except requests.RequestException as exc:
+        health.record_failure(time.monotonic() - started)
         raise RuntimeError(
             f"Failed to fetch data from {url}. Details: {exc}"
         ) from exc
     except ValueError as exc:
+        health.record_failure(time.monotonic() - started)
         raise RuntimeError(
             f"Received a non-JSON response from {url}. Details: {exc}"
         ) from exc
+    health.record_success(time.monotonic() - started)
+    return data
+
+
+class ToolFailure(RuntimeError):
+    """
+    A failed call whose message is written for the agent.
+
+    ``_observe`` hands the message to the agent as the result; callers of
+    ``_run`` (prefetch, the scheduler) see a failure and do not cache it.
+    """
+
+
+class ResearchTool(BaseTool):
+    """
+    Base class for the crew's tools.
+
+    Agents call tools through the structured tool built here, which routes
+    every call through ``_observe``, which charges the call against the
+    task's tool limits and compacts the result to the observation token
+    budget before it reaches the agent.
+    """
+
+    def to_structured_tool(self):
+        structured = super().to_structured_tool()
+        structured.func = self._observe
+        return structured
+
+    def _observe(self, *args: Any, **kwargs: Any) -> Any:
+        refusal = charge_tool(self.name)
+        if refusal is not None:
+            # Over the task's tool budget (see company_research.limits).
+            return refusal
+        try:
+            result = self._run(*args, **kwargs)
+        except ProviderUnavailable as exc:
+            # Fail fast with a result the agent can work around instead of an
+            # error it may retry against the same dead provider.
+            result = f"{exc} Continue with the information already gathered."
+        except ToolFailure as exc:
+            result = str(exc)
+        return fit_observation(self.name, result)
 
 
 class SerpApiToolInput(BaseModel):
@@ -48,7 +138,7 @@ class SerpApiToolInput(BaseModel):
     )
 
 
-class SerpApiTool(BaseTool):
+class SerpApiTool(ResearchTool):
     name: str = "serp_api_tool"
     description: str = (
         "Runs a Google search through SerpAPI and returns the top organic results, "
@@ -96,7 +186,7 @@ class WikipediaToolInput(BaseModel):
     )
 
 
-class WikipediaTool(BaseTool):
+class WikipediaTool(ResearchTool):
     name: str = "wikipedia_tool"
     description: str = (
         "Fetches structured information from Wikipedia, returning a concise summary "
@@ -105,6 +195,9 @@ class WikipediaTool(BaseTool):
     args_schema: Type[BaseModel] = WikipediaToolInput
 
     def _run(self, topic: str, max_sentences: int = 5) -> str:
+        import wikipedia
+        import wikipediaapi
+
         wikipedia.set_lang("en")
         wiki_api = wikipediaapi.Wikipedia(
             language="en",
@@ -141,7 +234,7 @@ class YahooFinanceToolInput(BaseModel):
     symbol: str = Field(..., description="Ticker symbol to fetch data for (e.g. AAPL).")
 
 
-class YahooFinanceTool(BaseTool):
+class YahooFinanceTool(ResearchTool):
     name: str = "yahoo_finance_tool"
     description: str = (
         "Fetches quote summary information for a ticker symbol directly from Yahoo Finance."
@@ -155,10 +248,10 @@ class YahooFinanceTool(BaseTool):
             data = _request_json(url, params={"modules": modules})
         except RuntimeError as exc:
             if "429" in str(exc):
-                return (
+                raise ToolFailure(
                     "Yahoo Finance is rate limiting requests right now. "
                     "Please wait a moment and try again."
-                )
+                ) from exc
             raise
         result = data.get("quoteSummary", {}).get("result")
         if not result:
@@ -206,7 +299,7 @@ class GoogleTrendsToolInput(BaseModel):
     )
 
 
-class GoogleTrendsTool(BaseTool):
+class GoogleTrendsTool(ResearchTool):
     name: str = "google_trends_tool"
     description: str = (
         "Retrieves historical interest-over-time data for a keyword using SerpAPI's "
@@ -276,7 +369,7 @@ class NewsApiToolInput(BaseModel):
     )
 
 
-class NewsApiTool(BaseTool):
+class NewsApiTool(ResearchTool):
     name: str = "news_api_tool"
     description: str = (
         "Queries the NewsAPI.org Everything endpoint to surface recent media coverage "
@@ -338,7 +431,32 @@ class StockChartToolInput(BaseModel):
     )
     timeframe: str = Field(
         "1D",
-        description="One of 1D (1 day), 1W (1 week), or 1M (1 month) describing the analysis window.",
+        description=(
+            "Bar size: 1D (1 day), 1W (1 week) or 1M (1 month), or intraday "
+            "1MIN, 5MIN, 15MIN, 30MIN or 1H."
+        ),
+    )
+    outputsize: int = Field(
+        500,
+        ge=1,
+        le=5000,
+        description="Number of bars of history to fetch (TwelveData allows up to 5000).",
+    )
+    max_points: Optional[int] = Field(
+        None,
+        ge=50,
+        description=(
+            "Maximum number of bars to plot; longer series are downsampled for the "
+            "chart only. Defaults to STOCK_CHART_MAX_POINTS or 1000."
+        ),
+    )
+    renderer: Optional[str] = Field(
+        None,
+        description=(
+            "Chart backend: 'plotly' (PNG via Kaleido, else interactive HTML), 'svg' "
+            "(static SVG) or 'html' (SVG in a small page). Defaults to "
+            "STOCK_CHART_RENDERER or 'plotly'."
+        ),
     )
 
     @field_validator("ticker")
@@ -350,7 +468,7 @@ class StockChartToolInput(BaseModel):
         return v
 
 
-class StockChartTool(BaseTool):
+class StockChartTool(ResearchTool):
     name: str = "stock_chart_tool"
     description: str = (
         "Generates candlestick charts, moving averages, and a markdown report for a "
@@ -361,6 +479,16 @@ class StockChartTool(BaseTool):
         "1D": "1day",
         "1W": "1week",
         "1M": "1month",
+        "1MIN": "1min",
+        "5MIN": "5min",
+        "15MIN": "15min",
+        "30MIN": "30min",
+        "1H": "1h",
+    }
+    MA_COLORS: ClassVar[Dict[str, str]] = {
+        "MA 20": "#ff9800",
+        "MA 50": "#2196f3",
+        "MA 200": "#9c27b0",
     }
 
     _output_dir: Path = PrivateAttr()
@@ -368,14 +496,18 @@ class StockChartTool(BaseTool):
     def __init__(self) -> None:
         super().__init__()
         output_dir = os.getenv("STOCK_CHART_OUTPUT_DIR", "stock_reports")
+        # The directory is created on first save rather than here, so that
+        # building the crew has no filesystem side effects.
         self._output_dir = Path(output_dir)
-        self._output_dir.mkdir(parents=True, exist_ok=True)
 
     def _run(
         self,
         ticker: Optional[str] = None,
         company: Optional[str] = None,
         timeframe: str = "1D",
+        outputsize: int = 500,
+        max_points: Optional[int] = None,
+        renderer: Optional[str] = None,
     ) -> str:
         try:
             api_key = os.getenv("TWELVEDATA_API_KEY")
@@ -394,7 +526,7 @@ class StockChartTool(BaseTool):
                 raise ValueError(f"Unsupported timeframe '{timeframe}'. Choose from {valid}.")
 
             symbol = ticker.upper() if ticker else self._search_symbol(company, api_key)
-            candles = self._get_candles(symbol, interval, api_key)
+            candles, currency = self._get_candles(symbol, interval, api_key, outputsize)
             
             if not candles or len(candles) == 0:
                 raise RuntimeError(f"No data returned for {symbol} ({timeframe}).")
@@ -403,11 +535,23 @@ class StockChartTool(BaseTool):
             
             if len(df) == 0:
                 raise RuntimeError(f"Failed to process data for {symbol}.")
-            
-            fig = self._create_chart(df, symbol, timeframe)
-            chart_path, chart_filename = self._save_chart(fig, symbol, timeframe)
+
+            self._output_dir.mkdir(parents=True, exist_ok=True)
+            max_points = max_points or int(os.getenv("STOCK_CHART_MAX_POINTS", "1000"))
+            renderer = (renderer or os.getenv("STOCK_CHART_RENDERER", "plotly")).lower()
+            if renderer in ("svg", "html"):
+                chart_path, chart_filename = self._save_svg_chart(
+                    df, symbol, timeframe, max_points, html=renderer == "html"
+                )
+            elif renderer == "plotly":
+                fig = self._create_chart(df, symbol, timeframe, max_points)
+                chart_path, chart_filename = self._save_chart(fig, symbol, timeframe)
+            else:
+                raise ValueError(
+                    f"Unsupported renderer '{renderer}'. Choose from plotly, svg or html."
+                )
             report_path, summary = self._create_markdown_report(
-                df, symbol, timeframe, chart_filename
+                df, symbol, timeframe, chart_filename, currency
             )
 
             return "\n".join(
@@ -418,8 +562,10 @@ class StockChartTool(BaseTool):
                     summary,
                 ]
             )
+        except ProviderUnavailable:
+            raise
         except Exception as e:
-            return f"Error generating stock chart: {str(e)}"
+            raise ToolFailure(f"Error generating stock chart: {str(e)}") from e
 
     def _search_symbol(self, company: Optional[str], api_key: str) -> str:
         if not company:
@@ -441,12 +587,15 @@ class StockChartTool(BaseTool):
         except Exception as e:
             raise RuntimeError(f"Failed to search for symbol '{company}': {str(e)}")
 
-    def _get_candles(self, symbol: str, interval: str, api_key: str) -> list[Dict[str, str]]:
+    def _get_candles(
+        self, symbol: str, interval: str, api_key: str, outputsize: int = 500
+    ) -> tuple[list[Dict[str, str]], Optional[str]]:
+        """The symbol's candles, newest first, and the currency they are quoted in."""
         try:
             params = {
                 "symbol": symbol,
                 "interval": interval,
-                "outputsize": 500,
+                "outputsize": outputsize,
                 "apikey": api_key,
             }
             data = _request_json("https://api.twelvedata.com/time_series", params)
@@ -461,7 +610,9 @@ class StockChartTool(BaseTool):
                     f"No candlestick data returned for {symbol} ({interval}). "
                     f"The symbol may not be available or the interval may be invalid."
                 )
-            return candles
+            meta = data.get("meta") or {}
+            # Forex pairs are quoted in their quote currency.
+            return candles, meta.get("currency") or meta.get("currency_quote")
         except RuntimeError:
             raise
         except Exception as e:
@@ -469,30 +620,44 @@ class StockChartTool(BaseTool):
 
     @staticmethod
     def _prepare_dataframe(values: list[Dict[str, str]]) -> pd.DataFrame:
+        """
+        Candles as a compact frame indexed by time, oldest first.
+
+        Prices are float32, volume int64 and the index datetime64: about a
+        third of the memory of float64 prices with string timestamps (160 KB
+        against 535 KB for 5000 daily bars). Forex pairs and indices come
+        without volume, which is then zero.
+        """
+        import pandas as pd
+
         df = pd.DataFrame(values)
-        numeric_cols = ["open", "high", "low", "close", "volume"]
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-        
+        for col in ("open", "high", "low", "close"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+        volume = df["volume"] if "volume" in df.columns else pd.Series(0, index=df.index)
+        df["volume"] = pd.to_numeric(volume, errors="coerce").fillna(0).astype("int64")
+
         # Handle datetime column - TwelveData uses 'datetime' or 'time'
         if "datetime" not in df.columns and "time" in df.columns:
             df["datetime"] = df["time"]
-        elif "datetime" not in df.columns:
-            # Create datetime index if missing
-            df["datetime"] = pd.date_range(end=pd.Timestamp.now(), periods=len(df), freq="D")
-        
-        # Convert datetime to string for display if needed
-        if df["datetime"].dtype != "object":
-            df["datetime"] = df["datetime"].astype(str)
-        
-        return df.iloc[::-1].reset_index(drop=True)
+        if "datetime" in df.columns:
+            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
+        else:
+            # TwelveData returns newest first, so the synthetic range is reversed too.
+            df["datetime"] = pd.date_range(end=pd.Timestamp.now(), periods=len(df), freq="D")[::-1]
+
+        df = df.dropna(subset=["datetime", "close"]).set_index("datetime")
+        return df[["open", "high", "low", "close", "volume"]].sort_index()
 
     @staticmethod
-    def _create_chart(df: pd.DataFrame, symbol: str, timeframe: str):
-        # Calculate moving averages only if we have enough data points
-        ma20 = df["close"].rolling(window=min(20, len(df))).mean() if len(df) > 0 else pd.Series()
-        ma50 = df["close"].rolling(window=min(50, len(df))).mean() if len(df) >= 5 else pd.Series()
-        ma200 = df["close"].rolling(window=min(200, len(df))).mean() if len(df) >= 10 else pd.Series()
+    def _create_chart(df: pd.DataFrame, symbol: str, timeframe: str, max_points: int = 1000):
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+
+        from company_research.tools.downsample import bucket_ohlcv
+
+        ma20, ma50, ma200 = StockChartTool._moving_averages(df, max_points).values()
+        plotted = bucket_ohlcv(df, max_points)
+        title = StockChartTool._chart_title(symbol, timeframe, len(df), len(plotted))
 
         fig = make_subplots(
             rows=2,
@@ -500,16 +665,16 @@ class StockChartTool(BaseTool):
             shared_xaxes=True,
             vertical_spacing=0.03,
             row_heights=[0.7, 0.3],
-            subplot_titles=(f"{symbol} - {timeframe} Chart", "Volume"),
+            subplot_titles=(title, "Volume"),
         )
 
         fig.add_trace(
             go.Candlestick(
-                x=df["datetime"],
-                open=df["open"],
-                high=df["high"],
-                low=df["low"],
-                close=df["close"],
+                x=plotted.index,
+                open=plotted["open"],
+                high=plotted["high"],
+                low=plotted["low"],
+                close=plotted["close"],
                 name=symbol,
                 increasing_line_color="#26a69a",
                 decreasing_line_color="#ef5350",
@@ -522,7 +687,7 @@ class StockChartTool(BaseTool):
         if len(ma20) > 0 and not ma20.isna().all():
             fig.add_trace(
                 go.Scatter(
-                    x=df["datetime"],
+                    x=ma20.index,
                     y=ma20,
                     mode="lines",
                     name="MA 20",
@@ -534,7 +699,7 @@ class StockChartTool(BaseTool):
         if len(ma50) > 0 and not ma50.isna().all():
             fig.add_trace(
                 go.Scatter(
-                    x=df["datetime"],
+                    x=ma50.index,
                     y=ma50,
                     mode="lines",
                     name="MA 50",
@@ -546,7 +711,7 @@ class StockChartTool(BaseTool):
         if len(ma200) > 0 and not ma200.isna().all():
             fig.add_trace(
                 go.Scatter(
-                    x=df["datetime"],
+                    x=ma200.index,
                     y=ma200,
                     mode="lines",
                     name="MA 200",
@@ -558,8 +723,8 @@ class StockChartTool(BaseTool):
 
         fig.add_trace(
             go.Bar(
-                x=df["datetime"],
-                y=df["volume"],
+                x=plotted.index,
+                y=plotted["volume"],
                 name="Volume",
                 marker_color="#78909c",
                 opacity=0.5,
@@ -588,119 +753,286 @@ class StockChartTool(BaseTool):
         fig.update_yaxes(title_text="Volume", row=2, col=1)
         return fig
 
+    @staticmethod
+    def _moving_averages(df: pd.DataFrame, max_points: int) -> Dict[str, pd.Series]:
+        """
+        MA 20/50/200 lines for plotting.
+
+        They are computed on the full series and only then downsampled, so
+        they match the values in the markdown report.
+        """
+        import pandas as pd
+
+        from company_research.tools.downsample import downsample_line
+
+        ma20 = df["close"].rolling(window=min(20, len(df))).mean() if len(df) > 0 else pd.Series()
+        ma50 = df["close"].rolling(window=min(50, len(df))).mean() if len(df) >= 5 else pd.Series()
+        ma200 = df["close"].rolling(window=min(200, len(df))).mean() if len(df) >= 10 else pd.Series()
+        return {
+            "MA 20": downsample_line(ma20, max_points),
+            "MA 50": downsample_line(ma50, max_points),
+            "MA 200": downsample_line(ma200, max_points),
+        }
+
+    @staticmethod
+    def _chart_title(symbol: str, timeframe: str, bars: int, plotted: int) -> str:
+        title = f"{symbol} - {timeframe} Chart"
+        if plotted < bars:
+            title += f" ({bars} bars shown as {plotted})"
+        return title
+
+    def _save_svg_chart(
+        self, df: pd.DataFrame, symbol: str, timeframe: str, max_points: int, html: bool = False
+    ) -> tuple[Path, str]:
+        """Render the chart natively as SVG (or a small HTML page), without Plotly."""
+        from company_research.tools.downsample import bucket_ohlcv
+        from company_research.tools.svg_chart import render_html, render_svg
+
+        plotted = bucket_ohlcv(df, max_points)
+        title = self._chart_title(symbol, timeframe, len(df), len(plotted))
+        svg = render_svg(
+            plotted,
+            title,
+            lines={k: v for k, v in self._moving_averages(df, max_points).items() if len(v)},
+            colors=self.MA_COLORS,
+        )
+        content = render_html(svg, f"{symbol} Stock Analysis - {timeframe}") if html else svg
+        renderer = "html" if html else "svg"
+        return self._publish(symbol, timeframe, "chart", content, renderer, {"renderer": renderer})
+
     def _save_chart(self, fig, symbol: str, timeframe: str) -> tuple[Path, str]:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{symbol}_{timeframe}_{timestamp}.png"
-        filepath = self._output_dir / filename
         try:
-            fig.write_image(str(filepath), width=1400, height=800, scale=2)
+            image = fig.to_image(format="png", width=1400, height=800, scale=2)
+            return self._publish(symbol, timeframe, "chart", image, "png", {"renderer": "plotly"})
         except Exception:
-            html_name = filename.replace(".png", ".html")
-            filepath = self._output_dir / html_name
-            fig.write_html(str(filepath))
-            filename = html_name
+            # Interactive fallback; plotly.js is shared from the output
+            # directory instead of being inlined into every file.
+            self._ensure_plotly_asset()
+            html = fig.to_html(include_plotlyjs="directory", full_html=True)
+            return self._publish(symbol, timeframe, "chart", html, "html", {"renderer": "plotly"})
+
+    def _ensure_plotly_asset(self) -> None:
+        asset = self._output_dir / "plotly.min.js"
+        if not asset.exists():
+            from plotly.offline import get_plotlyjs
+
+            atomic_write_text(str(asset), get_plotlyjs())
+
+    def _publish(
+        self,
+        symbol: str,
+        timeframe: str,
+        kind: str,
+        content: bytes | str,
+        extension: str,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> tuple[Path, str]:
+        """
+        Store ``content`` in the artifact store and refresh its view file.
+
+        Views have stable names (``MSFT_1D.png``), so repeated calls replace
+        them instead of adding timestamped files; earlier versions stay in
+        the store, deduplicated by content.
+        """
+        from company_research.artifacts import default_store, publish
+
+        filename = f"{symbol}_{timeframe}.{extension}"
+        filepath = self._output_dir / filename
+        publish(
+            default_store(),
+            symbol,
+            kind,
+            content,
+            str(filepath),
+            meta={"timeframe": timeframe, **(meta or {})},
+        )
         return filepath, filename
 
     def _create_markdown_report(
-        self, df: pd.DataFrame, symbol: str, timeframe: str, chart_filename: str
+        self,
+        df: pd.DataFrame,
+        symbol: str,
+        timeframe: str,
+        chart_filename: str,
+        currency: Optional[str] = None,
     ) -> tuple[Path, str]:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        latest = df.iloc[-1]
-        first = df.iloc[0]
-        change = latest["close"] - first["close"]
-        change_pct = (change / first["close"]) * 100 if first["close"] else 0
-        high_price = df["high"].max()
-        low_price = df["low"].min()
-        avg_volume = df["volume"].mean()
-
-        chart_md = (
-            f"![{symbol} Chart]({chart_filename})"
-            if chart_filename.endswith(".png")
-            else f"[View Interactive Chart]({chart_filename})"
+        from company_research.report_templates import MarketSnapshot, render_chart_report
+
+        snapshot = MarketSnapshot.from_frame(df, symbol, timeframe, chart_filename, currency)
+        # The snapshot is what reports render their market data from.
+        self._publish(symbol, timeframe, "chart_data", snapshot.to_json(), "json")
+        md_path, md_filename = self._publish(
+            symbol, timeframe, "chart_report", render_chart_report(snapshot), "md"
         )
+        summary = f"{snapshot.summary()} Chart: {chart_filename}, report: {md_filename}."
+        return md_path, summary
+
+
+class LiveStockToolInput(BaseModel):
+    ticker: str = Field(..., description="Ticker symbol to follow (e.g. AAPL).")
+    interval: str = Field(
+        "5MIN", description="Bar size: 1MIN, 5MIN, 15MIN, 30MIN or 1H."
+    )
+    wait_seconds: float = Field(
+        10.0,
+        ge=0,
+        le=60,
+        description="How long to wait for the first quotes when the stream has just started.",
+    )
 
-        ma20_val = df["close"].rolling(window=20).mean().iloc[-1] if len(df) >= 20 else None
-        ma50_val = df["close"].rolling(window=50).mean().iloc[-1] if len(df) >= 50 else None
-        ma200_val = (
-            df["close"].rolling(window=200).mean().iloc[-1] if len(df) >= 200 else None
+
+class LiveStockTool(ResearchTool):
+    name: str = "live_stock_tool"
+    description: str = (
+        "Follows a ticker's intraday quote stream and returns the live bar, session "
+        "change and SMA/EMA/RSI values. Repeated calls read the running stream "
+        "instead of re-downloading history."
+    )
+    args_schema: Type[BaseModel] = LiveStockToolInput
+
+    def _run(self, ticker: str, interval: str = "5MIN", wait_seconds: float = 10.0) -> str:
+        from company_research.tools.streaming import (
+            INTERVALS,
+            LiveSeries,
+            LiveSession,
+            ReplayQuoteSource,
+            TwelveDataQuoteSource,
+            live_session,
         )
 
-        md_lines = [
-            f"# Stock Analysis Report: {symbol}",
-            f"**Generated:** {timestamp}  ",
-            f"**Timeframe:** {timeframe}  ",
-            f"**Data Points:** {len(df)}",
-            "",
-            "---",
-            "",
-            "## Chart",
-            "",
-            chart_md,
-            "",
-            "---",
-            "",
-            "## Summary Statistics",
-            "",
-            "| Metric | Value |",
-            "|--------|-------|",
-            f"| **First Close** | ${first['close']:.2f} |",
-            f"| **Latest Close** | ${latest['close']:.2f} |",
-            f"| **Change** | ${change:.2f} ({change_pct:+.2f}%) |",
-            f"| **Period High** | ${high_price:.2f} |",
-            f"| **Period Low** | ${low_price:.2f} |",
-            f"| **Average Volume** | {avg_volume:,.0f} |",
-            "",
-            "---",
-            "",
-            "## Recent Data (Last 5 rows)",
-            "",
-            "| Date | Open | High | Low | Close | Volume |",
-            "|------|------|------|-----|-------|--------|",
-        ]
-        for _, row in df.tail(5).iterrows():
-            md_lines.append(
-                f"| {row['datetime']} | ${row['open']:.2f} | ${row['high']:.2f} | "
-                f"${row['low']:.2f} | ${row['close']:.2f} | {row['volume']:,.0f} |"
+        spec = INTERVALS.get(interval.upper())
+        if spec is None:
+            raise ValueError(
+                f"Unsupported interval '{interval}'. Choose from {', '.join(INTERVALS)}."
             )
+        td_interval, seconds = spec
+        symbol = ticker.upper()
+        idle_timeout = float(os.getenv("LIVE_QUOTES_IDLE_MINUTES", "10")) * 60
+
+        def _start() -> LiveSession:
+            replay = os.getenv("LIVE_QUOTES_REPLAY")
+            if replay:
+                source = ReplayQuoteSource(
+                    symbol, replay, speed=float(os.getenv("LIVE_QUOTES_REPLAY_SPEED", "0"))
+                )
+                return LiveSession(LiveSeries(symbol, seconds), source, idle_timeout).start()
+            api_key = os.getenv("TWELVEDATA_API_KEY")
+            if not api_key:
+                raise RuntimeError(
+                    "TWELVEDATA_API_KEY is not set (or set LIVE_QUOTES_REPLAY to a tick file)."
+                )
+            source = TwelveDataQuoteSource(
+                symbol, api_key, poll_interval=float(os.getenv("LIVE_QUOTES_POLL_SECONDS", "15"))
+            )
+            # One history request warms the indicators; after that only quotes are polled.
+            return LiveSession(LiveSeries(symbol, seconds), source, idle_timeout).start(
+                td_interval, 100
+            )
+
+        session = live_session((symbol, td_interval), _start)
+        deadline = time.monotonic() + wait_seconds
+        while (
+            not session.series.ticks
+            and not session.finished.is_set()
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.1)
+        summary = session.series.summary()
+        if session.error:
+            summary += f"\nThe quote stream stopped: {session.error}"
+        return summary
+
+
+class WatchlistToolInput(BaseModel):
+    symbols: Optional[List[str]] = Field(
+        None,
+        description="Ticker symbols to compare. Defaults to the saved watchlist.",
+    )
+    save: bool = Field(
+        False, description="Add the given symbols to the saved watchlist."
+    )
 
-        ma20_str = f"${ma20_val:.2f}" if pd.notna(ma20_val) else "N/A"
-        ma50_str = f"${ma50_val:.2f}" if pd.notna(ma50_val) else "N/A"
-        ma200_str = f"${ma200_val:.2f}" if pd.notna(ma200_val) else "N/A"
 
-        md_lines.extend(
-            [
-                "",
-                "---",
-                "",
-                "## Technical Indicators",
-                "",
-                f"- **MA 20:** {ma20_str}",
-                f"- **MA 50:** {ma50_str}",
-                f"- **MA 200:** {ma200_str}",
-                "",
-                "---",
-                "",
-                "*Report generated by Stock Chart Tool*",
-            ]
+class WatchlistTool(ResearchTool):
+    name: str = "watchlist_tool"
+    description: str = (
+        "Compares many tickers at once: returns over 1W/1M/3M/6M/1Y, annualised "
+        "volatility, max drawdown, relative strength rank and the most and least "
+        "correlated pairs, from one bulk TwelveData request."
+    )
+    args_schema: Type[BaseModel] = WatchlistToolInput
+
+    def _run(self, symbols: Optional[List[str]] = None, save: bool = False) -> str:
+        from company_research.tools.watchlist import (
+            HORIZONS,
+            Watchlist,
+            align_closes,
+            cross_section,
+            fetch_histories,
+            format_cross_section,
         )
 
-        md_filename = f"{symbol}_{timeframe}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-        md_path = self._output_dir / md_filename
-        md_path.write_text("\n".join(md_lines), encoding="utf-8")
-
-        summary = (
-            f"Latest close ${latest['close']:.2f}, "
-            f"{change:+.2f} ({change_pct:+.2f}%) versus start of period. "
-            f"Chart: {chart_filename}, report: {md_filename}."
+        api_key = os.getenv("TWELVEDATA_API_KEY")
+        if not api_key:
+            raise RuntimeError(
+                "TWELVEDATA_API_KEY is not set. Obtain one from https://twelvedata.com "
+                "and add it to your environment."
+            )
+        watchlist = Watchlist()
+        if symbols and save:
+            watchlist.add(symbols)
+        symbols = [s.strip().upper() for s in (symbols or watchlist.symbols()) if s.strip()]
+        if not symbols:
+            return "The watchlist is empty. Pass symbols to compare or save some first."
+
+        histories, errors = fetch_histories(
+            list(dict.fromkeys(symbols)), api_key, outputsize=max(HORIZONS.values()) + 1
         )
-        return md_path, summary
+        if not histories:
+            return "No price history was returned for " + ", ".join(symbols) + "."
+        summary = format_cross_section(cross_section(*align_closes(histories)))
+        if errors:
+            summary += "\n\nSkipped: " + "; ".join(f"{s} ({e})" for s, e in errors.items())
+        return summary
+
+
+class ResearchArchiveToolInput(BaseModel):
+    query: str = Field(..., description="What to look up in past research.")
+    company: Optional[str] = Field(
+        None, description="Only search material about this company (e.g. 'microsoft')."
+    )
+    top_k: int = Field(5, ge=1, le=10, description="Number of passages to return.")
+
+
+class ResearchArchiveTool(ResearchTool):
+    name: str = "research_archive_tool"
+    description: str = (
+        "Searches earlier reports, feedback, chart summaries, task data and user "
+        "knowledge files stored locally. Returns the best matching passages in "
+        "milliseconds. Check it before searching the web for a company or its peers."
+    )
+    args_schema: Type[BaseModel] = ResearchArchiveToolInput
+
+    def _run(self, query: str, company: Optional[str] = None, top_k: int = 5) -> str:
+        from company_research.retrieval import default_index
+
+        hits = default_index().search(query, k=top_k, company=company)
+        if not hits:
+            scope = f" about {company}" if company else ""
+            return f"No earlier research{scope} matched '{query}'."
+        return "\n\n".join(f"{i}. {hit.format()}" for i, hit in enumerate(hits, start=1))
 
 
 __all__ = [
+    "ResearchTool",
+    "ResearchArchiveTool",
+    "WatchlistTool",
+    "LiveStockTool",
     "SerpApiTool",
     "WikipediaTool",
     "YahooFinanceTool",
     "GoogleTrendsTool",
     "NewsApiTool",
     "StockChartTool",
+    "ToolFailure",
 ]
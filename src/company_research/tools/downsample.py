@@ -0,0 +1,103 @@
+"""Downsampling for long price series before they are charted.
+
+Two reductions are used, both O(n) in numpy:
+
+* ``lttb`` (Largest-Triangle-Three-Buckets) picks the points of a line series
+  that best preserve its visual shape, so peaks and troughs survive even at a
+  small fraction of the original points. It is used for line traces such as
+  moving averages.
+* ``bucket_ohlcv`` merges consecutive candles into wider candles (first open,
+  max high, min low, last close, summed volume). Highs and lows are kept
+  exactly, which is what matters for a candlestick chart.
+
+Statistics are always computed on the raw series; only what is plotted is
+reduced.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the ``n_out`` points chosen by Largest-Triangle-Three-Buckets.
+
+    ``x`` must be increasing and ``y`` free of NaNs. The first and last points
+    are always kept, and all indices are returned when the series is already
+    short enough.
+    """
+    size = len(y)
+    if n_out >= size or n_out < 3:
+        return np.arange(size)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Interior points are split into n_out - 2 buckets; bucket i spans
+    # edges[i]:edges[i + 1].
+    edges = np.linspace(1, size - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket).
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else size
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        ax, ay = x[previous], y[previous]
+        area = np.abs(
+            (ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay)
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def bucket_ohlcv(df: "pd.DataFrame", max_points: int) -> "pd.DataFrame":
+    """
+    Merge consecutive candles so that at most ``max_points`` remain.
+
+    ``df`` has a datetime index and ``open``/``high``/``low``/``close``/
+    ``volume`` columns; each merged candle is stamped with the time of its
+    first candle.
+    """
+    import pandas as pd
+
+    size = len(df)
+    if max_points <= 0 or size <= max_points:
+        return df
+    bucket = np.arange(size) * max_points // size
+    groups = df.groupby(bucket, sort=True)
+    merged = pd.DataFrame(
+        {
+            "open": groups["open"].first(),
+            "high": groups["high"].max(),
+            "low": groups["low"].min(),
+            "close": groups["close"].last(),
+            "volume": groups["volume"].sum(),
+        }
+    )
+    merged.index = df.index[np.searchsorted(bucket, merged.index.to_numpy())]
+    merged.index.name = df.index.name
+    return merged
+
+
+def downsample_line(series: "pd.Series", max_points: int) -> "pd.Series":
+    """``series`` without NaNs, reduced to ``max_points`` points with LTTB."""
+    series = series.dropna()
+    if max_points <= 0 or len(series) <= max_points:
+        return series
+    x = series.index.asi8 if hasattr(series.index, "asi8") else np.arange(len(series))
+    return series.iloc[lttb(x, series.to_numpy(), max_points)]
+
+
+__all__ = ["bucket_ohlcv", "downsample_line", "lttb"]
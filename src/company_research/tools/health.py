@@ -0,0 +1,213 @@
+"""Per-host health tracking for the data providers the tools call.
+
+Every request made through ``_request_json`` is recorded against its host.
+The rolling latencies give each host an adaptive timeout (a multiple of the
+observed p95, clamped to ``[min_timeout, max_timeout]``) and the failures
+drive a circuit breaker:
+
+* closed: requests flow normally;
+* open: after ``failure_threshold`` consecutive failures, or an error rate of
+  ``error_rate`` over the window, requests fail immediately with
+  ``ProviderUnavailable`` for ``cooldown`` seconds;
+* half-open: once the cooldown passes, a single probe request is let through.
+  Success closes the circuit; failure re-opens it with a doubled cooldown
+  (capped at ``max_cooldown``).
+
+A dead provider therefore costs one timeout per cooldown rather than one per
+tool call.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class ProviderUnavailable(RuntimeError):
+    """Raised without making a request while a host's circuit is open."""
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(
+            f"Provider unavailable: {host} is failing and was skipped; "
+            f"it will be retried in about {max(retry_in, 0):.0f}s."
+        )
+        self.host = host
+        self.retry_in = retry_in
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+@dataclass
+class HealthPolicy:
+    window: int = 50
+    min_samples: int = 5
+    percentile: float = 95.0
+    timeout_multiplier: float = 3.0
+    min_timeout: float = 5.0
+    max_timeout: float = 30.0
+    failure_threshold: int = 3
+    error_rate: float = 0.5
+    cooldown: float = 30.0
+    max_cooldown: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> "HealthPolicy":
+        return cls(
+            max_timeout=_env_float("COMPANY_RESEARCH_PROVIDER_TIMEOUT", cls.max_timeout),
+            failure_threshold=int(
+                _env_float("COMPANY_RESEARCH_PROVIDER_FAILURES", cls.failure_threshold)
+            ),
+            cooldown=_env_float("COMPANY_RESEARCH_PROVIDER_COOLDOWN", cls.cooldown),
+        )
+
+
+class HostHealth:
+    """Rolling stats and circuit state for a single host."""
+
+    def __init__(self, host: str, policy: HealthPolicy) -> None:
+        self.host = host
+        self.policy = policy
+        # (latency in seconds, succeeded) for the most recent requests.
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=policy.window)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.cooldown = policy.cooldown
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def timeout(self) -> float:
+        """Adaptive request timeout from the observed successful latencies."""
+        policy = self.policy
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self._samples if ok)
+        if len(latencies) < policy.min_samples:
+            return policy.max_timeout
+        index = min(len(latencies) - 1, int(round(policy.percentile / 100 * (len(latencies) - 1))))
+        return max(policy.min_timeout, min(policy.max_timeout, latencies[index] * policy.timeout_multiplier))
+
+    def before_request(self) -> None:
+        """Raise ``ProviderUnavailable`` unless a request may be made now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            retry_in = self.opened_at + self.cooldown - time.monotonic()
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logger.info("Probing %s after %.0fs open.", self.host, self.cooldown)
+                return
+            raise ProviderUnavailable(self.host, retry_in)
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._samples.append((latency, True))
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info("%s recovered; closing its circuit.", self.host)
+            self.state = CLOSED
+            self.cooldown = self.policy.cooldown
+            self._probe_in_flight = False
+
+    def record_failure(self, latency: float) -> None:
+        policy = self.policy
+        with self._lock:
+            self._samples.append((latency, False))
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, policy.max_cooldown)
+                self._open()
+                return
+            failures = sum(1 for _, ok in self._samples if not ok)
+            error_rate = failures / len(self._samples)
+            if self.state == CLOSED and (
+                self.consecutive_failures >= policy.failure_threshold
+                or (len(self._samples) >= policy.min_samples and error_rate >= policy.error_rate)
+            ):
+                self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+        logger.warning(
+            "Opening circuit for %s after %d consecutive failures; retrying in %.0fs.",
+            self.host,
+            self.consecutive_failures,
+            self.cooldown,
+        )
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            samples = list(self._samples)
+            state = self.state
+        latencies = sorted(latency for latency, ok in samples if ok)
+        return {
+            "host": self.host,
+            "state": state,
+            "requests": len(samples),
+            "error_rate": round(sum(1 for _, ok in samples if not ok) / len(samples), 3) if samples else 0.0,
+            "median_latency": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "timeout": round(self.timeout(), 2),
+        }
+
+
+class ProviderHealth:
+    """Health records for every host, created on first use."""
+
+    def __init__(self, policy: Optional[HealthPolicy] = None) -> None:
+        self.policy = policy or HealthPolicy.from_env()
+        self._hosts: Dict[str, HostHealth] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> HostHealth:
+        host = urlparse(url).netloc or url
+        with self._lock:
+            health = self._hosts.get(host)
+            if health is None:
+                health = self._hosts[host] = HostHealth(host, self.policy)
+            return health
+
+    def snapshot(self) -> list[Dict[str, object]]:
+        with self._lock:
+            hosts = list(self._hosts.values())
+        return [health.snapshot() for health in hosts]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hosts.clear()
+
+
+# Shared across tool instances and threads so that every agent (and, in the
+# service, every job) sees the same view of a degraded provider.
+PROVIDER_HEALTH = ProviderHealth()
+
+
+__all__ = [
+    "CLOSED",
+    "HALF_OPEN",
+    "OPEN",
+    "HealthPolicy",
+    "HostHealth",
+    "PROVIDER_HEALTH",
+    "ProviderHealth",
+    "ProviderUnavailable",
+]
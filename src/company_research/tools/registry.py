@@ -0,0 +1,103 @@
+"""Lazy registry of the tools available to the crew.
+
+Tools are declared here by import path only. Nothing is imported until a tool
+is actually created, and the tool classes themselves defer their heavy
+dependencies (pandas, plotly, wikipedia, ...) until they are first run.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Dict, Tuple
+
+if TYPE_CHECKING:
+    from crewai.tools import BaseTool
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """
+    Cheap declaration of a tool: its name, class path and heavy imports.
+
+    ``needs_listing`` marks tools that only work for publicly listed
+    companies; the pre-flight stage drops them for unlisted ones.
+    """
+
+    name: str
+    target: str
+    requires: Tuple[str, ...] = ()
+    needs_listing: bool = False
+
+    def load(self) -> type:
+        module_name, _, class_name = self.target.partition(":")
+        return getattr(import_module(module_name), class_name)
+
+    def create(self, **kwargs: Any) -> "BaseTool":
+        return self.load()(**kwargs)
+
+
+_CUSTOM_TOOLS = "company_research.tools.custom_tool"
+
+TOOL_SPECS: Dict[str, ToolSpec] = {
+    spec.name: spec
+    for spec in (
+        ToolSpec("serp_api_tool", f"{_CUSTOM_TOOLS}:SerpApiTool", ("requests",)),
+        ToolSpec(
+            "wikipedia_tool",
+            f"{_CUSTOM_TOOLS}:WikipediaTool",
+            ("wikipedia", "wikipediaapi"),
+        ),
+        ToolSpec(
+            "yahoo_finance_tool",
+            f"{_CUSTOM_TOOLS}:YahooFinanceTool",
+            ("requests",),
+            needs_listing=True,
+        ),
+        ToolSpec(
+            "google_trends_tool", f"{_CUSTOM_TOOLS}:GoogleTrendsTool", ("requests",)
+        ),
+        ToolSpec("news_api_tool", f"{_CUSTOM_TOOLS}:NewsApiTool", ("requests",)),
+        ToolSpec(
+            "stock_chart_tool",
+            f"{_CUSTOM_TOOLS}:StockChartTool",
+            ("requests", "pandas", "plotly"),
+            needs_listing=True,
+        ),
+        ToolSpec("research_archive_tool", f"{_CUSTOM_TOOLS}:ResearchArchiveTool"),
+        ToolSpec(
+            "live_stock_tool",
+            f"{_CUSTOM_TOOLS}:LiveStockTool",
+            ("requests",),
+            needs_listing=True,
+        ),
+        ToolSpec(
+            "watchlist_tool", f"{_CUSTOM_TOOLS}:WatchlistTool", ("requests", "numpy")
+        ),
+    )
+}
+
+
+def get_spec(name: str) -> ToolSpec:
+    try:
+        return TOOL_SPECS[name]
+    except KeyError:
+        valid = ", ".join(sorted(TOOL_SPECS))
+        raise KeyError(f"Unknown tool '{name}'. Choose from {valid}.") from None
+
+
+def create_tool(name: str, **kwargs: Any) -> "BaseTool":
+    """Instantiate the tool registered under ``name``."""
+    return get_spec(name).create(**kwargs)
+
+
+def heavy_modules() -> Tuple[str, ...]:
+    """Top-level modules that should only be imported when a tool runs."""
+    seen: Dict[str, None] = {}
+    for spec in TOOL_SPECS.values():
+        for module in spec.requires:
+            seen.setdefault(module, None)
+    return tuple(seen)
+
+
+__all__ = ["TOOL_SPECS", "ToolSpec", "create_tool", "get_spec", "heavy_modules"]
@@ -0,0 +1,538 @@
+"""Streaming intraday quotes with incremental bars and indicators.
+
+A ``QuoteSource`` yields ``Quote`` ticks. ``LiveSeries`` folds each tick into
+the current OHLC bar and, when a bar closes, into the indicators. SMA uses a
+running sum over a ring buffer, EMA its recursive form, and RSI Wilder's
+smoothing, so every tick costs O(1) however long the session runs. Summaries
+read the live state and include the still-forming bar. They never re-fetch
+history.
+
+Sources are pluggable. ``TwelveDataQuoteSource`` polls the TwelveData quote
+endpoint, and ``ReplayQuoteSource`` replays a local CSV/JSONL tick file so
+the whole pipeline can run offline.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Interval names accepted by the live tool, mapped to (TwelveData interval, seconds).
+INTERVALS: Dict[str, Tuple[str, int]] = {
+    "1MIN": ("1min", 60),
+    "5MIN": ("5min", 300),
+    "15MIN": ("15min", 900),
+    "30MIN": ("30min", 1800),
+    "1H": ("1h", 3600),
+}
+
+
+@dataclass(frozen=True)
+class Quote:
+    symbol: str
+    price: float
+    volume: int
+    timestamp: float  # seconds since the epoch
+
+
+@dataclass
+class Bar:
+    start: float
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int = 0
+
+    def update(self, price: float, volume: int) -> None:
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.close = price
+        self.volume += volume
+
+
+# ---------------------------------------------------------------------------
+# Incremental indicators. ``update`` folds in a closed bar's close; ``preview``
+# is the value the indicator would have if the forming bar closed at ``value``
+# and leaves the state untouched.
+# ---------------------------------------------------------------------------
+
+
+class SMA:
+    def __init__(self, period: int) -> None:
+        self.period = period
+        self._window: Deque[float] = deque(maxlen=period)
+        self._sum = 0.0
+
+    def update(self, value: float) -> Optional[float]:
+        if len(self._window) == self.period:
+            self._sum -= self._window[0]
+        self._window.append(value)
+        self._sum += value
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._sum / self.period if len(self._window) == self.period else None
+
+    def preview(self, value: float) -> Optional[float]:
+        count = len(self._window)
+        if count + 1 < self.period:
+            return None
+        dropped = self._window[0] if count == self.period else 0.0
+        return (self._sum - dropped + value) / self.period
+
+
+class EMA:
+    """Exponential moving average, seeded with the SMA of its first period."""
+
+    def __init__(self, period: int) -> None:
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self._seed = SMA(period)
+        self.value: Optional[float] = None
+
+    def update(self, value: float) -> Optional[float]:
+        if self.value is None:
+            self.value = self._seed.update(value)
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def preview(self, value: float) -> Optional[float]:
+        if self.value is None:
+            return self._seed.preview(value)
+        return self.value + self.alpha * (value - self.value)
+
+
+class WilderRSI:
+    """Relative strength index with Wilder's smoothing."""
+
+    def __init__(self, period: int = 14) -> None:
+        self.period = period
+        self._previous: Optional[float] = None
+        self._count = 0
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+
+    def _smoothed(self, value: float) -> Optional[Tuple[float, float]]:
+        if self._previous is None:
+            return None
+        change = value - self._previous
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        count = self._count + 1
+        if count <= self.period:
+            # The first period is a plain running mean of gains and losses.
+            return (
+                self._avg_gain + (gain - self._avg_gain) / count,
+                self._avg_loss + (loss - self._avg_loss) / count,
+            )
+        n = self.period
+        return (
+            (self._avg_gain * (n - 1) + gain) / n,
+            (self._avg_loss * (n - 1) + loss) / n,
+        )
+
+    @staticmethod
+    def _rsi(avg_gain: float, avg_loss: float) -> float:
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def update(self, value: float) -> Optional[float]:
+        smoothed = self._smoothed(value)
+        self._previous = value
+        if smoothed is None:
+            return None
+        self._avg_gain, self._avg_loss = smoothed
+        self._count += 1
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        if self._count < self.period:
+            return None
+        return self._rsi(self._avg_gain, self._avg_loss)
+
+    def preview(self, value: float) -> Optional[float]:
+        smoothed = self._smoothed(value)
+        if smoothed is None or self._count + 1 < self.period:
+            return None
+        return self._rsi(*smoothed)
+
+
+class LiveSeries:
+    """OHLC bars and indicators for one symbol, updated tick by tick."""
+
+    def __init__(
+        self,
+        symbol: str,
+        interval_seconds: int,
+        max_bars: int = 500,
+        sma_periods: Iterable[int] = (20, 50),
+        ema_periods: Iterable[int] = (12, 26),
+        rsi_period: int = 14,
+    ) -> None:
+        self.symbol = symbol.upper()
+        self.interval = interval_seconds
+        self.bars: Deque[Bar] = deque(maxlen=max_bars)
+        self.current: Optional[Bar] = None
+        self.smas = {period: SMA(period) for period in sma_periods}
+        self.emas = {period: EMA(period) for period in ema_periods}
+        self.rsi = WilderRSI(rsi_period)
+        self.ticks = 0
+        self.session_open: Optional[float] = None
+        self.last_update: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _close_bar(self, bar: Bar) -> None:
+        self.bars.append(bar)
+        for indicator in (*self.smas.values(), *self.emas.values(), self.rsi):
+            indicator.update(bar.close)
+
+    def seed(self, bars: Iterable[Bar]) -> None:
+        """Warm the indicators with closed historical bars, oldest first."""
+        with self._lock:
+            for bar in bars:
+                self._close_bar(bar)
+
+    def on_quote(self, quote: Quote) -> None:
+        start = quote.timestamp - quote.timestamp % self.interval
+        with self._lock:
+            if self.current is None and self.bars and start <= self.bars[-1].start:
+                # Tick for a bar that is already closed (e.g. covered by the seed).
+                return
+            if self.current is not None and start > self.current.start:
+                self._close_bar(self.current)
+                self.current = None
+            if self.current is None:
+                self.current = Bar(start, quote.price, quote.price, quote.price, quote.price)
+                self.current.volume = quote.volume
+            elif start == self.current.start:
+                self.current.update(quote.price, quote.volume)
+            else:
+                # Late tick for an already closed bar; ignored.
+                return
+            if self.session_open is None:
+                self.session_open = quote.price
+            self.ticks += 1
+            self.last_update = quote.timestamp
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state, including the forming bar, in constant time."""
+        with self._lock:
+            bar = self.current or (self.bars[-1] if self.bars else None)
+            if bar is None:
+                return {"symbol": self.symbol, "ticks": 0}
+            price = bar.close
+            forming = self.current is not None
+            indicators: Dict[str, Optional[float]] = {}
+            for period, sma in self.smas.items():
+                indicators[f"SMA {period}"] = sma.preview(price) if forming else sma.value
+            for period, ema in self.emas.items():
+                indicators[f"EMA {period}"] = ema.preview(price) if forming else ema.value
+            indicators[f"RSI {self.rsi.period}"] = (
+                self.rsi.preview(price) if forming else self.rsi.value
+            )
+            return {
+                "symbol": self.symbol,
+                "price": price,
+                "bar": bar,
+                "bars": len(self.bars),
+                "ticks": self.ticks,
+                "session_open": self.session_open,
+                "last_update": self.last_update,
+                "indicators": indicators,
+            }
+
+    def summary(self) -> str:
+        snap = self.snapshot()
+        if not snap.get("ticks") and not self.bars:
+            return f"No live data received yet for {self.symbol}."
+        bar: Bar = snap["bar"]
+        stamp = datetime.fromtimestamp(bar.start, tz=timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+        lines = [
+            f"Live {self.symbol} ({self.interval // 60} min bars): last ${snap['price']:.2f}",
+            f"Current bar {stamp}: O {bar.open:.2f} H {bar.high:.2f} "
+            f"L {bar.low:.2f} C {bar.close:.2f} V {bar.volume:,}",
+        ]
+        if snap["session_open"]:
+            change = snap["price"] - snap["session_open"]
+            lines.append(
+                f"Since session start: {change:+.2f} ({change / snap['session_open'] * 100:+.2f}%) "
+                f"over {snap['ticks']} ticks"
+            )
+        values = [
+            f"{name} {value:.2f}" for name, value in snap["indicators"].items() if value is not None
+        ]
+        lines.append("Indicators: " + (", ".join(values) if values else "warming up"))
+        return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Quote sources.
+# ---------------------------------------------------------------------------
+
+
+class QuoteSource(ABC):
+    """Yields quotes for one symbol until ``stop`` is called."""
+
+    def __init__(self) -> None:
+        self._stopped = threading.Event()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    @abstractmethod
+    def quotes(self) -> Iterator[Quote]:
+        ...
+
+    def history(self, interval: str, bars: int) -> List[Bar]:
+        """Closed bars to seed indicators with; sources without history return none."""
+        return []
+
+
+class ReplayQuoteSource(QuoteSource):
+    """
+    Replays ticks from a CSV (``timestamp,price,volume``) or JSONL file.
+
+    Timestamps may be epoch seconds or ISO 8601. With ``speed`` 0 ticks are
+    emitted as fast as they are consumed; otherwise the original spacing is
+    replayed ``speed`` times faster.
+    """
+
+    def __init__(self, symbol: str, path: str, speed: float = 0.0) -> None:
+        super().__init__()
+        self.symbol = symbol.upper()
+        self.path = path
+        self.speed = speed
+
+    @staticmethod
+    def _timestamp(value: Any) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            stamp = datetime.fromisoformat(str(value))
+            if stamp.tzinfo is None:
+                stamp = stamp.replace(tzinfo=timezone.utc)
+            return stamp.timestamp()
+
+    def _rows(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            if self.path.endswith((".jsonl", ".json")):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from csv.DictReader(f)
+
+    def quotes(self) -> Iterator[Quote]:
+        previous: Optional[float] = None
+        for row in self._rows():
+            if self.stopped:
+                return
+            symbol = (row.get("symbol") or self.symbol).upper()
+            if symbol != self.symbol:
+                continue
+            stamp = self._timestamp(row.get("timestamp") or row.get("datetime"))
+            if self.speed and previous is not None and stamp > previous:
+                self._stopped.wait((stamp - previous) / self.speed)
+            previous = stamp
+            yield Quote(symbol, float(row["price"]), int(float(row.get("volume") or 0)), stamp)
+
+
+class TwelveDataQuoteSource(QuoteSource):
+    """
+    Polls TwelveData's ``/quote`` endpoint every ``poll_interval`` seconds.
+
+    The endpoint reports cumulative daily volume; ticks carry the difference
+    since the previous poll. Each poll costs one API credit, against the
+    ``outputsize`` bars a snapshot re-download would fetch.
+    """
+
+    def __init__(self, symbol: str, api_key: str, poll_interval: float = 15.0) -> None:
+        super().__init__()
+        self.symbol = symbol.upper()
+        self.api_key = api_key
+        self.poll_interval = poll_interval
+
+    def quotes(self) -> Iterator[Quote]:
+        from company_research.tools.custom_tool import _request_json
+
+        cumulative: Optional[int] = None
+        while not self.stopped:
+            try:
+                data = _request_json(
+                    "https://api.twelvedata.com/quote",
+                    {"symbol": self.symbol, "apikey": self.api_key},
+                )
+                if data.get("status") == "error":
+                    raise RuntimeError(data.get("message", "Unknown error"))
+                volume = int(float(data.get("volume") or 0))
+                delta = volume - cumulative if cumulative is not None and volume >= cumulative else 0
+                cumulative = volume
+                yield Quote(
+                    self.symbol,
+                    float(data["close"]),
+                    delta,
+                    float(data.get("last_quote_at") or data.get("timestamp") or time.time()),
+                )
+            except (RuntimeError, KeyError, ValueError) as exc:
+                logger.warning("Live quote for %s failed: %s", self.symbol, exc)
+            self._stopped.wait(self.poll_interval)
+
+    def history(self, interval: str, bars: int) -> List[Bar]:
+        from company_research.tools.custom_tool import _request_json
+
+        # Bars come in exchange-local time unless asked for in UTC, while
+        # quotes carry epoch timestamps; mixing the two would put the seed
+        # bars of exchanges east of UTC in the future and drop every tick.
+        data = _request_json(
+            "https://api.twelvedata.com/time_series",
+            {
+                "symbol": self.symbol,
+                "interval": interval,
+                "outputsize": bars,
+                "timezone": "UTC",
+                "apikey": self.api_key,
+            },
+        )
+        if data.get("status") == "error":
+            raise RuntimeError(f"TwelveData API error for {self.symbol}: {data.get('message')}")
+        history = []
+        # Values arrive newest first; the newest bar is still forming, so it is skipped.
+        for value in reversed((data.get("values") or [])[1:]):
+            start = ReplayQuoteSource._timestamp(value["datetime"].replace(" ", "T"))
+            history.append(
+                Bar(
+                    start,
+                    float(value["open"]),
+                    float(value["high"]),
+                    float(value["low"]),
+                    float(value["close"]),
+                    int(float(value.get("volume") or 0)),
+                )
+            )
+        return history
+
+
+class LiveSession:
+    """
+    A ``LiveSeries`` fed by a ``QuoteSource`` on a background thread.
+
+    Polling costs API credits, so a session nobody has read for
+    ``idle_timeout`` seconds stops its source; the next read starts a new one.
+    """
+
+    def __init__(
+        self, series: LiveSeries, source: QuoteSource, idle_timeout: float = 600.0
+    ) -> None:
+        self.series = series
+        self.source = source
+        self.idle_timeout = idle_timeout
+        self.error: Optional[str] = None
+        self.finished = threading.Event()
+        self.last_read = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._consume, name=f"live-{series.symbol}", daemon=True
+        )
+        self._watchdog = threading.Thread(
+            target=self._watch, name=f"live-{series.symbol}-idle", daemon=True
+        )
+
+    def start(self, seed_interval: Optional[str] = None, seed_bars: int = 0) -> "LiveSession":
+        if seed_interval and seed_bars:
+            try:
+                self.series.seed(self.source.history(seed_interval, seed_bars))
+            except RuntimeError as exc:
+                logger.warning("Could not seed %s: %s", self.series.symbol, exc)
+        self._thread.start()
+        self._watchdog.start()
+        return self
+
+    def touch(self) -> None:
+        """Record a read, keeping the session alive for another ``idle_timeout``."""
+        self.last_read = time.monotonic()
+
+    def _watch(self) -> None:
+        while not self.finished.wait(min(self.idle_timeout, 30.0)):
+            if time.monotonic() - self.last_read >= self.idle_timeout:
+                logger.info(
+                    "Stopping live session for %s after %.0f s without reads",
+                    self.series.symbol,
+                    self.idle_timeout,
+                )
+                self.stop()
+                return
+
+    def _consume(self) -> None:
+        try:
+            for quote in self.source.quotes():
+                self.series.on_quote(quote)
+        except Exception as exc:  # keep the last good state available to readers
+            logger.exception("Live session for %s stopped", self.series.symbol)
+            self.error = str(exc)
+        finally:
+            self.finished.set()
+
+    def stop(self) -> None:
+        self.source.stop()
+
+
+_sessions: Dict[Tuple[str, str], LiveSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def live_session(key: Tuple[str, str], factory: Callable[[], LiveSession]) -> LiveSession:
+    """
+    The session for ``key``, starting one with ``factory`` if needed.
+
+    A session whose source ended normally (a replay file ran out) is kept so
+    its final state can still be read; failed, stopped or idled-out ones are
+    replaced. Every call counts as a read for the idle timeout.
+    """
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None or session.error or session.source.stopped:
+            session = _sessions[key] = factory()
+        session.touch()
+        return session
+
+
+def stop_sessions() -> None:
+    """Stop every live session, e.g. when a research run ends."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.stop()
+        _sessions.clear()
+
+
+__all__ = [
+    "EMA",
+    "INTERVALS",
+    "Bar",
+    "LiveSeries",
+    "LiveSession",
+    "Quote",
+    "QuoteSource",
+    "ReplayQuoteSource",
+    "SMA",
+    "TwelveDataQuoteSource",
+    "WilderRSI",
+    "live_session",
+    "stop_sessions",
+]
@@ -0,0 +1,238 @@
+"""Watchlists: many symbols fetched in bulk and compared in one pass.
+
+Price histories for a whole watchlist are pulled with TwelveData's batch
+``time_series`` request, aligned on a shared date axis into a single
+``(days, symbols)`` close matrix and reduced column-wise with NumPy. Returns
+over several horizons, volatility, drawdown, the correlation matrix and a
+relative-strength ranking therefore cost a handful of vectorised operations
+whether the list holds 2 symbols or 50.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from company_research.utils import atomic_write_text
+
+# Trading days per horizon.
+HORIZONS: Dict[str, int] = {"1W": 5, "1M": 21, "3M": 63, "6M": 126, "1Y": 252}
+TRADING_DAYS = 252
+# TwelveData accepts up to 120 symbols per batch request.
+BATCH_SIZE = 120
+
+
+class Watchlist:
+    """The saved set of symbols, kept in a small JSON file."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.getenv("COMPANY_RESEARCH_WATCHLIST", "data/watchlist.json")
+
+    def symbols(self) -> List[str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return list(json.load(f).get("symbols", []))
+        except (OSError, ValueError):
+            return []
+
+    def save(self, symbols: Iterable[str]) -> List[str]:
+        unique = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+        atomic_write_text(self.path, json.dumps({"symbols": unique}, indent=2))
+        return unique
+
+    def add(self, symbols: Iterable[str]) -> List[str]:
+        return self.save([*self.symbols(), *symbols])
+
+    def remove(self, symbols: Iterable[str]) -> List[str]:
+        dropped = {s.strip().upper() for s in symbols}
+        return self.save(s for s in self.symbols() if s not in dropped)
+
+
+def fetch_histories(
+    symbols: Sequence[str],
+    api_key: str,
+    interval: str = "1day",
+    outputsize: int = 300,
+) -> Tuple[Dict[str, List[Dict[str, str]]], Dict[str, str]]:
+    """
+    Daily candles for every symbol, in as few requests as possible.
+
+    Returns (values by symbol, error by symbol); one bad symbol does not fail
+    the rest of the batch.
+    """
+    from company_research.tools.custom_tool import _request_json
+
+    histories: Dict[str, List[Dict[str, str]]] = {}
+    errors: Dict[str, str] = {}
+    for offset in range(0, len(symbols), BATCH_SIZE):
+        batch = list(symbols[offset : offset + BATCH_SIZE])
+        data = _request_json(
+            "https://api.twelvedata.com/time_series",
+            {
+                "symbol": ",".join(batch),
+                "interval": interval,
+                "outputsize": outputsize,
+                "apikey": api_key,
+            },
+        )
+        # A single-symbol request returns the series itself rather than a
+        # mapping of symbol to series.
+        per_symbol = {batch[0]: data} if len(batch) == 1 else data
+        for symbol in batch:
+            series = per_symbol.get(symbol) or {}
+            if series.get("status") == "error" or not series.get("values"):
+                errors[symbol] = series.get("message", "No data returned.")
+            else:
+                histories[symbol] = series["values"]
+    return histories, errors
+
+
+def align_closes(
+    histories: Dict[str, List[Dict[str, str]]],
+) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Closes as a ``(days, symbols)`` matrix on the union of all dates.
+
+    Gaps (holidays on one exchange, late listings) are forward-filled; days
+    before a symbol's first close stay NaN.
+    """
+    symbols = list(histories)
+    dates = np.array(
+        sorted({value["datetime"][:10] for values in histories.values() for value in values})
+    )
+    closes = np.full((len(dates), len(symbols)), np.nan)
+    for column, symbol in enumerate(symbols):
+        values = histories[symbol]
+        rows = np.searchsorted(dates, [value["datetime"][:10] for value in values])
+        closes[rows, column] = [float(value["close"]) for value in values]
+
+    # Forward fill down each column using the index of the last valid row.
+    valid = ~np.isnan(closes)
+    last_valid = np.where(valid, np.arange(len(dates))[:, None], 0)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    filled = closes[last_valid, np.arange(len(symbols))]
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return dates, symbols, filled
+
+
+@dataclass
+class CrossSection:
+    symbols: List[str]
+    returns: Dict[str, np.ndarray]
+    volatility: np.ndarray
+    max_drawdown: np.ndarray
+    correlation: np.ndarray
+    strength_rank: np.ndarray  # 1 is strongest
+    days: int
+    last_date: str
+
+
+def cross_section(
+    dates: np.ndarray,
+    symbols: List[str],
+    closes: np.ndarray,
+    horizons: Optional[Dict[str, int]] = None,
+) -> CrossSection:
+    horizons = horizons or HORIZONS
+    last = closes[-1]
+    returns = {}
+    for name, days in horizons.items():
+        if days < len(closes):
+            returns[name] = last / closes[-1 - days] - 1.0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_returns = np.diff(np.log(closes), axis=0)
+        volatility = np.nanstd(log_returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+        peaks = np.fmax.accumulate(closes, axis=0)
+        max_drawdown = np.nanmin(closes / peaks - 1.0, axis=0)
+
+    # Correlation over the days every symbol traded.
+    complete = log_returns[~np.isnan(log_returns).any(axis=1)]
+    if len(complete) > 2:
+        correlation = np.corrcoef(complete, rowvar=False).reshape(len(symbols), len(symbols))
+    else:
+        correlation = np.full((len(symbols), len(symbols)), np.nan)
+
+    # Relative strength: mean percentile rank of the horizon returns.
+    if returns:
+        matrix = np.vstack(list(returns.values()))
+        matrix = np.where(np.isnan(matrix), -np.inf, matrix)
+        ranks = matrix.argsort(axis=1).argsort(axis=1) / max(len(symbols) - 1, 1)
+        score = ranks.mean(axis=0)
+        strength_rank = (-score).argsort().argsort() + 1
+    else:
+        strength_rank = np.arange(1, len(symbols) + 1)
+
+    return CrossSection(
+        symbols=symbols,
+        returns=returns,
+        volatility=volatility,
+        max_drawdown=max_drawdown,
+        correlation=correlation,
+        strength_rank=strength_rank,
+        days=len(closes),
+        last_date=str(dates[-1]) if len(dates) else "",
+    )
+
+
+def _pct(value: float, signed: bool = True) -> str:
+    if np.isnan(value):
+        return "n/a"
+    return f"{value * 100:+.1f}%" if signed else f"{value * 100:.1f}%"
+
+
+def format_cross_section(stats: CrossSection, top_pairs: int = 5) -> str:
+    """Compact markdown summary: one row per symbol plus the extreme correlations."""
+    horizons = list(stats.returns)
+    lines = [
+        f"Watchlist of {len(stats.symbols)} symbols, {stats.days} trading days to {stats.last_date}.",
+        "",
+        "| Rank | Symbol | " + " | ".join(horizons) + " | Vol (ann.) | Max DD |",
+        "|---|---|" + "---|" * len(horizons) + "---|---|",
+    ]
+    for index in np.argsort(stats.strength_rank):
+        cells = [_pct(stats.returns[h][index]) for h in horizons]
+        lines.append(
+            f"| {stats.strength_rank[index]} | {stats.symbols[index]} | "
+            + " | ".join(cells)
+            + f" | {_pct(stats.volatility[index], signed=False)} | {_pct(stats.max_drawdown[index])} |"
+        )
+
+    count = len(stats.symbols)
+    if count > 1 and not np.isnan(stats.correlation).all():
+        upper = np.triu_indices(count, k=1)
+        values = stats.correlation[upper]
+        order = np.argsort(values)
+
+        def pairs(picks: np.ndarray) -> str:
+            return ", ".join(
+                f"{stats.symbols[upper[0][i]]}/{stats.symbols[upper[1][i]]} {values[i]:.2f}"
+                for i in picks
+            )
+
+        limit = min(top_pairs, len(values))
+        lines.extend(
+            [
+                "",
+                f"Most correlated: {pairs(order[::-1][:limit])}",
+                f"Least correlated: {pairs(order[:limit])}",
+                f"Average pairwise correlation: {np.nanmean(values):.2f}",
+            ]
+        )
+    return "\n".join(lines)
+
+
+__all__ = [
+    "BATCH_SIZE",
+    "HORIZONS",
+    "CrossSection",
+    "Watchlist",
+    "align_closes",
+    "cross_section",
+    "fetch_histories",
+    "format_cross_section",
+]
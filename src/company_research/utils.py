@@ -0,0 +1,44 @@
+"""Small filesystem helpers shared across the package."""
+
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+
+
+def topic_slug(topic: str) -> str:
+    """Filesystem-friendly key for a research topic ("Tata Motors" -> "tata_motors")."""
+    return re.sub(r"[^a-z0-9]+", "_", topic.lower()).strip("_") or "topic"
+
+
+def atomic_write_bytes(path: str, content: bytes) -> None:
+    """
+    Write ``content`` to ``path`` atomically.
+
+    The data goes to a temporary file in the same directory which then replaces
+    the target, so readers never observe a half-written file.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def atomic_write_text(path: str, content: str) -> None:
+    """Write ``content`` to ``path`` atomically as UTF-8 (see ``atomic_write_bytes``)."""
+    atomic_write_bytes(path, content.encode("utf-8"))
+
+
+__all__ = ["atomic_write_bytes", "atomic_write_text", "topic_slug"]
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from company_research.llm_routing import ModelRouter
+from company_research.llm_stub import make_stub_server, stub_reply
+
+MESSAGES = [{"role": "user", "content": "Summarise Microsoft."}]
+MODELS = ("stub-429", "stub-error", "stub-empty", "stub-slow-2", "stub-ok", "stub-backup")
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = make_stub_server(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def routers(stub):
+    stub.calls.clear()
+    created = []
+    yield created
+    # Let abandoned slow calls finish before the next test (or interpreter
+    # shutdown) so they don't outlive the client they run on.
+    for router in created:
+        router.close(wait=True)
+
+
+@pytest.fixture
+def make_router(stub, routers):
+    def _make(**route):
+        base_url = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+        router = ModelRouter(
+            {
+                "models": {
+                    name: {"model": f"openai/{name}", "base_url": base_url, "max_retries": 0}
+                    for name in MODELS
+                },
+                "tasks": {"analyze_financials": route},
+            }
+        )
+        routers.append(router)
+        return router
+
+    return _make
+
+
+def test_falls_back_through_rate_limit_error_and_timeout(stub, make_router):
+    llm = make_router(
+        chain=["stub-429", "stub-error", "stub-slow-2", "stub-ok"], timeout=0.5
+    ).routed_llm("analyze_financials")
+    assert llm.call(MESSAGES) == stub_reply("stub-ok")
+    assert stub.calls == {"stub-429": 1, "stub-error": 1, "stub-slow-2": 1, "stub-ok": 1}
+
+
+def test_empty_response_falls_back(stub, make_router):
+    llm = make_router(chain=["stub-empty", "stub-ok"]).routed_llm("analyze_financials")
+    assert llm.call(MESSAGES) == stub_reply("stub-ok")
+
+
+def test_hedges_a_slow_model(stub, make_router):
+    llm = make_router(
+        chain=["stub-slow-2", "stub-backup"], timeout=5, hedge=True, hedge_after=0.2
+    ).routed_llm("analyze_financials")
+    started = time.monotonic()
+    assert llm.call(MESSAGES) == stub_reply("stub-backup")
+    assert time.monotonic() - started < 1.5
+    assert stub.calls["stub-slow-2"] == 1 and stub.calls["stub-backup"] == 1
+
+
+def test_hedge_backup_covers_a_failing_primary(stub, make_router):
+    llm = make_router(
+        chain=["stub-error", "stub-backup"], hedge=True, hedge_after=10
+    ).routed_llm("analyze_financials")
+    assert llm.call(MESSAGES) == stub_reply("stub-backup")
+
+
+def test_raises_when_every_model_fails(stub, make_router):
+    llm = make_router(chain=["stub-429", "stub-error"]).routed_llm("analyze_financials")
+    with pytest.raises(Exception):
+        llm.call(MESSAGES)
+    assert stub.calls == {"stub-429": 1, "stub-error": 1}
@@ -0,0 +1,68 @@
+import json
+
+from company_research.token_budget import compact, dedupe, estimate_tokens, fit_inputs
+
+
+def _analysis(competitors: int = 40) -> str:
+    return json.dumps(
+        {
+            "competitors": [
+                {
+                    "name": f"Competitor {i}",
+                    "focus": "Cloud",
+                    "region": "Global",
+                    "differentiator": "Scale and distribution in enterprise software markets",
+                    "url": f"https://example.com/{i}",
+                }
+                for i in range(competitors)
+            ],
+            "swot": {
+                "strengths": ["Azure", "Office"],
+                "weaknesses": ["Hardware"],
+                "opportunities": ["AI"],
+                "threats": ["Regulation"],
+            },
+            "insights": ["AI drives cloud demand"],
+        },
+        indent=2,
+    )
+
+
+def test_compacted_json_still_parses():
+    text = _analysis()
+    result = compact(text, 500)
+    data = json.loads(result.text)
+    assert "dedupe" not in result.strategies
+    assert result.tokens_after <= 500
+    assert set(data) == {"competitors", "swot", "insights"}
+    assert 1 <= len(data["competitors"]) < 40
+    assert data["competitors"][0]["name"] == "Competitor 0"
+    assert "url" not in data["competitors"][0]
+    assert data["swot"]["strengths"] == ["Azure", "Office"]
+
+
+def test_fenced_json_is_compacted_as_json():
+    result = compact(f"```json\n{_analysis()}\n```", 500)
+    assert json.loads(result.text)["competitors"]
+
+
+def test_long_json_strings_are_shortened():
+    text = json.dumps({"summary": "Revenue grew strongly this year. " * 200, "score": 0.5})
+    data = json.loads(compact(text, 200).text)
+    assert data["score"] == 0.5
+    assert estimate_tokens(data["summary"]) < 200
+
+
+def test_dedupe_leaves_json_alone():
+    text = _analysis(3)
+    assert dedupe(text) == text
+
+
+def test_dedupe_drops_repeated_prose_lines():
+    assert dedupe("Revenue grew.\nRevenue grew.\n| a |\n| a |") == "Revenue grew.\n| a |\n| a |"
+
+
+def test_fit_inputs_keeps_json_valid():
+    fitted = fit_inputs({"market": _analysis(), "notes": "Short notes."}, 600)
+    json.loads(fitted["market"].text)
+    assert fitted["notes"].text == "Short notes."